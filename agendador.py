@@ -0,0 +1,187 @@
+import os
+import json
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+from collections import deque
+
+from despacho import ErroLocal, percentil
+
+# --- AGENDADOR DE CHAMADAS LLM (COTAS POR PROVEDOR/MODELO + PRIORIDADE) ---
+# Toda chamada passa por aqui antes de sair: baldes de requisições (RPM) e de tokens (TPM)
+# por provedor e modelo, e uma fila de prioridade em que itens da Fase 1 furam a fila das
+# redações da Fase 2. Rajadas esperam a vez em vez de levar 429 do provedor.
+LIMITES_PROVEDOR = {
+    "groq": {"rpm": int(os.getenv("LIMITE_RPM_GROQ", "30")), "tpm": int(os.getenv("LIMITE_TPM_GROQ", "12000"))},
+    "gemini": {"rpm": int(os.getenv("LIMITE_RPM_GEMINI", "15")), "tpm": int(os.getenv("LIMITE_TPM_GEMINI", "1000000"))},
+}
+# Exceções por modelo: LIMITES_MODELOS='{"openai/gpt-oss-120b": {"rpm": 30, "tpm": 8000}}'
+LIMITES_MODELOS = json.loads(os.getenv("LIMITES_MODELOS", "{}") or "{}")
+ESPERA_MAXIMA = float(os.getenv("AGENDADOR_ESPERA_MAX", "30"))
+
+# Menor número sai primeiro (lotes de avaliação ficam atrás de quem está usando o bot)
+PRIORIDADE_LOTE = 2
+PRIORIDADES = {"correcao": 0, "1": 0, "1-rapida": 0, "2": 1, "1-lote": PRIORIDADE_LOTE}
+PRIORIDADE_PADRAO = 1
+# Tokens de saída estimados por tipo de chamada (o TPM conta entrada + saída)
+SAIDA_ESTIMADA = {"correcao": 300, "1": 20, "1-rapida": 80, "2": 2500, "1-lote": 200}
+
+
+class FilaEsgotada(ErroLocal):
+    """A cota não liberou vaga dentro da espera máxima (fila cheia aqui, não provedor doente)."""
+
+
+class PedidoCancelado(ErroLocal):
+    """Outro candidato do despacho já respondeu: o pedido saiu da fila sem consumir cota."""
+
+
+class BaldeTokens:
+    """Enche 'capacidade' unidades por minuto; começa cheio (permite a rajada de um minuto)."""
+    def __init__(self, capacidade):
+        self.capacidade = float(capacidade)
+        self.taxa = self.capacidade / 60.0
+        self.nivel = self.capacidade
+        self.atualizado = time.monotonic()
+
+    def _encher(self, agora):
+        self.nivel = min(self.capacidade, self.nivel + (agora - self.atualizado) * self.taxa)
+        self.atualizado = agora
+
+    def espera(self, quantidade, agora):
+        """Segundos até haver 'quantidade' no balde (pedidos maiores que a capacidade esperam encher)."""
+        self._encher(agora)
+        falta = min(quantidade, self.capacidade) - self.nivel
+        return max(0.0, falta / self.taxa) if self.taxa else float("inf")
+
+    def consumir(self, quantidade):
+        self.nivel -= min(quantidade, self.capacidade)
+
+
+class _Cota:
+    def __init__(self, rpm, tpm):
+        self.requisicoes = BaldeTokens(rpm)
+        self.tokens = BaldeTokens(tpm)
+        self.fila = []                 # heap de (prioridade, ordem)
+        self.esperas = deque(maxlen=500)
+        self.atendidos = 0
+        self.tokens_consumidos = 0
+        self.esgotados = 0
+
+
+class Agendador:
+    def __init__(self, espera_maxima=ESPERA_MAXIMA):
+        self.espera_maxima = espera_maxima
+        self._cotas = {}
+        self._ordem = itertools.count()
+        self._cond = threading.Condition()
+
+    def _cota(self, provedor, modelo):
+        chave = f"{provedor}:{modelo}" if modelo else provedor
+        if chave not in self._cotas:
+            limites = {**LIMITES_PROVEDOR.get(provedor, {"rpm": 60, "tpm": 100000}), **LIMITES_MODELOS.get(modelo or "", {})}
+            self._cotas[chave] = _Cota(limites["rpm"], limites["tpm"])
+        return self._cotas[chave]
+
+    @staticmethod
+    def prioridade(tipo, lote=False):
+        """lote=True: avaliação em lote, sempre atrás do tráfego ao vivo, qualquer que seja a fase."""
+        return PRIORIDADE_LOTE if lote else PRIORIDADES.get(str(tipo), PRIORIDADE_PADRAO)
+
+    @staticmethod
+    def estimar_tokens(tokens_entrada, tipo):
+        return tokens_entrada + SAIDA_ESTIMADA.get(str(tipo), 1000)
+
+    def _entrar(self, cota, prioridade):
+        pedido = (prioridade, next(self._ordem))
+        heapq.heappush(cota.fila, pedido)
+        return pedido
+
+    def _tentar(self, cota, pedido, tokens):
+        """Sob o lock: 0 se liberou (e consumiu a cota), senão quantos segundos esperar."""
+        if cota.fila[0] != pedido:
+            return 0.05  # Alguém mais prioritário (ou mais antigo) está na frente
+        agora = time.monotonic()
+        espera = max(cota.requisicoes.espera(1, agora), cota.tokens.espera(tokens, agora))
+        if espera > 0:
+            return espera
+        cota.requisicoes.consumir(1)
+        cota.tokens.consumir(tokens)
+        heapq.heappop(cota.fila)
+        return 0.0
+
+    def _registrar(self, cota, tokens, inicio):
+        cota.atendidos += 1
+        cota.tokens_consumidos += tokens
+        cota.esperas.append(time.monotonic() - inicio)
+
+    def _sair(self, cota, pedido):
+        cota.fila.remove(pedido)
+        heapq.heapify(cota.fila)
+        self._cond.notify_all()
+
+    def _desistir(self, cota, pedido, provedor):
+        self._sair(cota, pedido)
+        cota.esgotados += 1
+        raise FilaEsgotada(f"{provedor}: cota sem vaga em {self.espera_maxima:.0f}s ({len(cota.fila)} na fila)")
+
+    def aguardar(self, provedor, modelo, tokens, prioridade=PRIORIDADE_PADRAO, cancelado=None):
+        """Versão bloqueante (threads do despacho e do pipeline). cancelado: threading.Event do despacho."""
+        inicio = time.monotonic()
+        with self._cond:
+            cota = self._cota(provedor, modelo)
+            pedido = self._entrar(cota, prioridade)
+            while True:
+                if cancelado is not None and cancelado.is_set():
+                    self._sair(cota, pedido)
+                    raise PedidoCancelado(f"{provedor}: outro provedor respondeu antes da vaga")
+                espera = self._tentar(cota, pedido, tokens)
+                if espera == 0:
+                    self._registrar(cota, tokens, inicio)
+                    self._cond.notify_all()  # O próximo da fila reavalia
+                    return time.monotonic() - inicio
+                if time.monotonic() - inicio + espera > self.espera_maxima:
+                    self._desistir(cota, pedido, provedor)
+                # Com cancelamento possível, acorda de tempos em tempos para conferir
+                self._cond.wait(timeout=espera if cancelado is None else min(espera, 0.1))
+
+    async def aguardar_async(self, provedor, modelo, tokens, prioridade=PRIORIDADE_PADRAO):
+        """Versão para o event loop (streams): espera com asyncio.sleep, sem prender thread."""
+        inicio = time.monotonic()
+        with self._cond:
+            cota = self._cota(provedor, modelo)
+            pedido = self._entrar(cota, prioridade)
+        try:
+            while True:
+                with self._cond:
+                    espera = self._tentar(cota, pedido, tokens)
+                    if espera == 0:
+                        self._registrar(cota, tokens, inicio)
+                        self._cond.notify_all()
+                        return time.monotonic() - inicio
+                    if time.monotonic() - inicio + espera > self.espera_maxima:
+                        self._desistir(cota, pedido, provedor)
+                await asyncio.sleep(min(espera, 0.25))
+        except asyncio.CancelledError:
+            # Stream perdedor cancelado ainda na fila: sai sem consumir cota
+            with self._cond:
+                if pedido in cota.fila:
+                    self._sair(cota, pedido)
+            raise
+
+    def resumo(self):
+        with self._cond:
+            return {
+                chave: {
+                    "fila": len(cota.fila),
+                    "atendidos": cota.atendidos,
+                    "esgotados": cota.esgotados,
+                    "tokens": cota.tokens_consumidos,
+                    "espera_p50": percentil(list(cota.esperas), 50),
+                    "espera_p95": percentil(list(cota.esperas), 95),
+                    "rpm_livre": int(cota.requisicoes.nivel),
+                    "tpm_livre": int(cota.tokens.nivel),
+                }
+                for chave, cota in self._cotas.items()
+            }
@@ -0,0 +1,294 @@
+"""
+Memória de Textos de Apoio do Resolve.ia.
+
+Cada Texto de Apoio é preparado uma vez só (chave = hash do texto normalizado): fatiado,
+com os embeddings das fatias (mesmo embedder do RAG) e um resumo extrativo curto.
+A cada item vai para o prompt o resumo + as fatias mais próximas do item, não o texto inteiro.
+Fica em SQLite: sobrevive a restart e é reaproveitado por qualquer sessão que memorize o mesmo texto.
+
+Uso:
+    python apoio.py preparar texto.txt
+    python apoio.py entrada texto.txt "O autor defende que ..."
+"""
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+
+import numpy as np
+
+from cache import CACHE_DIR, CacheLRU, hash_texto, normalizar_texto
+from orcamento import CORTE, contar_tokens, montar_entrada
+from rag import criar_embedder, criar_fatiador
+
+# --- MEMÓRIA DE TEXTOS DE APOIO ---
+APOIO_DB = os.getenv("APOIO_DB", os.path.join(CACHE_DIR, "apoio.sqlite3"))
+APOIO_TTL = float(os.getenv("APOIO_TTL_DIAS", "30")) * 86400
+APOIO_MAX_MEMORIA = int(os.getenv("APOIO_MAX_MEMORIA", "64"))
+APOIO_CHUNK = int(os.getenv("APOIO_CHUNK", "450"))
+APOIO_CHUNK_OVERLAP = int(os.getenv("APOIO_CHUNK_OVERLAP", "60"))
+APOIO_TOP_K = int(os.getenv("APOIO_TOP_K", "3"))
+APOIO_RESUMO_TOKENS = int(os.getenv("APOIO_RESUMO_TOKENS", "120"))
+# Abaixo disto o texto vai inteiro: resumo + fatias não sairiam mais curtos
+APOIO_MINIMO_TOKENS = int(os.getenv("APOIO_MINIMO_TOKENS", "450"))
+
+ROTULO_RESUMO = "RESUMO DO TEXTO:\n"
+ROTULO_TRECHOS = "\n\nTRECHOS DO TEXTO LIGADOS AO ITEM:\n"
+
+
+def chave_texto(texto):
+    """Mesmo texto com outra caixa/espaçamento (outra transcrição do mesmo ditado) cai na mesma chave."""
+    return hash_texto(normalizar_texto(texto))
+
+
+def _frases(texto):
+    return [f.strip() for f in re.split(r"(?<=[.!?;])\s+|\n+", texto) if f.strip()]
+
+
+def _fatiar(texto):
+    try:
+        return [f for f in criar_fatiador(APOIO_CHUNK, APOIO_CHUNK_OVERLAP).split_text(texto) if f.strip()]
+    except Exception as e:
+        # Sem o splitter: frases agrupadas até o tamanho da fatia
+        print(f"⚠️ Fatiador indisponível, agrupando frases: {e}")
+        fatias, atual = [], ""
+        for frase in _frases(texto):
+            if atual and len(atual) + len(frase) + 1 > APOIO_CHUNK:
+                fatias.append(atual)
+                atual = ""
+            atual = f"{atual} {frase}".strip()
+        return fatias + ([atual] if atual else [])
+
+
+def resumir(frases, vetores, orcamento=APOIO_RESUMO_TOKENS):
+    """
+    Resumo extrativo: frases mais próximas do centro do texto (o tema), com um bônus
+    para a primeira de verdade (costuma apresentar o assunto), até o orçamento, na ordem original.
+    Frases muito curtas ("Texto de apoio.", o gatilho ditado) ficam de fora.
+    """
+    if not frases:
+        return ""
+    centro = vetores.mean(axis=0)
+    centro = centro / (np.linalg.norm(centro) or 1)
+    scores = vetores @ centro
+    candidatas = [i for i, frase in enumerate(frases) if len(frase.split()) >= 5] or list(range(len(frases)))
+    scores[candidatas[0]] += 0.1
+    escolhidas, usado = [], 0
+    for i in sorted(candidatas, key=lambda i: -scores[i]):
+        custo = contar_tokens(frases[i]) + 1
+        if usado + custo <= orcamento:
+            escolhidas.append(int(i))
+            usado += custo
+    return " ".join(frases[i] for i in sorted(escolhidas)) or frases[0]
+
+
+class TextoApoio:
+    """Um texto já preparado: fatias, vetores normalizados (um por fatia) e resumo."""
+    def __init__(self, chave, texto, resumo, fatias, vetores, embedder):
+        self.chave = chave
+        self.texto = texto
+        self.resumo = resumo
+        self.fatias = fatias
+        self.vetores = vetores
+        self.embedder = embedder
+        self.tokens = contar_tokens(texto)
+
+    @property
+    def curto(self):
+        return self.tokens <= APOIO_MINIMO_TOKENS or len(self.fatias) <= APOIO_TOP_K
+
+    def selecionar(self, vetor_item, k=APOIO_TOP_K):
+        """Índices das k fatias mais parecidas com o item, na ordem do texto."""
+        if not self.fatias:
+            return []
+        k = min(k, len(self.fatias))
+        scores = self.vetores @ vetor_item
+        return sorted(int(i) for i in np.argpartition(-scores, k - 1)[:k])
+
+    def memoria(self, vetor_item, k=APOIO_TOP_K):
+        """O que vai no lugar do texto inteiro: resumo + fatias do item ([...] onde pulou)."""
+        if self.curto:
+            return self.texto
+        partes, anterior = [], None
+        for i in self.selecionar(vetor_item, k):
+            if anterior is not None and i != anterior + 1:
+                partes.append(CORTE.strip())
+            partes.append(self.fatias[i])
+            anterior = i
+        trechos = "\n".join(partes)
+        # Frase do resumo que já veio nas fatias não precisa ir duas vezes
+        resumo = " ".join(f for f in _frases(self.resumo) if f not in trechos)
+        if not resumo:
+            return ROTULO_TRECHOS.lstrip("\n") + trechos
+        return ROTULO_RESUMO + resumo + ROTULO_TRECHOS + trechos
+
+
+class MemoriaApoio:
+    """
+    Textos preparados em LRU na memória, na frente de um SQLite (write-through).
+    As sessões guardam só a chave; o texto, as fatias e os vetores ficam aqui uma vez.
+    """
+    def __init__(self, embedder=None, caminho=None, persistir=None, max_memoria=APOIO_MAX_MEMORIA, ttl=APOIO_TTL):
+        self.embedder = embedder or criar_embedder()
+        self.ttl = ttl
+        self._textos = CacheLRU(max_memoria)
+        self._lock = threading.RLock()
+        self._conn = None
+        self._ultima_limpeza = 0.0
+        self.estatisticas = {"preparados": 0, "reaproveitados": 0, "entradas": 0,
+                             "tokens_texto": 0, "tokens_enviados": 0}
+        persistir = os.getenv("APOIO_PERSISTIR", "1") == "1" if persistir is None else persistir
+        if persistir:
+            try:
+                caminho = caminho or APOIO_DB
+                os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+                self._conn = sqlite3.connect(caminho, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("""
+                    CREATE TABLE IF NOT EXISTS apoio (
+                        chave TEXT PRIMARY KEY,
+                        texto TEXT NOT NULL,
+                        resumo TEXT NOT NULL,
+                        fatias TEXT NOT NULL,
+                        embedder TEXT NOT NULL,
+                        vetores BLOB NOT NULL,
+                        criado REAL NOT NULL,
+                        ultimo_uso REAL NOT NULL
+                    )""")
+                self._conn.commit()
+            except Exception as e:
+                print(f"⚠️ Memória de Textos de Apoio sem persistência: {e}")
+                self._conn = None
+
+    @property
+    def _id_embedder(self):
+        """Vetores de outro embedder (ou outra dimensão) não servem: o texto é refeito."""
+        return f"{getattr(self.embedder, 'nome', type(self.embedder).__name__)}:{getattr(self.embedder, 'dim', '?')}"
+
+    # Preparação
+    def _preparar(self, chave, texto):
+        fatias = _fatiar(texto)
+        frases = _frases(texto)
+        vetores = self.embedder.embed_documentos(fatias + frases)
+        resumo = resumir(frases, vetores[len(fatias):])
+        return TextoApoio(chave, texto, resumo, fatias, np.asarray(vetores[:len(fatias)], dtype=np.float32), self._id_embedder)
+
+    def guardar(self, texto):
+        """Prepara (ou reaproveita) o texto e devolve a chave que a sessão deve guardar."""
+        chave = chave_texto(texto)
+        with self._lock:
+            if self.obter(chave) is not None:
+                self.estatisticas["reaproveitados"] += 1
+                return chave
+        inicio = time.perf_counter()
+        preparado = self._preparar(chave, texto.strip())
+        with self._lock:
+            self._textos.set(chave, preparado)
+            self._gravar(preparado)
+            self.estatisticas["preparados"] += 1
+        print(f"📎 Texto de Apoio preparado em {(time.perf_counter() - inicio) * 1000:.0f}ms: "
+              f"{preparado.tokens} tokens, {len(preparado.fatias)} fatias, resumo com {contar_tokens(preparado.resumo)}")
+        return chave
+
+    def obter(self, chave):
+        if not chave:
+            return None
+        with self._lock:
+            preparado = self._textos.get(chave) or self._carregar(chave)
+            if preparado is not None:
+                self._textos.set(chave, preparado)
+            return preparado
+
+    def entrada(self, chave, item, k=APOIO_TOP_K):
+        """
+        Entrada do item (formato de montar_entrada) com resumo + fatias do texto da chave.
+        None se a chave não existe mais (texto vencido ou apagado).
+        """
+        preparado = self.obter(chave)
+        if preparado is None:
+            return None
+        memoria = preparado.texto if preparado.curto else preparado.memoria(self.embedder.embed_consulta(item), k)
+        with self._lock:
+            self.estatisticas["entradas"] += 1
+            self.estatisticas["tokens_texto"] += preparado.tokens
+            self.estatisticas["tokens_enviados"] += contar_tokens(memoria)
+        return montar_entrada(memoria, item)
+
+    # Disco
+    def _gravar(self, preparado):
+        if not self._conn:
+            return
+        agora = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO apoio (chave, texto, resumo, fatias, embedder, vetores, criado, ultimo_uso) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (preparado.chave, preparado.texto, preparado.resumo, json.dumps(preparado.fatias, ensure_ascii=False),
+             preparado.embedder, preparado.vetores.tobytes(), agora, agora),
+        )
+        self._conn.commit()
+
+    def _carregar(self, chave):
+        if not self._conn:
+            return None
+        linha = self._conn.execute(
+            "SELECT texto, resumo, fatias, embedder, vetores, ultimo_uso FROM apoio WHERE chave = ?", (chave,)
+        ).fetchone()
+        if not linha or (self.ttl and time.time() - linha[5] > self.ttl):
+            return None
+        texto, resumo, fatias, embedder, vetores, _ = linha
+        if embedder != self._id_embedder:
+            print(f"🔁 Texto de Apoio {chave[:8]} foi preparado com {embedder}: refazendo com {self._id_embedder}")
+            preparado = self._preparar(chave, texto)
+            self._gravar(preparado)
+            return preparado
+        fatias = json.loads(fatias)
+        vetores = np.frombuffer(vetores, dtype=np.float32).reshape(len(fatias), -1)
+        self._tocar(chave)
+        return TextoApoio(chave, texto, resumo, fatias, vetores, embedder)
+
+    def _tocar(self, chave):
+        agora = time.time()
+        self._conn.execute("UPDATE apoio SET ultimo_uso = ? WHERE chave = ?", (agora, chave))
+        if self.ttl and agora - self._ultima_limpeza > 3600:
+            self._ultima_limpeza = agora
+            self._conn.execute("DELETE FROM apoio WHERE ultimo_uso < ?", (agora - self.ttl,))
+        self._conn.commit()
+
+    def resumo(self):
+        with self._lock:
+            persistidos = self._conn.execute("SELECT COUNT(*) FROM apoio").fetchone()[0] if self._conn else len(self._textos)
+            info = {**self.estatisticas, "em_memoria": len(self._textos), "persistidos": persistidos}
+        if info["tokens_texto"]:
+            info["economia"] = round(1 - info["tokens_enviados"] / info["tokens_texto"], 3)
+        return info
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_preparar = sub.add_parser("preparar", help="Guarda um Texto de Apoio e mostra o resumo")
+    p_preparar.add_argument("arquivo")
+    p_entrada = sub.add_parser("entrada", help="Mostra o que iria no prompt para um item")
+    p_entrada.add_argument("arquivo")
+    p_entrada.add_argument("item")
+    p_entrada.add_argument("-k", type=int, default=APOIO_TOP_K)
+    args = parser.parse_args()
+
+    with open(args.arquivo, encoding="utf-8") as arquivo:
+        texto = arquivo.read().strip()
+    memoria = MemoriaApoio()
+    chave = memoria.guardar(texto)
+    if args.comando == "preparar":
+        print(f"🔑 {chave}\n📝 {memoria.obter(chave).resumo}")
+    else:
+        entrada = memoria.entrada(chave, args.item, args.k)
+        print(entrada)
+        print(f"\n🧮 {contar_tokens(entrada)} tokens (texto inteiro: {contar_tokens(montar_entrada(texto, args.item))})")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
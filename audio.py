@@ -0,0 +1,38 @@
+import os
+import shutil
+
+from pipeline import rodar_subprocesso
+from stt import TAXA_AMOSTRAGEM
+
+# --- FFMPEG (RESOLVIDO UMA VEZ) ---
+def _resolver_ffmpeg():
+    for caminho in (os.getenv("FFMPEG_PATH"), shutil.which("ffmpeg"),
+                    "/usr/bin/ffmpeg", "/usr/local/bin/ffmpeg", "/opt/homebrew/bin/ffmpeg"):
+        if caminho and os.path.exists(caminho):
+            return caminho
+    return "ffmpeg"
+
+
+FFMPEG = _resolver_ffmpeg()
+BITRATE_VOZ = os.getenv("TTS_BITRATE", "32k")
+
+
+# --- CONVERSÕES EM MEMÓRIA (STDIN -> STDOUT, SEM ARQUIVOS TEMPORÁRIOS) ---
+async def converter_audio_nativo(ogg):
+    """Nota de voz do Telegram (bytes OGG/Opus) -> PCM 16 bits mono 16 kHz para o STT."""
+    cmd = [FFMPEG, "-loglevel", "error", "-i", "pipe:0",
+           "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(TAXA_AMOSTRAGEM), "pipe:1"]
+    try:
+        pcm, _ = await rodar_subprocesso("ffmpeg", cmd, entrada=ogg)
+        return pcm
+    except Exception as e:
+        print(f"Erro ffmpeg: {e}")
+        return None
+
+
+async def mp3_para_voz(mp3):
+    """MP3 do gTTS -> OGG/Opus, o formato que o Telegram mostra como nota de voz."""
+    cmd = [FFMPEG, "-loglevel", "error", "-f", "mp3", "-i", "pipe:0",
+           "-ac", "1", "-c:a", "libopus", "-b:a", BITRATE_VOZ, "-application", "voip", "-f", "ogg", "pipe:1"]
+    ogg, _ = await rodar_subprocesso("ffmpeg", cmd, entrada=mp3)
+    return ogg
@@ -0,0 +1,180 @@
+"""
+Benchmark da memória de Textos de Apoio (apoio.py): texto inteiro em cada item x resumo + fatias.
+
+Sobe os LLMs falsos (servicos_falsos.py) com um custo de prefill por token de prompt
+(--prefill ms por 1000 tokens, além da --latencia fixa) e julga itens de um Texto de Apoio
+longo pela Fase 1 rápida (processar_fase1, uma chamada JSON por item), sem RAG nem Wikipédia,
+para isolar o peso do texto. Para cada quantidade de itens por texto (--itens 1,3,5,10) mede:
+
+- tokens de prompt por item (o que o LLM falso recebeu)
+- latência por item, com a preparação do texto (fatiar + embeddings + resumo) rateada entre os itens
+- cobertura: itens cuja entrada ainda traz o trecho do texto que o item cobra
+
+E também a reabertura: outra MemoriaApoio no mesmo SQLite (restart ou outra sessão) acha o
+texto pela chave sem prepará-lo de novo.
+
+Uso: python benchmarks/bench_apoio.py --latencia 250 --prefill 150 --itens 1,3,5,10 [--json apoio.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from servicos_falsos import ServicosFalsos, Perfil
+from bench_offline import LoopServicos
+
+# Texto de Apoio no tamanho dos da prova discursiva/objetiva do CACD (~9 parágrafos)
+TEXTO = """Texto de apoio. A política externa brasileira do século XX foi marcada pela busca de autonomia em um sistema internacional assimétrico. Desde a gestão do Barão do Rio Branco no Itamaraty, a diplomacia privilegiou a solução negociada das questões de limites, o que permitiu ao país consolidar suas fronteiras sem recorrer à guerra e aproximar-se dos Estados Unidos como contrapeso às potências europeias.
+
+Nas décadas de 1930 e 1940, Getúlio Vargas praticou a chamada equidistância pragmática, barganhando entre Washington e Berlim. A entrada do Brasil na Segunda Guerra Mundial ao lado dos Aliados rendeu o financiamento da Companhia Siderúrgica Nacional, em Volta Redonda, e o envio da Força Expedicionária Brasileira à Itália, episódio que reforçou a pretensão brasileira a um assento permanente no futuro Conselho de Segurança.
+
+Com o início da Guerra Fria, o alinhamento automático aos Estados Unidos não trouxe a contrapartida esperada. O Plano Marshall destinou recursos à reconstrução europeia, e a América Latina recebeu pouca atenção. Juscelino Kubitschek respondeu com a Operação Pan-Americana, de 1958, que vinculava a segurança do hemisfério ao combate ao subdesenvolvimento e antecipou a criação do Banco Interamericano de Desenvolvimento.
+
+A Política Externa Independente, formulada por San Tiago Dantas e Afonso Arinos nos governos Jânio Quadros e João Goulart, defendeu a universalização das relações, o reatamento com a União Soviética e a recusa de sanções contra Cuba na reunião de Punta del Este. O golpe de 1964 interrompeu essa linha, e o governo Castello Branco retomou o alinhamento com a teoria dos círculos concêntricos.
+
+No governo Geisel, o pragmatismo responsável e ecumênico recuperou a autonomia: o Brasil reconheceu a independência de Angola sob o governo do MPLA, assinou o Acordo Nuclear com a Alemanha Ocidental em 1975 e votou na ONU a favor da resolução que equiparava o sionismo ao racismo, decisões que provocaram atritos com Washington.
+
+A redemocratização trouxe a aproximação com a Argentina. A Declaração de Iguaçu, de 1985, assinada por Sarney e Alfonsín, superou a rivalidade nuclear e abriu caminho para o Tratado de Assunção, de 1991, que criou o Mercado Comum do Sul com Paraguai e Uruguai. O Protocolo de Ouro Preto, de 1994, deu ao bloco personalidade jurídica internacional e estrutura institucional definitiva.
+
+Na década de 1990, a agenda da autonomia pela participação levou o Brasil a aderir ao Tratado de Não Proliferação de Armas Nucleares em 1998 e ao Regime de Controle de Tecnologia de Mísseis. A participação ativa nas negociações da Rodada Uruguai e a criação da Organização Mundial do Comércio, em 1995, consolidaram a opção pelo multilateralismo comercial.
+
+Nos anos 2000, a estratégia de autonomia pela diversificação privilegiou as coalizões Sul-Sul. O Brasil liderou o G20 comercial na conferência ministerial de Cancún, em 2003, integrou o fórum IBAS com Índia e África do Sul e participou da formação do BRICS, cuja primeira cúpula ocorreu em Ecaterimburgo, em 2009. A União de Nações Sul-Americanas, criada em 2008, ampliou a integração para além do comércio.
+
+No plano da segurança, o Brasil comandou o componente militar da Missão das Nações Unidas para a Estabilização no Haiti entre 2004 e 2017, experiência que a diplomacia apresentou como prova de capacidade para responsabilidades globais. Críticos apontam, contudo, que a presença no Haiti não alterou a resistência dos membros permanentes à reforma do Conselho de Segurança."""
+
+# (item, trecho que precisa estar na entrada para o item ser julgável)
+ITENS = [
+    ("Julgue o item: o Barão do Rio Branco privilegiou a solução negociada das questões de limites.", "Rio Branco"),
+    ("Julgue o item: a Força Expedicionária Brasileira foi enviada à Itália durante o governo Vargas.", "Força Expedicionária"),
+    ("Julgue o item: a Operação Pan-Americana foi lançada por Juscelino Kubitschek em 1958.", "Operação Pan-Americana"),
+    ("Julgue o item: a Política Externa Independente apoiou as sanções contra Cuba em Punta del Este.", "Punta del Este"),
+    ("Julgue o item: o governo Geisel reconheceu a independência de Angola sob o MPLA.", "Angola"),
+    ("Julgue o item: a Declaração de Iguaçu foi assinada por Sarney e Alfonsín em 1985.", "Declaração de Iguaçu"),
+    ("Julgue o item: o Protocolo de Ouro Preto deu personalidade jurídica internacional ao Mercosul.", "Ouro Preto"),
+    ("Julgue o item: o Brasil aderiu ao Tratado de Não Proliferação de Armas Nucleares em 1998.", "Não Proliferação"),
+    ("Julgue o item: a primeira cúpula do BRICS ocorreu em Ecaterimburgo, em 2009.", "Ecaterimburgo"),
+    ("Julgue o item: o Brasil comandou o componente militar da missão da ONU no Haiti até 2017.", "Haiti entre 2004"),
+]
+
+
+def configurar_ambiente(servicos, pasta):
+    """Só os LLMs falsos; RAG vazio e cache desligado (cada item paga a chamada)."""
+    os.environ.update({
+        "GROQ_API_KEY": "falsa", "GROQ_BASE_URL": servicos.url, "GROQ_MODEL": "llama-3.3-70b-versatile",
+        "GEMINI_API_KEY": "falsa", "GOOGLE_API_KEY": "falsa", "GEMINI_API_ENDPOINT": servicos.url,
+        "GEMINI_MODEL": "gemini-2.0-flash", "WIKI_API_URL": f"{servicos.url}/w/api.php",
+        "CACHE_DIR": pasta, "RAG_DIR": os.path.join(pasta, "rag"), "RAG_EMBEDDER": "hash",
+        "APOIO_DB": os.path.join(pasta, "apoio.sqlite3"), "CACHE_FASES": "-", "METRICAS_PORTA": "0",
+        "LIMITE_RPM_GROQ": "1000000", "LIMITE_TPM_GROQ": "1000000000",
+        "LIMITE_RPM_GEMINI": "1000000", "LIMITE_TPM_GEMINI": "1000000000",
+    })
+
+
+def julgar(ia, servicos, entradas):
+    """processar_fase1 item a item (como handle_audio); tokens de prompt e latência de cada um."""
+    resultados = []
+    for entrada in entradas:
+        antes = sum(servicos.tokens_prompt.values())
+        inicio = time.perf_counter()
+        ia.processar_fase1({'user_input': entrada, 'contexto': "", 'fase': '1', 'prioridade': 'groq', 'sem_cache': True})
+        resultados.append((sum(servicos.tokens_prompt.values()) - antes, time.perf_counter() - inicio))
+    return resultados
+
+
+def rodar(ia, servicos, quantidade, modo):
+    from apoio import MemoriaApoio
+    from orcamento import montar_entrada
+    itens = [ITENS[i % len(ITENS)] for i in range(quantidade)]
+    preparo = 0.0
+    if modo == "inteiro":
+        entradas = [montar_entrada(TEXTO, item) for item, _ in itens]
+    else:
+        # Memória nova a cada rodada: o texto é preparado do zero e o custo entra na conta
+        memoria = MemoriaApoio(embedder=ia.apoio.embedder, persistir=False)
+        inicio = time.perf_counter()
+        chave = memoria.guardar(TEXTO)
+        entradas = [memoria.entrada(chave, item) for item, _ in itens]
+        preparo = time.perf_counter() - inicio
+    medidas = julgar(ia, servicos, entradas)
+    tokens = [t for t, _ in medidas]
+    latencias = [s + preparo / quantidade for _, s in medidas]
+    return {
+        "modo": modo, "itens": quantidade,
+        "tokens_por_item": round(statistics.mean(tokens), 1),
+        "latencia_por_item_ms": round(statistics.mean(latencias) * 1000, 1),
+        "preparo_ms": round(preparo * 1000, 1),
+        "cobertura": round(sum(trecho in entrada for entrada, (_, trecho) in zip(entradas, itens)) / quantidade, 3),
+    }
+
+
+def reabertura(pasta):
+    """Primeira sessão prepara e grava; outra instância (restart) acha pela chave sem refazer."""
+    from apoio import MemoriaApoio, chave_texto
+    caminho = os.path.join(pasta, "reabertura.sqlite3")
+    inicio = time.perf_counter()
+    MemoriaApoio(caminho=caminho).guardar(TEXTO)
+    primeira = time.perf_counter() - inicio
+    outra = MemoriaApoio(caminho=caminho)
+    inicio = time.perf_counter()
+    # Outra transcrição do mesmo ditado (caixa e espaços diferentes) cai na mesma chave
+    chave = outra.guardar("  " + TEXTO.upper().replace(". ", ".  ") + " ")
+    segunda = time.perf_counter() - inicio
+    return {"preparo_ms": round(primeira * 1000, 1), "reabertura_ms": round(segunda * 1000, 1),
+            "mesma_chave": chave == chave_texto(TEXTO), "reaproveitados": outra.estatisticas["reaproveitados"],
+            "preparados_na_reabertura": outra.estatisticas["preparados"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latencia", type=float, default=250, help="latência fixa do LLM falso (ms)")
+    parser.add_argument("--prefill", type=float, default=150, help="ms a mais por 1000 tokens de prompt")
+    parser.add_argument("--itens", default="1,3,5,10", help="itens por Texto de Apoio")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    args = parser.parse_args()
+
+    loop = LoopServicos()
+    servicos = loop.rodar(ServicosFalsos({"groq": Perfil(args.latencia / 1000), "gemini": Perfil(args.latencia / 1000)}).iniciar())
+    servicos.prefill = args.prefill / 1000
+    pasta = tempfile.mkdtemp(prefix="bench-apoio-")
+    configurar_ambiente(servicos, pasta)
+    from bot import ResolveIaBlindado
+    from orcamento import contar_tokens
+    ia = ResolveIaBlindado()
+    # Aquecimento: clientes do LLM e o import do fatiador fora da conta
+    julgar(ia, servicos, [ITENS[0][0]])
+    ia.apoio.guardar(TEXTO)
+    print(f"📄 Texto de Apoio: {contar_tokens(TEXTO)} tokens; LLM falso {args.latencia:.0f}ms + {args.prefill:.0f}ms/1000 tokens")
+
+    resultados = [rodar(ia, servicos, int(n), modo) for n in args.itens.split(",") for modo in ("inteiro", "memoria")]
+    print(f"\n{'itens':>6}{'modo':>10}{'tokens/item':>13}{'latência/item':>15}{'preparo':>10}{'cobertura':>11}")
+    for r in resultados:
+        print(f"{r['itens']:>6}{r['modo']:>10}{r['tokens_por_item']:>13.0f}{r['latencia_por_item_ms']:>13.0f}ms"
+              f"{r['preparo_ms']:>8.0f}ms{r['cobertura']:>11.0%}")
+    por_chave = {(r["itens"], r["modo"]): r for r in resultados}
+    for n in args.itens.split(","):
+        inteiro, memoria = por_chave[(int(n), "inteiro")], por_chave[(int(n), "memoria")]
+        print(f"   {n} itens: {1 - memoria['tokens_por_item'] / inteiro['tokens_por_item']:.0%} menos tokens, "
+              f"{inteiro['latencia_por_item_ms'] - memoria['latencia_por_item_ms']:.0f}ms a menos por item")
+
+    reaberto = reabertura(pasta)
+    print(f"\n🔁 Reabertura (restart/outra sessão): preparo {reaberto['preparo_ms']:.1f}ms -> "
+          f"{reaberto['reabertura_ms']:.1f}ms, mesma chave: {reaberto['mesma_chave']}, "
+          f"preparados de novo: {reaberto['preparados_na_reabertura']}")
+
+    loop.rodar(servicos.parar())
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as arquivo:
+            json.dump({"quando": time.strftime("%Y-%m-%dT%H:%M:%S"), "latencia_ms": args.latencia,
+                       "prefill_ms": args.prefill, "resultados": resultados, "reabertura": reaberto},
+                      arquivo, ensure_ascii=False, indent=2)
+        print(f"\n💾 Resultados em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
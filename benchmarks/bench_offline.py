@@ -0,0 +1,309 @@
+"""
+Benchmark offline de ponta a ponta: processar e handle_audio contra servidores falsos.
+
+Sobe localmente Groq, Gemini, MediaWiki e Google STT (servicos_falsos.py) e o Telegram
+(telegram_falso.py), aponta o bot para eles por variáveis de ambiente (GROQ_BASE_URL,
+GEMINI_API_ENDPOINT, WIKI_API_URL, STT_GOOGLE_URL, TELEGRAM_BASE_URL/TELEGRAM_BASE_FILE_URL)
+e mede vazão, latência de ponta a ponta e p50/p95/p99 por etapa (spans da telemetria).
+
+- processar:    ResolveIaBlindado.processar / processar_fase1 em --concorrencia threads.
+- handle_audio: o bot real (bot_telegram) em long polling contra o Telegram falso; cada nota
+                de voz é um chat novo; mede da criação do update até o sendVoice.
+
+Sem ffmpeg instalado (ou sem --ffmpeg-real), um ffmpeg falso repassa o áudio com a latência
+do perfil "ffmpeg". O gTTS não tem endpoint configurável: a síntese vira um atraso do perfil "tts".
+Cotas do agendador ficam altas (meça o código, não o limite) salvo com --cotas-reais.
+
+Perfis: --perfil groq=800:0.05:200 (ms : taxa de erro : jitter ms [: status HTTP]).
+Uso: python benchmarks/bench_offline.py --modos processar,handle_audio --requisicoes 40 \\
+         --concorrencia 8 --json resultados.json [--comparar anterior.json]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from servicos_falsos import ServicosFalsos, Perfil
+from telegram_falso import ServidorTelegramFalso, GeradorUpdates, TOKEN_FALSO
+
+PERFIS_PADRAO = {
+    "groq": "350:0:100", "gemini": "600:0:150", "wiki": "120:0:40", "stt": "400:0:100",
+    "telegram": "20", "tts": "250:0:50", "ffmpeg": "40",
+}
+ITENS = [
+    "A ONU foi criada em 1945, após a Segunda Guerra Mundial.",
+    "O Mercosul foi criado em 1991 pelo Tratado de Assunção.",
+    "A OEA tem sede em Genebra.",
+    "O Brasil é membro fundador da Organização Mundial do Comércio.",
+    "O BRICS realizou sua primeira cúpula em 2009, em Ecaterimburgo.",
+    "A Unasul foi criada em 2008 pelo Tratado de Brasília.",
+    "O G20 financeiro reúne apenas países europeus.",
+    "O Tratado de Tordesilhas foi assinado em 1494.",
+    "A Conferência de Bretton Woods criou o FMI e o BIRD.",
+    "O Barão do Rio Branco chefiou o Itamaraty entre 1902 e 1912.",
+]
+# Como o STT "ouviria" cada item (passa pelo normalizador ou pelo Agente Editor)
+TRANSCRICOES = [f"e tem {i} {item.lower().rstrip('.')}" for i, item in enumerate(ITENS, 1)]
+
+
+# --- INFRAESTRUTURA ---
+class LoopServicos:
+    """Event loop próprio numa thread: os falsos respondem mesmo com o loop do bot ocupado."""
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True, name="servicos-falsos").start()
+
+    def rodar(self, corrotina):
+        return asyncio.run_coroutine_threadsafe(corrotina, self.loop).result()
+
+
+def criar_ffmpeg_falso(pasta, latencia):
+    caminho = os.path.join(pasta, "ffmpeg_falso.py")
+    with open(caminho, "w") as arquivo:
+        arquivo.write(f"#!{sys.executable} -S\nimport sys, time\ntime.sleep({latencia})\n"
+                      "sys.stdout.buffer.write(sys.stdin.buffer.read())\n")
+    os.chmod(caminho, 0o755)
+    return caminho
+
+
+def gerar_audios(ffmpeg_real, segundos=3):
+    """(nota de voz, MP3 do TTS): reais via ffmpeg, ou PCM cru repassado pelo ffmpeg falso."""
+    silencio = bytes(16000 * 2 * segundos)
+    if not ffmpeg_real:
+        return silencio, bytes(4096)
+    def ffmpeg(*args, entrada=None):
+        return subprocess.run([ffmpeg_real, "-hide_banner", "-loglevel", "error", *args],
+                              input=entrada, capture_output=True, check=True).stdout
+    nota = ffmpeg("-f", "s16le", "-ar", "16000", "-ac", "1", "-i", "pipe:0", "-c:a", "libopus", "-f", "ogg", "pipe:1",
+                  entrada=silencio)
+    mp3 = ffmpeg("-f", "lavfi", "-i", "anullsrc=r=24000:cl=mono", "-t", "1", "-f", "mp3", "pipe:1")
+    return nota, mp3
+
+
+def configurar_ambiente(args, servicos, telegram, pasta, ffmpeg):
+    """Tudo aponta para os falsos; nada sai para a rede. Precisa vir antes de importar o bot."""
+    ambiente = {
+        "GROQ_API_KEY": "falsa", "GROQ_BASE_URL": servicos.url, "GROQ_MODEL": args.modelo_groq,
+        "GEMINI_API_KEY": "falsa", "GOOGLE_API_KEY": "falsa", "GEMINI_API_ENDPOINT": servicos.url,
+        "GEMINI_MODEL": args.modelo_gemini,
+        "WIKI_API_URL": f"{servicos.url}/w/api.php", "WIKI_MODO": "online",
+        "STT_BACKEND": "google", "STT_GOOGLE_URL": f"{servicos.url}/speech-api/v2/recognize",
+        "TELEGRAM_TOKEN": TOKEN_FALSO, "TELEGRAM_BASE_URL": telegram.base_url,
+        "TELEGRAM_BASE_FILE_URL": telegram.base_file_url,
+        "CACHE_DIR": pasta, "RAG_DIR": os.path.join(pasta, "rag"), "RAG_EMBEDDER": "hash",
+        "CACHE_FASES": "1,2" if args.com_cache else "-", "METRICAS_PORTA": "0", "FFMPEG_PATH": ffmpeg,
+        "BOT_CONCURRENT_UPDATES": str(args.concorrencia), "FASE1_RAPIDA": "0" if args.sem_fase1_rapida else "1",
+    }
+    if not args.cotas_reais:
+        for provedor in ("GROQ", "GEMINI"):
+            ambiente[f"LIMITE_RPM_{provedor}"] = "1000000"
+            ambiente[f"LIMITE_TPM_{provedor}"] = "1000000000"
+    os.environ.update(ambiente)
+
+
+def etapas():
+    from metricas import telemetria
+    return [{"etapa": etapa, "provedor": provedor, **info} for (etapa, provedor), info in telemetria.percentis().items()]
+
+
+def resumo_latencias(latencias, erros, duracao):
+    from despacho import percentil
+    return {
+        "ok": len(latencias), "erros": erros, "duracao_s": round(duracao, 3),
+        "vazao_por_s": round(len(latencias) / duracao, 2) if duracao else None,
+        "latencia": {p: round(percentil(latencias, int(p[1:])), 4) if latencias else None for p in ("p50", "p95", "p99")},
+    }
+
+
+# --- MODO processar ---
+def rodar_processar(args):
+    from bot import ResolveIaBlindado, FASE1_RAPIDA
+    from metricas import telemetria
+    ia = ResolveIaBlindado()
+    telemetria.zerar()
+
+    def uma(i):
+        # Número no fim: itens distintos mesmo com --com-cache desligado por engano
+        inputs = {'user_input': f"{ITENS[i % len(ITENS)]} ({i})", 'fase': args.fase,
+                  'prioridade': args.prioridade, 'politica': args.politica}
+        inicio = time.perf_counter()
+        if args.fase == '1' and FASE1_RAPIDA:
+            _, _, label = ia.processar_fase1(inputs)
+        else:
+            _, label = ia.processar(inputs)
+        return time.perf_counter() - inicio, "Offline" in label
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concorrencia) as pool:
+        resultados = list(pool.map(uma, range(args.requisicoes)))
+    duracao = time.perf_counter() - inicio
+    latencias = [l for l, falhou in resultados if not falhou]
+    return {**resumo_latencias(latencias, len(resultados) - len(latencias), duracao),
+            "tokens": telemetria.totais("llm"), "etapas": etapas()}
+
+
+# --- MODO handle_audio ---
+async def _handle_audio(args, telegram, nota, mp3, perfil_tts):
+    import bot_telegram
+    from metricas import telemetria
+    state = bot_telegram.preparar("bench")
+    state.canal.definir("fase_atual", args.fase)
+    state.canal.definir("modelo_prioridade", args.prioridade)
+    state.canal.definir("politica_despacho", args.politica)
+
+    def gtts_falso(texto):
+        time.sleep(max(0.0, perfil_tts.latencia))
+        return mp3
+    bot_telegram.tts._gtts = gtts_falso
+    telemetria.zerar()
+
+    app = bot_telegram.construir_app(TOKEN_FALSO, args.concorrencia)
+    gerador = GeradorUpdates(semente=args.semente)
+    await app.initialize()
+    await app.start()
+    await app.updater.start_polling(poll_interval=0.0, timeout=10)
+    try:
+        inicio = time.perf_counter()
+        chats = {}
+        for _ in range(args.requisicoes):
+            update = gerador.criar_voz(telegram, nota)
+            chats[update["update_id"]] = update["message"]["chat"]["id"]
+            telegram.enfileirar(update)
+            if args.taxa:
+                await asyncio.sleep(1 / args.taxa)
+        limite = time.perf_counter() + args.limite
+        while len(telegram.vozes) + len(telegram.erros) < len(chats) and time.perf_counter() < limite:
+            await asyncio.sleep(0.02)
+        duracao = time.perf_counter() - inicio
+    finally:
+        await app.updater.stop()
+        await app.stop()
+        await app.shutdown()
+
+    latencias = [telegram.vozes[chat] - gerador.enviados[u] for u, chat in chats.items() if chat in telegram.vozes]
+    return {**resumo_latencias(latencias, len(chats) - len(latencias), duracao),
+            "tokens": telemetria.totais("llm"), "etapas": etapas()}
+
+
+def rodar_handle_audio(args, telegram, nota, mp3, perfil_tts):
+    return asyncio.run(_handle_audio(args, telegram, nota, mp3, perfil_tts))
+
+
+# --- COMPARAÇÃO ENTRE RODADAS ---
+def comparar(atual, caminho):
+    with open(caminho, encoding="utf-8") as arquivo:
+        anterior = json.load(arquivo)
+    print(f"\n📊 Comparação com {caminho} (p50 / p95, variação relativa)")
+    for modo, dados in atual["modos"].items():
+        antes = anterior.get("modos", {}).get(modo)
+        if not antes:
+            continue
+        linhas = [("total", "", antes["latencia"], dados["latencia"])]
+        por_chave = {(e["etapa"], e["provedor"]): e for e in antes.get("etapas", [])}
+        linhas += [(e["etapa"], e["provedor"], por_chave[(e["etapa"], e["provedor"])], e)
+                   for e in dados["etapas"] if (e["etapa"], e["provedor"]) in por_chave]
+        print(f"  {modo}: vazão {antes['vazao_por_s']} -> {dados['vazao_por_s']}/s")
+        for etapa, provedor, a, d in linhas:
+            variacoes = []
+            for p in ("p50", "p95"):
+                if a.get(p) and d.get(p) is not None:
+                    variacoes.append(f"{p} {a[p]:.3f}->{d[p]:.3f}s ({(d[p] - a[p]) / a[p]:+.0%})")
+            if variacoes:
+                print(f"    {etapa:<16}{provedor:<10}" + "  ".join(variacoes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modos", default="processar,handle_audio")
+    parser.add_argument("--requisicoes", type=int, default=40)
+    parser.add_argument("--concorrencia", type=int, default=8)
+    parser.add_argument("--taxa", type=float, default=0, help="notas por segundo no handle_audio (0 = rajada)")
+    parser.add_argument("--fase", choices=("1", "2"), default="1")
+    parser.add_argument("--prioridade", choices=("groq", "gemini"), default="groq")
+    parser.add_argument("--politica", default="sequencial")
+    parser.add_argument("--perfil", action="append", default=[], help="servico=latencia_ms[:erro[:jitter_ms[:status]]]")
+    parser.add_argument("--palavras-resposta", type=int, default=250, help="tamanho das redações falsas (Fase 2)")
+    parser.add_argument("--modelo-groq", default="llama-3.3-70b-versatile")
+    parser.add_argument("--modelo-gemini", default="gemini-2.0-flash")
+    parser.add_argument("--com-cache", action="store_true", help="liga o cache de respostas")
+    parser.add_argument("--sem-fase1-rapida", action="store_true")
+    parser.add_argument("--cotas-reais", action="store_true", help="mantém os limites RPM/TPM do agendador")
+    parser.add_argument("--ffmpeg-real", action="store_true", help="usa o ffmpeg instalado (senão, o falso)")
+    parser.add_argument("--limite", type=float, default=300, help="espera máxima pelas respostas (s)")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    parser.add_argument("--comparar", help="JSON de uma rodada anterior para comparar")
+    args = parser.parse_args()
+
+    perfis = {nome: Perfil.ler(valor) for nome, valor in PERFIS_PADRAO.items()}
+    for item in args.perfil:
+        nome, valor = item.split("=", 1)
+        perfis[nome] = Perfil.ler(valor)
+
+    ffmpeg_real = shutil.which("ffmpeg") if args.ffmpeg_real else None
+    if args.ffmpeg_real and not ffmpeg_real:
+        sys.exit("❌ --ffmpeg-real pedido, mas não há ffmpeg no PATH")
+
+    pasta = tempfile.mkdtemp(prefix="bench-offline-")
+    loop = LoopServicos()
+    servicos = loop.rodar(ServicosFalsos(perfis, args.palavras_resposta, args.semente).iniciar())
+    servicos.transcricoes = TRANSCRICOES
+    telegram = loop.rodar(ServidorTelegramFalso(latencia=perfis["telegram"].latencia).iniciar())
+    ffmpeg = ffmpeg_real or criar_ffmpeg_falso(pasta, perfis["ffmpeg"].latencia)
+    configurar_ambiente(args, servicos, telegram, pasta, ffmpeg)
+    nota, mp3 = gerar_audios(ffmpeg_real)
+
+    resultado = {
+        "quando": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "comparar", "perfil")},
+        "perfis": {nome: repr(perfil) for nome, perfil in perfis.items()},
+        "ffmpeg": "real" if ffmpeg_real else "falso",
+        "modos": {},
+    }
+    try:
+        for modo in args.modos.split(","):
+            print(f"\n▶️ {modo}: {args.requisicoes} requisições, concorrência {args.concorrencia}, Fase {args.fase}")
+            if modo == "processar":
+                dados = rodar_processar(args)
+            elif modo == "handle_audio":
+                dados = rodar_handle_audio(args, telegram, nota, mp3, perfis["tts"])
+            else:
+                sys.exit(f"❌ Modo desconhecido: {modo}")
+            dados["chamadas_servicos"] = dict(servicos.chamadas)
+            servicos.chamadas.clear()
+            resultado["modos"][modo] = dados
+    finally:
+        loop.rodar(servicos.parar())
+        loop.rodar(telegram.parar())
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    for modo, dados in resultado["modos"].items():
+        lat = dados["latencia"]
+        print(f"\n✅ {modo}: {dados['ok']} ok, {dados['erros']} erros em {dados['duracao_s']}s "
+              f"({dados['vazao_por_s']}/s) | p50 {lat['p50']}s p95 {lat['p95']}s p99 {lat['p99']}s | "
+              f"tokens {dados['tokens']['tokens_entrada']} entrada / {dados['tokens']['tokens_saida']} saída")
+        print(f"   {'etapa':<16}{'provedor':<10}{'n':>5}{'erros':>7}{'p50':>9}{'p95':>9}{'p99':>9}")
+        for e in dados["etapas"]:
+            print(f"   {e['etapa']:<16}{e['provedor']:<10}{e['n']:>5}{e['erros']:>7}"
+                  f"{e['p50']:>9.3f}{e['p95']:>9.3f}{e['p99']:>9.3f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as arquivo:
+            json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+        print(f"\n💾 Resultados em {args.json}")
+    if args.comparar:
+        comparar(resultado, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
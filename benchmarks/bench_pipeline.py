@@ -0,0 +1,68 @@
+"""
+Benchmark do pipeline de áudio: N notas de voz simultâneas.
+
+Simula as etapas do handle_audio com latências fixas (sem rede, sem chaves):
+ffmpeg (subprocesso real), STT, limpeza, LLM e TTS (chamadas bloqueantes).
+
+- "bloqueante": o handler chama tudo direto no loop (comportamento antigo).
+- "pipeline":   subprocesso assíncrono + pool de threads com limites por etapa.
+
+Uso: python benchmarks/bench_pipeline.py --notas 8
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline import rodar_em_thread, rodar_subprocesso
+
+LATENCIAS = {"ffmpeg": 0.15, "stt": 0.4, "limpeza": 0.3, "llm": 0.8, "tts": 0.3}
+
+
+def _cmd_ffmpeg_falso():
+    return [sys.executable, "-c", f"import time; time.sleep({LATENCIAS['ffmpeg']})"]
+
+
+def _etapa_bloqueante(nome):
+    time.sleep(LATENCIAS[nome])
+    return nome
+
+
+async def nota_bloqueante():
+    subprocess.run(_cmd_ffmpeg_falso(), check=True)
+    for etapa in ("stt", "limpeza", "llm", "tts"):
+        _etapa_bloqueante(etapa)
+
+
+async def nota_pipeline():
+    await rodar_subprocesso("ffmpeg", _cmd_ffmpeg_falso())
+    await rodar_em_thread("stt", _etapa_bloqueante, "stt")
+    await rodar_em_thread("llm", _etapa_bloqueante, "limpeza")
+    await rodar_em_thread("llm", _etapa_bloqueante, "llm")
+    await rodar_em_thread("tts", _etapa_bloqueante, "tts")
+
+
+async def medir(handler, n):
+    inicio = time.perf_counter()
+    await asyncio.gather(*(handler() for _ in range(n)))
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--notas", type=int, default=8)
+    args = parser.parse_args()
+
+    uma = asyncio.run(medir(nota_pipeline, 1))
+    print(f"1 nota (pipeline):             {uma:.2f}s")
+    for nome, handler in (("bloqueante", nota_bloqueante), ("pipeline", nota_pipeline)):
+        total = asyncio.run(medir(handler, args.notas))
+        print(f"{args.notas} notas ({nome:<10}):      {total:.2f}s  ({total / uma:.1f}x o tempo de uma)")
+
+
+if __name__ == "__main__":
+    main()
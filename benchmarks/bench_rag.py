@@ -0,0 +1,69 @@
+"""
+Benchmark do índice RAG local: recall@k e latência de consulta vs tamanho do corpus.
+
+Gera vetores sintéticos agrupados (sem rede, sem PDFs), mede a busca exata
+(varredura do memmap) e a busca IVF, usando a exata como gabarito.
+
+Uso: python benchmarks/bench_rag.py --tamanhos 5000 20000 100000 --dim 256
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag import IndiceLocal
+
+
+def corpus_sintetico(n, dim, grupos, rng):
+    centros = rng.standard_normal((grupos, dim)).astype(np.float32)
+    vetores = centros[rng.integers(0, grupos, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vetores / np.linalg.norm(vetores, axis=1, keepdims=True)
+
+
+def medir(indice, consultas, k):
+    resultados, tempos = [], []
+    for consulta in consultas:
+        inicio = time.perf_counter()
+        resultados.append({m["id"] for _, m in indice.buscar(consulta, k)})
+        tempos.append(time.perf_counter() - inicio)
+    return resultados, np.array(tempos) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[5000, 20000, 100000])
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("-k", type=int, default=4)
+    parser.add_argument("--nprobe", type=int, default=8)
+    args = parser.parse_args()
+    rng = np.random.default_rng(42)
+
+    print(f"{'N':>8} | {'exata p50':>9} {'p95':>7} | {'IVF p50':>8} {'p95':>7} | recall@{args.k}")
+    for n in args.tamanhos:
+        vetores = corpus_sintetico(n, args.dim, grupos=max(8, n // 500), rng=rng)
+        consultas = vetores[rng.choice(n, args.consultas, replace=False)] + 0.1 * rng.standard_normal((args.consultas, args.dim)).astype(np.float32)
+        consultas /= np.linalg.norm(consultas, axis=1, keepdims=True)
+        with tempfile.TemporaryDirectory() as pasta:
+            indice = IndiceLocal(pasta, nprobe=args.nprobe)
+            indice.LIMIAR_IVF = 10 ** 12  # primeiro sem IVF: gabarito exato
+            indice.upsert([str(i) for i in range(n)], vetores, [{} for _ in range(n)])
+            indice.salvar()
+            exatos, t_exato = medir(indice, consultas, args.k)
+
+            indice.LIMIAR_IVF = 0
+            indice.salvar()
+            aproximados, t_ivf = medir(indice, consultas, args.k)
+
+        recall = np.mean([len(a & e) / len(e) for a, e in zip(aproximados, exatos)])
+        print(f"{n:>8} | {np.percentile(t_exato, 50):>7.2f}ms {np.percentile(t_exato, 95):>5.2f}ms | "
+              f"{np.percentile(t_ivf, 50):>6.2f}ms {np.percentile(t_ivf, 95):>5.2f}ms | {recall:.3f}")
+
+
+if __name__ == "__main__":
+    main()
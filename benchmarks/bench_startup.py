@@ -0,0 +1,198 @@
+"""
+Benchmark de subida (cold start): tempo de import e tempo até o primeiro update atendido.
+
+1. Import: cada módulo em um processo novo (--repeticoes vezes, mediana). --detalhar mostra
+   os imports mais caros do worker (python -X importtime).
+2. Worker: sobe `python worker.py` contra os servidores falsos de bench_offline.py (LLMs,
+   Wikipédia, STT e Telegram), manda uma nota de voz e mede, a partir do Popen:
+   - getMe:      o bot falou com o Telegram pela primeira vez (imports + preparar())
+   - polling:    primeiro getUpdates (pronto para receber)
+   - resposta:   sendVoice da primeira nota
+   Cada variante de AQUECIMENTO (0, local, 1) é medida; --atraso manda a nota alguns
+   segundos depois do polling, como um usuário que chega logo após um redeploy.
+
+Uso: python benchmarks/bench_startup.py --repeticoes 3 --aquecimento 0,1 [--atraso 2] [--json subida.json]
+"""
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from servicos_falsos import ServicosFalsos, Perfil
+from telegram_falso import ServidorTelegramFalso, GeradorUpdates
+from bench_offline import (PERFIS_PADRAO, TRANSCRICOES, LoopServicos, configurar_ambiente,
+                           criar_ffmpeg_falso, gerar_audios)
+
+MODULOS = ["main", "bot", "bot_telegram", "worker"]
+
+
+# --- 1. IMPORTS ---
+def tempo_import(modulo, ambiente):
+    codigo = f"import time; t = time.perf_counter(); import {modulo}; print(time.perf_counter() - t)"
+    saida = subprocess.run([sys.executable, "-W", "ignore", "-c", codigo], cwd=RAIZ, env=ambiente,
+                           capture_output=True, text=True, timeout=120)
+    if saida.returncode:
+        raise RuntimeError(f"import {modulo} falhou: {saida.stderr.strip()[-300:]}")
+    return float(saida.stdout.strip().splitlines()[-1])
+
+
+def imports_mais_caros(modulo, ambiente, n=12):
+    """Primeiro nível de cada pacote, pelo tempo acumulado do -X importtime."""
+    saida = subprocess.run([sys.executable, "-W", "ignore", "-X", "importtime", "-c", f"import {modulo}"],
+                           cwd=RAIZ, env=ambiente, capture_output=True, text=True, timeout=120)
+    custos = {}
+    for linha in saida.stderr.splitlines():
+        if not linha.startswith("import time:") or "|" not in linha:
+            continue
+        _, acumulado, nome = linha.split("|")
+        if not acumulado.strip().isdigit():
+            continue
+        raiz = nome.strip().split(".")[0]
+        custos[raiz] = max(custos.get(raiz, 0), int(acumulado) / 1e6)
+    return sorted(custos.items(), key=lambda c: -c[1])[:n]
+
+
+# --- 2. WORKER ---
+def criar_lancador(pasta, latencia_tts):
+    """worker.py com o gTTS trocado por um atraso (ele não tem endpoint configurável, como no bench_offline)."""
+    caminho = os.path.join(pasta, "worker_falso_tts.py")
+    with open(caminho, "w") as arquivo:
+        arquivo.write(f"""import sys, time
+sys.path.insert(0, {RAIZ!r})
+import tts
+def _gtts(self, texto):
+    time.sleep({latencia_tts})
+    return bytes(4096)
+tts.SintetizadorTTS._gtts = _gtts
+import worker
+worker.main()
+""")
+    return caminho
+
+
+def subida_worker(loop, ambiente, aquecimento, nota, atraso, limite, pasta, rodada, lancador):
+    telegram = loop.rodar(ServidorTelegramFalso().iniciar())
+    ambiente = {**ambiente, "AQUECIMENTO": aquecimento, "TELEGRAM_BASE_URL": telegram.base_url,
+                "TELEGRAM_BASE_FILE_URL": telegram.base_file_url, "WORKER_ID": f"bench-{aquecimento}"}
+    log = os.path.join(pasta, f"worker-{aquecimento}-{rodada}.log")
+    gerador = GeradorUpdates()
+    resultado = {"aquecimento": aquecimento}
+    with open(log, "w") as saida:
+        inicio = time.perf_counter()
+        processo = subprocess.Popen([sys.executable, "-W", "ignore", lancador], cwd=RAIZ, env=ambiente,
+                                    stdout=saida, stderr=subprocess.STDOUT)
+        try:
+            chat = None
+            fim = inicio + limite
+            while time.perf_counter() < fim:
+                polling = telegram.primeira_chamada.get("getUpdates")
+                if chat is None and (not atraso or polling and time.perf_counter() - polling >= atraso):
+                    update = gerador.criar_voz(telegram, nota)
+                    chat = update["message"]["chat"]["id"]
+                    envio = gerador.enviados[update["update_id"]]
+                    # O getUpdates espera num asyncio.Event do loop dos falsos: acordá-lo por lá
+                    loop.loop.call_soon_threadsafe(telegram.enfileirar, update)
+                if chat is not None and (chat in telegram.vozes or chat in telegram.erros):
+                    break
+                if processo.poll() is not None:
+                    break
+                time.sleep(0.005)
+            for evento, metodo in (("getme_s", "getMe"), ("polling_s", "getUpdates")):
+                if metodo in telegram.primeira_chamada:
+                    resultado[evento] = round(telegram.primeira_chamada[metodo] - inicio, 3)
+            if chat in telegram.vozes:
+                resultado["resposta_s"] = round(telegram.vozes[chat] - inicio, 3)
+                resultado["primeira_nota_s"] = round(telegram.vozes[chat] - envio, 3)
+            else:
+                resultado["falhou"] = "erro" if chat in telegram.erros else "sem resposta"
+        finally:
+            processo.send_signal(signal.SIGTERM)
+            try:
+                processo.wait(15)
+            except subprocess.TimeoutExpired:
+                processo.kill()
+            loop.rodar(telegram.parar())
+    if "falhou" in resultado:
+        with open(log) as arquivo:
+            print(f"⚠️ Worker (AQUECIMENTO={aquecimento}) {resultado['falhou']}; fim do log:\n"
+                  + "".join(arquivo.readlines()[-15:]))
+    return resultado
+
+
+def mediana(rodadas, campo):
+    valores = [r[campo] for r in rodadas if campo in r]
+    return round(statistics.median(valores), 3) if valores else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modulos", default=",".join(MODULOS))
+    parser.add_argument("--aquecimento", default="0,local,1", help="variantes de AQUECIMENTO do worker")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--atraso", type=float, default=0, help="segundos entre o polling e a 1ª nota")
+    parser.add_argument("--limite", type=float, default=90, help="espera máxima por subida (s)")
+    parser.add_argument("--detalhar", action="store_true", help="imports mais caros do worker")
+    parser.add_argument("--sem-worker", action="store_true", help="só os tempos de import")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix="bench-subida-")
+    perfis = {nome: Perfil.ler(valor) for nome, valor in PERFIS_PADRAO.items()}
+    loop = LoopServicos()
+    servicos = loop.rodar(ServicosFalsos(perfis).iniciar())
+    servicos.transcricoes = TRANSCRICOES
+    # Mesma configuração do bench_offline (Fase 1, Groq, sem cache); o Telegram muda a cada subida
+    opcoes = argparse.Namespace(modelo_groq="llama-3.3-70b-versatile", modelo_gemini="gemini-2.0-flash",
+                                com_cache=False, cotas_reais=False, concorrencia=8, sem_fase1_rapida=False)
+    referencia = ServidorTelegramFalso()
+    configurar_ambiente(opcoes, servicos, referencia, pasta, criar_ffmpeg_falso(pasta, perfis["ffmpeg"].latencia))
+    ambiente = {**os.environ, "METRICAS_PORTA": "0", "BOT_EMBUTIDO": "0"}
+    nota, _ = gerar_audios(None)
+    lancador = criar_lancador(pasta, perfis["tts"].latencia)
+
+    resultado = {"quando": time.strftime("%Y-%m-%dT%H:%M:%S"), "imports": {}, "worker": {}}
+    print(f"📦 Import em processo novo (mediana de {args.repeticoes}):")
+    for modulo in args.modulos.split(","):
+        # main.py sem token: não lança o worker embutido
+        extra = {"TELEGRAM_TOKEN": ""} if modulo == "main" else {}
+        tempos = [tempo_import(modulo, {**ambiente, **extra}) for _ in range(args.repeticoes)]
+        resultado["imports"][modulo] = round(statistics.median(tempos), 3)
+        print(f"   {modulo:<14}{resultado['imports'][modulo]:>7.3f}s")
+    if args.detalhar:
+        print("🔎 Imports mais caros do worker (acumulado):")
+        resultado["imports_worker"] = imports_mais_caros("worker", ambiente)
+        for nome, segundos in resultado["imports_worker"]:
+            print(f"   {nome:<24}{segundos:>7.3f}s")
+
+    if not args.sem_worker:
+        print(f"\n🚀 Subida do worker até a 1ª nota (atraso {args.atraso}s, mediana de {args.repeticoes}):")
+        print(f"   {'AQUECIMENTO':<12}{'getMe':>8}{'polling':>9}{'resposta':>10}{'1ª nota':>9}")
+        for aquecimento in args.aquecimento.split(","):
+            rodadas = [subida_worker(loop, ambiente, aquecimento, nota, args.atraso, args.limite, pasta, i, lancador)
+                       for i in range(args.repeticoes)]
+            resumo = {campo: mediana(rodadas, campo) for campo in ("getme_s", "polling_s", "resposta_s", "primeira_nota_s")}
+            resumo["falhas"] = sum("falhou" in r for r in rodadas)
+            resultado["worker"][aquecimento] = {**resumo, "rodadas": rodadas}
+            print(f"   {aquecimento:<12}" + "".join(f"{resumo[c] if resumo[c] is not None else '-':>{w}}"
+                                                  for c, w in (("getme_s", 8), ("polling_s", 9),
+                                                               ("resposta_s", 10), ("primeira_nota_s", 9)))
+                  + (f"   ({resumo['falhas']} falhas)" if resumo["falhas"] else ""))
+
+    loop.rodar(servicos.parar())
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as arquivo:
+            json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+        print(f"\n💾 Resultados em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
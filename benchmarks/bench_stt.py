@@ -0,0 +1,154 @@
+"""
+Benchmark de STT: Google (rede) x Whisper local (CPU) em clipes fixos em português.
+
+Para cada backend mede, por clipe, a latência ponta a ponta (PCM -> texto), o fator de
+tempo real (RTF = latência / duração do áudio; < 1 é mais rápido que a fala) e o WER
+contra a transcrição de referência. Depois dispara todos os clipes ao mesmo tempo pelo
+AgregadorLote para ver o ganho do decode em lote.
+
+Amostras: uma pasta com pares clipe.wav (16 kHz mono) + clipe.txt (referência).
+--gerar cria o conjunto fixo abaixo com gTTS + ffmpeg (precisa de rede uma vez).
+
+Uso:
+    python benchmarks/bench_stt.py --gerar --amostras benchmarks/amostras_stt
+    python benchmarks/bench_stt.py --amostras benchmarks/amostras_stt --backends google whisper
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stt import TAXA_AMOSTRAGEM, AgregadorLote, GoogleSTT, WhisperLocal, duracao_pcm, ler_pcm_wav
+from despacho import percentil
+
+FRASES = [
+    "Item um. O Tratado de Tordesilhas foi assinado em mil quatrocentos e noventa e quatro.",
+    "Julgue o item. A Carta das Nações Unidas entrou em vigor após a Segunda Guerra Mundial.",
+    "Item três. O Barão do Rio Branco consolidou as fronteiras brasileiras por meio de arbitragens.",
+    "Texto de apoio. A política externa independente marcou os governos de Jânio Quadros e João Goulart.",
+    "Item cinco. O Mercosul foi criado pelo Tratado de Assunção, em mil novecentos e noventa e um.",
+    "Questão seis. A Convenção de Viena sobre o Direito dos Tratados é de mil novecentos e sessenta e nove.",
+]
+
+
+def gerar_amostras(pasta):
+    from gtts import gTTS
+    os.makedirs(pasta, exist_ok=True)
+    for i, frase in enumerate(FRASES, 1):
+        base = os.path.join(pasta, f"clipe_{i:02d}")
+        with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as mp3:
+            gTTS(text=frase, lang="pt").write_to_fp(mp3)
+        subprocess.run(["ffmpeg", "-loglevel", "error", "-y", "-i", mp3.name, "-ac", "1",
+                        "-ar", str(TAXA_AMOSTRAGEM), base + ".wav"], check=True)
+        os.unlink(mp3.name)
+        with open(base + ".txt", "w", encoding="utf-8") as arquivo:
+            arquivo.write(frase)
+    print(f"📁 {len(FRASES)} clipes em {pasta}")
+
+
+def carregar_amostras(pasta):
+    amostras = []
+    for nome in sorted(os.listdir(pasta)):
+        if nome.endswith(".wav"):
+            base = os.path.join(pasta, nome[:-4])
+            pcm, taxa = ler_pcm_wav(base + ".wav")
+            referencia = open(base + ".txt", encoding="utf-8").read() if os.path.exists(base + ".txt") else ""
+            amostras.append((nome, pcm, taxa, referencia))
+    return amostras
+
+
+def _palavras(texto):
+    return "".join(c if c.isalnum() else " " for c in texto.lower()).split()
+
+
+def wer(referencia, hipotese):
+    ref, hip = _palavras(referencia), _palavras(hipotese)
+    if not ref:
+        return 0.0
+    anterior = list(range(len(hip) + 1))
+    for i, r in enumerate(ref, 1):
+        atual = [i] + [0] * len(hip)
+        for j, h in enumerate(hip, 1):
+            atual[j] = min(anterior[j] + 1, atual[j - 1] + 1, anterior[j - 1] + (r != h))
+        anterior = atual
+    return anterior[-1] / len(ref)
+
+
+def medir_sequencial(backend, amostras):
+    linhas = []
+    for nome, pcm, taxa, referencia in amostras:
+        inicio = time.perf_counter()
+        try:
+            texto = backend.transcrever(pcm, taxa)
+        except Exception as e:
+            texto = f"<erro: {e}>"
+        latencia = time.perf_counter() - inicio
+        linhas.append({
+            "clipe": nome, "duracao": round(duracao_pcm(pcm, taxa), 2), "latencia": round(latencia, 3),
+            "rtf": round(latencia / duracao_pcm(pcm, taxa), 3), "wer": round(wer(referencia, texto), 3), "texto": texto,
+        })
+    return linhas
+
+
+async def medir_lote(backend, amostras):
+    agregador = AgregadorLote(backend)
+    inicio = time.perf_counter()
+    await asyncio.gather(*(agregador.transcrever(pcm, taxa) for _, pcm, taxa, _ in amostras), return_exceptions=True)
+    return time.perf_counter() - inicio, agregador.resumo()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--amostras", default=os.path.join(os.path.dirname(__file__), "amostras_stt"))
+    parser.add_argument("--gerar", action="store_true", help="Cria os clipes fixos com gTTS + ffmpeg")
+    parser.add_argument("--backends", nargs="+", default=["google", "whisper"], choices=["google", "whisper"])
+    parser.add_argument("--json", help="Salva o resultado completo neste arquivo")
+    args = parser.parse_args()
+
+    if args.gerar:
+        gerar_amostras(args.amostras)
+    amostras = carregar_amostras(args.amostras)
+    if not amostras:
+        print(f"⚠️ Nenhum .wav em {args.amostras} (use --gerar)")
+        return 1
+    audio_total = sum(duracao_pcm(pcm, taxa) for _, pcm, taxa, _ in amostras)
+    print(f"🎧 {len(amostras)} clipes, {audio_total:.1f}s de áudio\n")
+
+    resultado = {}
+    for nome in args.backends:
+        inicio = time.perf_counter()
+        backend = GoogleSTT() if nome == "google" else WhisperLocal()
+        carga = time.perf_counter() - inicio
+        linhas = medir_sequencial(backend, amostras)
+        parede_lote, info_lote = asyncio.run(medir_lote(backend, amostras))
+        latencias = [l["latencia"] for l in linhas]
+        resumo = {
+            "carga_s": round(carga, 2),
+            "p50": round(percentil(latencias, 50), 3),
+            "p95": round(percentil(latencias, 95), 3),
+            "rtf_medio": round(sum(latencias) / audio_total, 3),
+            "wer_medio": round(sum(l["wer"] for l in linhas) / len(linhas), 3),
+            "sequencial_s": round(sum(latencias), 2),
+            "lote_s": round(parede_lote, 2),
+            "rtf_lote": round(parede_lote / audio_total, 3),
+            "lote": info_lote,
+        }
+        resultado[nome] = {"resumo": resumo, "clipes": linhas}
+        print(f"{nome:>8}: carga {resumo['carga_s']:.1f}s | p50 {resumo['p50']:.2f}s p95 {resumo['p95']:.2f}s | "
+              f"RTF {resumo['rtf_medio']:.3f} | WER {resumo['wer_medio']:.1%} | "
+              f"série {resumo['sequencial_s']:.2f}s x lote {resumo['lote_s']:.2f}s (RTF {resumo['rtf_lote']:.3f})")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as arquivo:
+            json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
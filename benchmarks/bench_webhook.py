@@ -0,0 +1,145 @@
+"""
+Benchmark de entrega de updates: long polling x webhook, offline.
+
+Um Telegram falso (benchmarks/telegram_falso.py) gera mensagens com carimbo de tempo; o bot
+de teste espera --trabalho segundos por update (simulando o pipeline) e responde. Mede-se da
+criação do update até a resposta chegar ao Telegram falso.
+
+- polling: run_polling do PTB contra o getUpdates falso (concurrent_updates = --concorrencia).
+- webhook: ServidorWebhook (webhook.py) recebendo POSTs, com --duplicatas reentregas e a fila
+  limitada em --fila (o gerador respeita 429/Retry-After, como o Telegram).
+
+Uso: python benchmarks/bench_webhook.py --updates 500 --taxa 200 --trabalho 0.05
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from telegram.ext import ApplicationBuilder, MessageHandler, filters
+
+from despacho import percentil
+from webhook import ServidorWebhook
+from telegram_falso import ServidorTelegramFalso, GeradorUpdates, TOKEN_FALSO
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def construir_bot(servidor, concorrencia, trabalho):
+    async def responder(update, context):
+        await asyncio.sleep(trabalho)
+        await update.message.reply_text(f"ok {update.update_id}")
+
+    app = (ApplicationBuilder().token(TOKEN_FALSO).base_url(servidor.base_url)
+           .concurrent_updates(concorrencia).build())
+    app.add_handler(MessageHandler(filters.TEXT, responder))
+    return app
+
+
+async def aguardar_respostas(servidor, gerador, limite):
+    fim = time.perf_counter() + limite
+    while len(servidor.respostas) < len(gerador.enviados) and time.perf_counter() < fim:
+        await asyncio.sleep(0.01)
+
+
+def relatorio(modo, servidor, gerador, extra=None):
+    latencias = [servidor.respostas[i] - t for i, t in gerador.enviados.items() if i in servidor.respostas]
+    inicio = min(gerador.enviados.values())
+    fim = max(servidor.respostas.values()) if servidor.respostas else inicio
+    return {
+        "modo": modo,
+        "updates": len(gerador.enviados),
+        "respondidos": len(latencias),
+        "vazao_por_s": round(len(latencias) / (fim - inicio), 1) if fim > inicio else None,
+        "p50_ms": round(percentil(latencias, 50) * 1000, 1) if latencias else None,
+        "p95_ms": round(percentil(latencias, 95) * 1000, 1) if latencias else None,
+        "p99_ms": round(percentil(latencias, 99) * 1000, 1) if latencias else None,
+        **(extra or {}),
+    }
+
+
+async def rodar_polling(args):
+    servidor = await ServidorTelegramFalso().iniciar()
+    gerador = GeradorUpdates(semente=args.semente)
+    app = construir_bot(servidor, args.concorrencia, args.trabalho)
+    await app.initialize()
+    await app.start()
+    await app.updater.start_polling(poll_interval=0.0, timeout=10)
+    try:
+        await gerador.para_polling(servidor, args.updates, args.taxa)
+        await aguardar_respostas(servidor, gerador, args.limite)
+    finally:
+        await app.updater.stop()
+        await app.stop()
+        await app.shutdown()
+        await servidor.parar()
+    return relatorio("polling", servidor, gerador, {"getUpdates": servidor.chamadas.get("getUpdates", 0)})
+
+
+async def rodar_webhook(args):
+    servidor = await ServidorTelegramFalso().iniciar()
+    gerador = GeradorUpdates(duplicatas=args.duplicatas, semente=args.semente)
+    app = construir_bot(servidor, args.concorrencia, args.trabalho)
+    await app.initialize()
+    await app.start()
+    webhook = ServidorWebhook(app, args.concorrencia, caminho="/telegram", segredo="bench", max_fila=args.fila)
+    porta = porta_livre()
+    await webhook.iniciar("127.0.0.1", porta)
+    try:
+        await gerador.para_webhook(f"http://127.0.0.1:{porta}/telegram", args.updates, args.taxa, segredo="bench")
+        await aguardar_respostas(servidor, gerador, args.limite)
+    finally:
+        await webhook.parar(drenar=False)
+        await app.stop()
+        await app.shutdown()
+        await servidor.parar()
+    info = webhook.resumo()
+    # Reentregas não podem gerar resposta dobrada: processados == updates
+    return relatorio("webhook", servidor, gerador, {
+        "duplicados_descartados": info["duplicados"], "recusados_429": info["recusados"],
+        "processados": info["processados"],
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=500)
+    parser.add_argument("--taxa", type=float, default=200, help="updates por segundo (0 = rajada)")
+    parser.add_argument("--trabalho", type=float, default=0.05, help="segundos de processamento por update")
+    parser.add_argument("--concorrencia", type=int, default=32)
+    parser.add_argument("--fila", type=int, default=64, help="tamanho da fila do webhook")
+    parser.add_argument("--duplicatas", type=float, default=0.05, help="fração de reentregas no webhook")
+    parser.add_argument("--modos", default="polling,webhook")
+    parser.add_argument("--limite", type=float, default=120, help="espera máxima pelas respostas (s)")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    args = parser.parse_args()
+
+    resultados = []
+    for modo in args.modos.split(","):
+        resultado = asyncio.run({"polling": rodar_polling, "webhook": rodar_webhook}[modo](args))
+        resultados.append(resultado)
+        print(f"{modo:<8} {resultado['respondidos']}/{resultado['updates']} respondidos | "
+              f"{resultado['vazao_por_s']}/s | p50 {resultado['p50_ms']}ms p95 {resultado['p95_ms']}ms "
+              f"p99 {resultado['p99_ms']}ms")
+        extras = {k: v for k, v in resultado.items() if k not in ("modo", "updates", "respondidos", "vazao_por_s",
+                                                                  "p50_ms", "p95_ms", "p99_ms")}
+        if extras:
+            print("         " + ", ".join(f"{k}={v}" for k, v in extras.items()))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as arquivo:
+            json.dump(resultados, arquivo, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Benchmark da consulta da WikiTool: item inteiro como título x entidades (com e sem índice local).
+
+Sobe a MediaWiki falsa (servicos_falsos.py) com um conjunto conhecido de páginas e
+redirecionamentos, constrói o IndiceTitulos (entidades.py) com os mesmos títulos e roda os
+itens por três estratégias:
+
+- antiga:     o item inteiro, em minúsculas e sem "julgue/item", em três grafias (como antes)
+- superficie: entidades por padrões (siglas, nomes, "Tratado de ..."), sem índice
+- indice:     n-gramas conferidos no índice mapeado em memória; só títulos confiáveis vão à rede
+
+Cada item vem em duas formas: "editado" (caixa correta) e "transcrito" (minúsculas do STT,
+só com o normalizador local). Mede taxa de acerto (alguma página), acerto do verbete
+esperado, requisições, títulos enviados, tempo na rede e tempo de extração.
+
+Uso: python benchmarks/bench_wiki.py --latencia 300 --enchimento 200000 [--titulos ptwiki-all-titles.gz]
+     [--json resultados.json]
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from servicos_falsos import ServicosFalsos, Perfil
+
+# Páginas reais da Wikipédia lusófona, com alguns redirecionamentos: {título: [redirects]}
+PAGINAS = {
+    "Organização das Nações Unidas": ["ONU", "Nações Unidas"],
+    "Organização dos Estados Americanos": ["OEA"],
+    "Organização Mundial do Comércio": ["OMC"],
+    "Organização do Tratado do Atlântico Norte": ["OTAN", "NATO"],
+    "Fundo Monetário Internacional": ["FMI"],
+    "Banco Mundial": ["BIRD", "Banco Internacional para Reconstrução e Desenvolvimento"],
+    "Mercado Comum do Sul": ["Mercosul", "Mercosur"],
+    "União de Nações Sul-Americanas": ["Unasul"],
+    "BRICS": ["Brics"],
+    "Grupo dos 20": ["G20"],
+    "Tratado de Assunção": [],
+    "Tratado de Tordesilhas": [],
+    "Tratado de Petrópolis": [],
+    "Tratado de Madrid": ["Tratado de Madri"],
+    "Tratado de Não Proliferação de Armas Nucleares": ["TNP", "Tratado de Não Proliferação Nuclear"],
+    "Conferência de Bretton Woods": ["Acordos de Bretton Woods", "Bretton Woods"],
+    "Conferência de São Francisco": [],
+    "Consenso de Washington": [],
+    "Doutrina Monroe": [],
+    "Guerra Fria": [],
+    "Segunda Guerra Mundial": ["II Guerra Mundial"],
+    "Primeira Guerra Mundial": [],
+    "Guerra do Paraguai": ["Guerra da Tríplice Aliança"],
+    "José Maria da Silva Paranhos Júnior": ["Barão do Rio Branco"],
+    "Ministério das Relações Exteriores (Brasil)": ["Itamaraty"],
+    "Política Externa Independente": [],
+    "Conselho de Segurança das Nações Unidas": ["CSNU", "Conselho de Segurança da ONU"],
+    "Corte Internacional de Justiça": ["CIJ"],
+    "Tribunal Penal Internacional": ["TPI"],
+    "Comunidade dos Países de Língua Portuguesa": ["CPLP"],
+    "Organização do Tratado de Cooperação Amazônica": ["OTCA"],
+    "Comissão Econômica para a América Latina e o Caribe": ["CEPAL", "Cepal"],
+    "Acordo Geral de Tarifas e Comércio": ["GATT"],
+    "Rodada Doha": [],
+    "Rodada Uruguai": [],
+    "Liga das Nações": ["Sociedade das Nações"],
+    "Paz de Vestfália": ["Tratado de Vestfália"],
+    "Congresso de Viena": [],
+    "Carta das Nações Unidas": ["Carta da ONU"],
+    "Declaração Universal dos Direitos Humanos": [],
+    "Protocolo de Quioto": [],
+    "Acordo de Paris": [],
+    "União Europeia": ["UE"],
+    "Estados Unidos": ["EUA"],
+    "União Soviética": ["URSS"],
+    "Getúlio Vargas": [],
+    "Juscelino Kubitschek": [],
+    "Operação Pan-Americana": [],
+    "Revolução de 1930": [],
+    "Brasil": [],
+    "Argentina": [],
+    "Paraguai": [],
+    "Bolívia": [],
+    "Acre": [],
+    "Genebra": [],
+    "Ecaterimburgo": [],
+    "Política externa do Brasil": [],
+}
+# A Wikipédia tem verbete para quase toda palavra comum: a armadilha da estratégia ingênua
+COMUNS = ["Criação", "Sede", "Membro", "Cúpula", "Tratado", "Guerra", "Acordo", "Comércio", "Política",
+          "Soberania", "Integração", "Diplomacia", "Desenvolvimento", "Fundador", "Primeira", "Apenas",
+          "Países", "Conselho", "Conferência", "Direitos humanos", "Política externa", "Sistema financeiro"]
+
+# (item, verbete esperado)
+ITENS = [
+    ("Item 1. A ONU foi criada em 1945, após a Segunda Guerra Mundial.", "Organização das Nações Unidas"),
+    ("Item 2. O Mercosul foi criado em 1991 pelo Tratado de Assunção.", "Tratado de Assunção"),
+    ("Item 3. A OEA tem sede em Genebra.", "Organização dos Estados Americanos"),
+    ("Item 4. O Brasil é membro fundador da Organização Mundial do Comércio.", "Organização Mundial do Comércio"),
+    ("Item 5. O BRICS realizou sua primeira cúpula em 2009, em Ecaterimburgo.", "BRICS"),
+    ("Item 6. A Unasul foi criada em 2008 pelo Tratado de Brasília.", "União de Nações Sul-Americanas"),
+    ("Item 7. O G20 financeiro reúne apenas países europeus.", "Grupo dos 20"),
+    ("Item 8. O Tratado de Tordesilhas foi assinado em 1494.", "Tratado de Tordesilhas"),
+    ("Item 9. A Conferência de Bretton Woods criou o FMI e o BIRD.", "Conferência de Bretton Woods"),
+    ("Item 10. O Barão do Rio Branco chefiou o Itamaraty entre 1902 e 1912.", "José Maria da Silva Paranhos Júnior"),
+    ("Item 11. O Tratado de Petrópolis resolveu a questão do Acre com a Bolívia.", "Tratado de Petrópolis"),
+    ("Item 12. A Política Externa Independente foi formulada no governo de Jânio Quadros.", "Política Externa Independente"),
+    ("Item 13. O Consenso de Washington recomendava a ampliação do Estado na economia.", "Consenso de Washington"),
+    ("Item 14. A Doutrina Monroe foi proclamada em 1823.", "Doutrina Monroe"),
+    ("Item 15. Durante a Guerra Fria, o Brasil aderiu ao TNP já em 1968.", "Guerra Fria"),
+    ("Item 16. A Guerra do Paraguai opôs a Tríplice Aliança ao governo de Solano López.", "Guerra do Paraguai"),
+    ("Item 17. O Conselho de Segurança das Nações Unidas tem dez membros permanentes.", "Conselho de Segurança das Nações Unidas"),
+    ("Item 18. A Corte Internacional de Justiça tem sede em Haia.", "Corte Internacional de Justiça"),
+    ("Item 19. A CPLP foi criada em 1996, em Lisboa.", "Comunidade dos Países de Língua Portuguesa"),
+    ("Item 20. A CEPAL defendia a industrialização por substituição de importações.", "Comissão Econômica para a América Latina e o Caribe"),
+    ("Item 21. A Rodada Uruguai do GATT deu origem à OMC.", "Rodada Uruguai"),
+    ("Item 22. A Liga das Nações contou com o Brasil como membro até 1926.", "Liga das Nações"),
+    ("Item 23. A Paz de Vestfália consagrou o princípio da soberania estatal.", "Paz de Vestfália"),
+    ("Item 24. O Protocolo de Quioto estabeleceu metas para todos os países em desenvolvimento.", "Protocolo de Quioto"),
+    ("Item 25. O Acordo de Paris substituiu o Protocolo de Quioto.", "Acordo de Paris"),
+    ("Item 26. Juscelino Kubitschek lançou a Operação Pan-Americana em 1958.", "Operação Pan-Americana"),
+    ("Item 27. A Revolução de 1930 levou Getúlio Vargas ao poder.", "Revolução de 1930"),
+    ("Item 28. A integração regional é prioridade constante da diplomacia brasileira.", None),
+    ("Item 29. A política externa do Brasil privilegia o multilateralismo.", "Política externa do Brasil"),
+    ("Item 30. A soberania é um conceito central das relações internacionais.", None),
+    # Itens conceituais, sem entidade: nenhuma requisição deveria sair
+    ("Item 31. Para o realismo clássico, o interesse definido em termos de poder orienta a ação estatal.", None),
+    ("Item 32. A interdependência complexa reduz a relevância da força militar entre democracias.", None),
+    ("Item 33. O multilateralismo comercial perdeu força diante dos acordos preferenciais.", None),
+    ("Item 34. A cooperação técnica com países africanos ampliou-se na primeira década do século.", None),
+    ("Item 35. O desenvolvimento sustentável articula crescimento econômico e proteção ambiental.", None),
+]
+
+
+# --- ÍNDICE E PÁGINAS ---
+def registros_paginas():
+    for titulo, redirects in PAGINAS.items():
+        yield titulo, ""
+        for redirect in redirects:
+            yield redirect, titulo
+    for titulo in COMUNS:
+        yield titulo, ""
+
+
+def enchimento(n, semente):
+    """Títulos sintéticos que não casam com nada: dão ao índice um tamanho realista."""
+    aleatorio = random.Random(semente)
+    silabas = ["ba", "ca", "da", "fe", "go", "ju", "la", "mi", "no", "pa", "qui", "ro", "sa", "ti", "vu", "xe", "zo"]
+    for _ in range(n):
+        palavras = [("".join(aleatorio.choice(silabas) for _ in range(aleatorio.randint(2, 4)))).capitalize()
+                    for _ in range(aleatorio.randint(1, 4))]
+        yield " ".join(palavras), ""
+
+
+def busca_antiga(wiki, query):
+    """O algoritmo anterior da WikiTool.search, para comparação."""
+    query_limpa = query.lower()
+    for termo in ["julgue", "item", "texto de apoio", "texto base", "no que se refere", "acerca de"]:
+        query_limpa = query_limpa.replace(termo, "")
+    query_limpa = query_limpa.strip()
+    if len(query_limpa) < 5:
+        return ""
+    minusculas = {"de", "da", "do", "das", "dos", "e", "a", "o", "em", "para"}
+    titulo = " ".join(p if p in minusculas else p.capitalize() for p in query_limpa.split())
+    variantes = list(dict.fromkeys([query_limpa, query_limpa.capitalize(), titulo]))
+    encontrados = wiki.buscar_titulos(variantes)
+    extract = next((encontrados[v] for v in variantes if encontrados.get(v)), "")
+    return f"\n[FONTE WIKIPÉDIA - ATUALIDADES/FATOS]: {extract[:800]}..." if extract else ""
+
+
+def rodar(estrategia, forma, itens, servicos, indice, repeticoes):
+    from bot import WikiTool
+    from despacho import percentil
+    wiki = WikiTool(modo="online")
+    wiki.indice_titulos = indice if estrategia == "indice" else None
+    chamadas_antes = servicos.chamadas.get("wiki", 0)
+    acertos = relevantes = enviados = 0
+    tempos, extracoes = [], []
+    for _ in range(repeticoes):
+        wiki.cache.limpar()
+        for texto, esperado in itens:
+            inicio = time.perf_counter()
+            if estrategia == "antiga":
+                resultado = busca_antiga(wiki, texto)
+                enviados += 3
+            else:
+                comeco = time.perf_counter()
+                titulos = wiki.titulos_da_consulta(texto)
+                extracoes.append(time.perf_counter() - comeco)
+                enviados += len(titulos)
+                resultado = wiki.search(texto)
+            tempos.append(time.perf_counter() - inicio)
+            acertos += bool(resultado)
+            relevantes += bool(esperado and f"{esperado} é um verbete" in resultado)
+    total = len(itens) * repeticoes
+    com_esperado = sum(1 for _, e in itens if e) * repeticoes
+    return {
+        "estrategia": estrategia, "forma": forma, "buscas": total,
+        "requisicoes": servicos.chamadas.get("wiki", 0) - chamadas_antes,
+        "titulos_enviados": enviados,
+        "taxa_acerto": round(acertos / total, 3),
+        "acerto_verbete_esperado": round(relevantes / com_esperado, 3) if com_esperado else None,
+        "tempo_total_s": round(sum(tempos), 3),
+        "tempo_p50_ms": round(percentil(tempos, 50) * 1000, 1),
+        "tempo_p95_ms": round(percentil(tempos, 95) * 1000, 1),
+        "extracao_p50_us": round(percentil(extracoes, 50) * 1e6, 1) if extracoes else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latencia", type=float, default=300, help="latência da MediaWiki falsa (ms)")
+    parser.add_argument("--jitter", type=float, default=50)
+    parser.add_argument("--enchimento", type=int, default=200000, help="títulos sintéticos no índice")
+    parser.add_argument("--titulos", help="all-titles-in-ns0 real para o índice (em vez do enchimento)")
+    parser.add_argument("--repeticoes", type=int, default=1)
+    parser.add_argument("--estrategias", default="antiga,superficie,indice")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    perfis = {"wiki": Perfil(args.latencia / 1000, 0, args.jitter / 1000)}
+    servicos = asyncio.run_coroutine_threadsafe(ServicosFalsos(perfis, semente=args.semente).iniciar(), loop).result()
+    servicos.paginas = {}
+    for titulo, destino in registros_paginas():
+        servicos.paginas[titulo] = destino
+
+    pasta = tempfile.mkdtemp(prefix="bench-wiki-")
+    os.environ.update({"WIKI_API_URL": f"{servicos.url}/w/api.php", "WIKI_INDICE": os.path.join(pasta, "titulos.idx"),
+                       "CACHE_DIR": pasta})
+    from entidades import IndiceTitulos, construir_indice, ler_titulos
+    from normalizador import normalizar_transcricao
+
+    def registros():
+        yield from registros_paginas()
+        yield from (ler_titulos(args.titulos) if args.titulos else enchimento(args.enchimento, args.semente))
+
+    inicio = time.perf_counter()
+    total = construir_indice(os.environ["WIKI_INDICE"], registros())
+    construcao = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    indice = IndiceTitulos(os.environ["WIKI_INDICE"])
+    abertura = time.perf_counter() - inicio
+    tamanho = os.path.getsize(os.environ["WIKI_INDICE"])
+    print(f"📚 Índice: {total} títulos, {tamanho / 1e6:.1f} MB, construído em {construcao:.2f}s, "
+          f"aberto em {abertura * 1000:.2f}ms")
+
+    formas = {
+        "editado": ITENS,
+        # O que chega do STT na Fase 1 rápida: minúsculas, só com o normalizador local
+        "transcrito": [(normalizar_transcricao(texto.lower()), esperado) for texto, esperado in ITENS],
+    }
+    resultados = []
+    for forma, itens in formas.items():
+        for estrategia in args.estrategias.split(","):
+            resultados.append(rodar(estrategia, forma, itens, servicos, indice, args.repeticoes))
+
+    print(f"\n{'estratégia':<11}{'forma':<11}{'req':>5}{'títulos':>8}{'acerto':>8}{'esperado':>9}"
+          f"{'tempo':>9}{'p50':>8}{'p95':>8}{'extração':>10}")
+    for r in resultados:
+        extracao = f"{r['extracao_p50_us']}µs" if r["extracao_p50_us"] is not None else "-"
+        print(f"{r['estrategia']:<11}{r['forma']:<11}{r['requisicoes']:>5}{r['titulos_enviados']:>8}"
+              f"{r['taxa_acerto']:>8.0%}{r['acerto_verbete_esperado']:>9.0%}{r['tempo_total_s']:>8.2f}s"
+              f"{r['tempo_p50_ms']:>6.0f}ms{r['tempo_p95_ms']:>6.0f}ms{extracao:>10}")
+    base = {r["forma"]: r for r in resultados if r["estrategia"] == "antiga"}
+    for r in resultados:
+        if r["estrategia"] != "antiga" and r["forma"] in base:
+            economia = base[r["forma"]]["tempo_total_s"] - r["tempo_total_s"]
+            r["tempo_economizado_s"] = round(economia, 3)
+            print(f"⏱️ {r['estrategia']}/{r['forma']}: {economia:+.2f}s em relação à antiga "
+                  f"({economia / r['buscas'] * 1000:+.0f}ms por item)")
+
+    asyncio.run_coroutine_threadsafe(servicos.parar(), loop).result()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as arquivo:
+            json.dump({"indice": {"titulos": total, "bytes": tamanho, "construcao_s": round(construcao, 3)},
+                       "resultados": resultados}, arquivo, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
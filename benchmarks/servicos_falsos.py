@@ -0,0 +1,232 @@
+"""
+Servidores falsos (aiohttp) para os benchmarks offline: Groq (API OpenAI), Gemini (REST),
+MediaWiki (WikiTool) e Google STT (speech-api v2). O Telegram falso fica em telegram_falso.py.
+
+Cada serviço tem um Perfil de latência/erros, no formato "latencia_ms[:taxa_erro[:jitter_ms[:status]]]",
+ex.: "800:0.05:200" = 800 ms ± 200 ms e 5% de respostas 500; status 429 simula limite de cota.
+"""
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+
+from aiohttp import web
+
+VEREDITOS = ("CERTO", "ERRADO")
+PALAVRAS = ("a", "política", "externa", "brasileira", "multilateralismo", "soberania", "integração", "regional",
+            "desenvolvimento", "cooperação", "diplomacia", "comércio", "segurança", "direito", "internacional")
+
+
+class Perfil:
+    def __init__(self, latencia=0.0, erro=0.0, jitter=0.0, status=500, por_trecho=0.02):
+        self.latencia = latencia      # segundos até a resposta (ou até o 1º trecho, em streams)
+        self.erro = erro              # fração de requisições que falham
+        self.jitter = jitter
+        self.status = status
+        self.por_trecho = por_trecho  # segundos entre trechos de um stream
+
+    @classmethod
+    def ler(cls, texto):
+        partes = (str(texto).split(":") + ["", "", ""])[:4]
+        return cls(latencia=float(partes[0] or 0) / 1000, erro=float(partes[1] or 0),
+                   jitter=float(partes[2] or 0) / 1000, status=int(partes[3] or 500))
+
+    def __repr__(self):
+        return f"{self.latencia * 1000:.0f}ms±{self.jitter * 1000:.0f} erro {self.erro:.0%}/{self.status}"
+
+
+class ServicosFalsos:
+    def __init__(self, perfis, palavras_resposta=250, semente=42, host="127.0.0.1", porta=0):
+        self.perfis = perfis
+        self.palavras_resposta = palavras_resposta
+        self.aleatorio = random.Random(semente)
+        self.host = host
+        self.porta = porta
+        self.transcricoes = []         # STT devolve estas frases em rodízio
+        self.paginas = None            # MediaWiki: {título: destino do redirect ou ""}; None = metade existe
+        self.prefill = 0.0             # LLMs: segundos a mais por 1000 tokens de prompt (leitura da entrada)
+        self.tokens_prompt = {}        # tokens de prompt recebidos por serviço (mesma conta do "usage")
+        self._proxima = 0
+        self.chamadas = {}
+        self._runner = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.porta}"
+
+    async def _perfil(self, servico):
+        """Aplica latência; devolve uma resposta de erro quando o sorteio manda falhar."""
+        self.chamadas[servico] = self.chamadas.get(servico, 0) + 1
+        perfil = self.perfis.get(servico) or Perfil()
+        await asyncio.sleep(max(0.0, perfil.latencia + self.aleatorio.uniform(-perfil.jitter, perfil.jitter)))
+        if self.aleatorio.random() < perfil.erro:
+            cabecalhos = {"Retry-After": "1"} if perfil.status == 429 else {}
+            corpo = {"error": {"code": perfil.status, "message": f"{servico} falso: erro simulado", "status": "UNAVAILABLE"}}
+            return web.json_response(corpo, status=perfil.status, headers=cabecalhos)
+        return None
+
+    # --- CONTEÚDO: O SUFICIENTE PARA O BOT SEGUIR O FLUXO REAL ---
+    @staticmethod
+    def _veredito(texto):
+        return VEREDITOS[hashlib.sha256(texto.encode("utf-8")).digest()[0] % 2]
+
+    def _redacao(self):
+        palavras = [self.aleatorio.choice(PALAVRAS) for _ in range(self.palavras_resposta)]
+        frases = [" ".join(palavras[i:i + 15]).capitalize() + "." for i in range(0, len(palavras), 15)]
+        return " ".join(frases)
+
+    def responder(self, prompt, json_mode=False):
+        bruto = re.search(r'INPUT BRUTO: "(.*?)"', prompt, re.S)
+        if bruto:   # Agente Editor
+            return bruto.group(1).strip().capitalize()
+        if "ITENS:" in prompt and "vereditos" in prompt:
+            itens = re.findall(r"^\s*(\d+)\. (.*)$", prompt.split("ITENS:")[-1], re.M)
+            return json.dumps({"vereditos": [{"n": int(n), "veredito": self._veredito(t)} for n, t in itens]})
+        if json_mode or '"veredito"' in prompt:
+            item = re.search(r'INPUT DO USUÁRIO: "(.*?)"', prompt, re.S)
+            item = item.group(1).strip() if item else ""
+            return json.dumps({"item": item, "veredito": self._veredito(item)}, ensure_ascii=False)
+        if "CLASSIFICADOR" in prompt:
+            return self._veredito(prompt[-200:])
+        return self._redacao()
+
+    async def _ler_prompt(self, servico, prompt):
+        """Prompt maior custa mais: soma os tokens e espera o prefill proporcional."""
+        self.tokens_prompt[servico] = self.tokens_prompt.get(servico, 0) + len(prompt) // 4
+        if self.prefill:
+            await asyncio.sleep(self.prefill * len(prompt) / 4000)
+
+    def _trechos(self, texto):
+        return re.findall(r"\S+\s*", texto) or [texto]
+
+    # --- GROQ (COMPATÍVEL COM OPENAI) ---
+    async def groq(self, request):
+        erro = await self._perfil("groq")
+        if erro:
+            return erro
+        corpo = await request.json()
+        prompt = corpo["messages"][-1]["content"]
+        await self._ler_prompt("groq", prompt)
+        texto = self.responder(prompt, (corpo.get("response_format") or {}).get("type") == "json_object")
+        base = {"id": "falso", "created": int(time.time()), "model": corpo.get("model", "falso")}
+        if not corpo.get("stream"):
+            return web.json_response({**base, "object": "chat.completion", "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": texto}, "finish_reason": "stop", "logprobs": None}],
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(texto) // 4,
+                          "total_tokens": (len(prompt) + len(texto)) // 4}})
+        resposta = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await resposta.prepare(request)
+        perfil = self.perfis.get("groq") or Perfil()
+        for trecho in self._trechos(texto):
+            pedaco = {**base, "object": "chat.completion.chunk",
+                      "choices": [{"index": 0, "delta": {"content": trecho}, "finish_reason": None}]}
+            await resposta.write(f"data: {json.dumps(pedaco)}\n\n".encode())
+            await asyncio.sleep(perfil.por_trecho)
+        await resposta.write(b"data: [DONE]\n\n")
+        await resposta.write_eof()
+        return resposta
+
+    async def groq_modelos(self, request):
+        self.chamadas["groq_modelos"] = self.chamadas.get("groq_modelos", 0) + 1
+        return web.json_response({"object": "list", "data": [
+            {"id": "llama-3.3-70b-versatile", "object": "model", "created": 0, "owned_by": "falso"}]})
+
+    # --- GEMINI (REST v1beta) ---
+    async def gemini(self, request):
+        erro = await self._perfil("gemini")
+        if erro:
+            return erro
+        acao = request.match_info["acao"]
+        corpo = await request.json()
+        prompt = "".join(p.get("text", "") for c in corpo.get("contents", []) for p in c.get("parts", []))
+        await self._ler_prompt("gemini", prompt)
+        config = corpo.get("generationConfig") or corpo.get("generation_config") or {}
+        texto = self.responder(prompt, "json" in str(config.get("responseMimeType") or config.get("response_mime_type") or ""))
+
+        def pacote(parte, final):
+            return {"candidates": [{"content": {"parts": [{"text": parte}], "role": "model"}, "index": 0,
+                                    **({"finishReason": "STOP"} if final else {})}],
+                    "usageMetadata": {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(texto) // 4,
+                                      "totalTokenCount": (len(prompt) + len(texto)) // 4}}
+
+        if not acao.endswith("streamGenerateContent"):
+            return web.json_response(pacote(texto, True))
+        # Sem alt=sse, o cliente REST espera um array JSON entregue aos pedaços
+        resposta = web.StreamResponse(headers={"Content-Type": "application/json"})
+        await resposta.prepare(request)
+        perfil = self.perfis.get("gemini") or Perfil()
+        trechos = self._trechos(texto)
+        for i, trecho in enumerate(trechos):
+            await resposta.write((("[" if i == 0 else ",\n") + json.dumps(pacote(trecho, i == len(trechos) - 1))).encode())
+            await asyncio.sleep(perfil.por_trecho)
+        await resposta.write(b"]")
+        await resposta.write_eof()
+        return resposta
+
+    # --- MEDIAWIKI (action=query&prop=extracts) ---
+    async def wiki(self, request):
+        erro = await self._perfil("wiki")
+        if erro:
+            return erro
+        titulos = [t for t in request.query.get("titles", "").split("|") if t]
+        if self.paginas is not None:
+            return web.json_response({"batchcomplete": "", "query": self._resolver_titulos(titulos)})
+        paginas = {}
+        for i, titulo in enumerate(titulos):
+            # Metade dos títulos "existe" (estável por título)
+            if hashlib.sha256(titulo.casefold().encode("utf-8")).digest()[0] % 2:
+                paginas[str(1000 + i)] = {"pageid": 1000 + i, "title": titulo,
+                                          "extract": f"{titulo} é um verbete falso usado em benchmark. " * 8}
+            else:
+                paginas[str(-1 - i)] = {"title": titulo, "missing": ""}
+        return web.json_response({"batchcomplete": "", "query": {"pages": paginas}})
+
+    def _resolver_titulos(self, titulos):
+        """Como a API real: 1ª letra maiúscula (normalized), redirecionamentos e páginas ausentes."""
+        normalizados, redirects, paginas = [], [], {}
+        for i, titulo in enumerate(titulos):
+            atual = " ".join(titulo.replace("_", " ").split())
+            atual = atual[:1].upper() + atual[1:]
+            if atual != titulo:
+                normalizados.append({"from": titulo, "to": atual})
+            if self.paginas.get(atual):
+                redirects.append({"from": atual, "to": self.paginas[atual]})
+                atual = self.paginas[atual]
+            if atual in self.paginas:
+                paginas[str(1000 + i)] = {"pageid": 1000 + i, "title": atual,
+                                          "extract": f"{atual} é um verbete falso usado em benchmark. " * 8}
+            else:
+                paginas[str(-1 - i)] = {"title": atual, "missing": ""}
+        return {"normalized": normalizados, "redirects": redirects, "pages": paginas}
+
+    # --- GOOGLE STT (speech-api v2) ---
+    async def stt(self, request):
+        erro = await self._perfil("stt")
+        if erro:
+            return erro
+        await request.read()
+        texto = self.transcricoes[self._proxima % len(self.transcricoes)] if self.transcricoes else "item de teste"
+        self._proxima += 1
+        linhas = [{"result": []}, {"result": [{"alternative": [{"transcript": texto, "confidence": 0.93}], "final": True}],
+                                   "result_index": 0}]
+        return web.Response(text="\n".join(json.dumps(l, ensure_ascii=False) for l in linhas), content_type="application/json")
+
+    async def iniciar(self):
+        servidor = web.Application(client_max_size=32 * 1024 * 1024)
+        servidor.router.add_post("/openai/v1/chat/completions", self.groq)
+        servidor.router.add_get("/openai/v1/models", self.groq_modelos)
+        servidor.router.add_post("/v1beta/models/{acao}", self.gemini)
+        servidor.router.add_get("/w/api.php", self.wiki)
+        servidor.router.add_post("/speech-api/v2/recognize", self.stt)
+        self._runner = web.AppRunner(servidor, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.porta)
+        await site.start()
+        self.porta = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def parar(self):
+        if self._runner:
+            await self._runner.cleanup()
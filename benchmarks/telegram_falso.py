@@ -0,0 +1,199 @@
+"""
+Telegram falso para testes de carga offline.
+
+- ServidorTelegramFalso: Bot API mínima (getMe, getUpdates com long polling, setWebhook,
+  deleteWebhook, sendMessage, editMessageText, getFile + download, sendVoice...) servida por
+  aiohttp. O bot de teste aponta para ela com ApplicationBuilder().base_url(servidor.base_url)
+  e .base_file_url(servidor.base_file_url); 'latencia' atrasa cada chamada da Bot API.
+- GeradorUpdates: cria updates de mensagem com carimbo de tempo, para medir da "chegada no
+  Telegram" até a resposta do bot. Entrega pela fila do getUpdates (modo polling) ou por POST
+  no webhook do bot, com reentregas duplicadas opcionais e respeitando 429/Retry-After.
+"""
+import json
+import time
+import random
+import asyncio
+import itertools
+
+import aiohttp
+from aiohttp import web
+
+TOKEN_FALSO = "123456:FALSO"
+
+
+class ServidorTelegramFalso:
+    def __init__(self, host="127.0.0.1", porta=0, latencia=0.0):
+        self.host = host
+        self.porta = porta
+        self.latencia = latencia
+        self.arquivos = {}             # file_id -> bytes (notas de voz)
+        self.vozes = {}                # chat_id -> instante do sendVoice
+        self.erros = {}                # chat_id -> instante do aviso de erro
+        self.pendentes = []            # updates aguardando getUpdates
+        self._chegou = asyncio.Event()
+        self.respostas = {}            # update_id -> instante em que o bot respondeu
+        self.chamadas = {}             # método -> quantidade
+        self.primeira_chamada = {}     # método -> instante da 1ª chamada (subida do bot)
+        self._ids = itertools.count(1)
+        self._runner = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.porta}/bot"
+
+    @property
+    def base_file_url(self):
+        return f"http://{self.host}:{self.porta}/file/bot"
+
+    def enfileirar(self, update):
+        self.pendentes.append(update)
+        self._chegou.set()
+
+    async def _parametros(self, request):
+        if request.content_type == "application/json":
+            return await request.json()
+        dados = {}
+        for chave, valor in (await request.post()).items():
+            try:
+                dados[chave] = json.loads(valor)
+            except (TypeError, ValueError):
+                dados[chave] = valor
+        return dados
+
+    def _mensagem(self, chat_id, texto):
+        return {"message_id": next(self._ids), "date": int(time.time()), "text": texto,
+                "chat": {"id": chat_id, "type": "private"}}
+
+    async def tratar(self, request):
+        metodo = request.match_info["metodo"]
+        self.chamadas[metodo] = self.chamadas.get(metodo, 0) + 1
+        self.primeira_chamada.setdefault(metodo, time.perf_counter())
+        dados = await self._parametros(request)
+        if self.latencia and metodo != "getUpdates":
+            await asyncio.sleep(self.latencia)
+        if metodo == "getMe":
+            resultado = {"id": 1, "is_bot": True, "first_name": "Falso", "username": "falso_bot",
+                         "can_join_groups": True, "can_read_all_group_messages": False, "supports_inline_queries": False}
+        elif metodo == "getUpdates":
+            offset = int(dados.get("offset") or 0)
+            self.pendentes = [u for u in self.pendentes if u["update_id"] >= offset]
+            if not self.pendentes:
+                self._chegou.clear()
+                try:
+                    await asyncio.wait_for(self._chegou.wait(), timeout=float(dados.get("timeout") or 0))
+                except asyncio.TimeoutError:
+                    pass
+            resultado = self.pendentes[:int(dados.get("limit") or 100)]
+        elif metodo in ("sendMessage", "editMessageText", "sendVoice"):
+            texto = dados.get("text") or ""
+            chat_id = int(dados.get("chat_id") or 0)
+            # Convenção do teste: o bot responde "ok <update_id>"
+            if texto.startswith("ok "):
+                self.respostas.setdefault(int(texto.split()[1]), time.perf_counter())
+            elif texto.startswith("⚠️ Erro interno"):
+                self.erros.setdefault(chat_id, time.perf_counter())
+            if metodo == "sendVoice":
+                self.vozes.setdefault(chat_id, time.perf_counter())
+            resultado = self._mensagem(chat_id, texto)
+        elif metodo == "getFile":
+            file_id = dados.get("file_id")
+            resultado = {"file_id": file_id, "file_unique_id": file_id, "file_size": len(self.arquivos.get(file_id, b"")),
+                         "file_path": f"voice/{file_id}.oga"}
+        elif metodo in ("setWebhook", "deleteWebhook", "close", "logOut"):
+            resultado = True
+        elif metodo == "getWebhookInfo":
+            resultado = {"url": "", "has_custom_certificate": False, "pending_update_count": len(self.pendentes)}
+        else:
+            resultado = True
+        return web.json_response({"ok": True, "result": resultado})
+
+    async def baixar(self, request):
+        file_id = request.match_info["caminho"].rsplit("/", 1)[-1].rsplit(".", 1)[0]
+        if file_id not in self.arquivos:
+            return web.Response(status=404)
+        return web.Response(body=self.arquivos[file_id], content_type="audio/ogg")
+
+    async def iniciar(self):
+        servidor = web.Application(client_max_size=32 * 1024 * 1024)
+        servidor.router.add_route("*", "/bot{token}/{metodo}", self.tratar)
+        servidor.router.add_get("/file/bot{token}/{caminho:.+}", self.baixar)
+        self._runner = web.AppRunner(servidor, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.porta)
+        await site.start()
+        self.porta = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def parar(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+
+class GeradorUpdates:
+    def __init__(self, chats=50, duplicatas=0.0, semente=42):
+        self.chats = chats
+        self.duplicatas = duplicatas
+        self.aleatorio = random.Random(semente)
+        self._ids = itertools.count(1)
+        self.enviados = {}             # update_id -> instante de criação
+        self.recusas = 0
+
+    def criar(self):
+        update_id = next(self._ids)
+        chat_id = 1000 + self.aleatorio.randrange(self.chats)
+        self.enviados[update_id] = time.perf_counter()
+        return {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id, "date": int(time.time()), "text": f"item {update_id}",
+                "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": chat_id, "is_bot": False, "first_name": f"Aluno{chat_id}"},
+            },
+        }
+
+    def criar_voz(self, servidor, audio, duracao=3):
+        """Nota de voz de um chat novo (cada nota com sessão própria); o áudio fica no servidor."""
+        update_id = next(self._ids)
+        chat_id = 100000 + update_id
+        file_id = f"voz{update_id}"
+        servidor.arquivos[file_id] = audio
+        self.enviados[update_id] = time.perf_counter()
+        return {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id, "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": chat_id, "is_bot": False, "first_name": f"Aluno{chat_id}"},
+                "voice": {"file_id": file_id, "file_unique_id": file_id, "duration": int(duracao),
+                          "mime_type": "audio/ogg", "file_size": len(audio)},
+            },
+        }
+
+    async def para_polling(self, servidor, total, taxa):
+        """'taxa' updates por segundo (0 = rajada única) na fila do getUpdates."""
+        for _ in range(total):
+            servidor.enfileirar(self.criar())
+            if taxa:
+                await asyncio.sleep(1 / taxa)
+
+    async def para_webhook(self, url, total, taxa, segredo=None):
+        """POSTs como o Telegram faria: 429 -> espera o Retry-After e reentrega; às vezes reentrega à toa."""
+        cabecalhos = {"X-Telegram-Bot-Api-Secret-Token": segredo} if segredo else {}
+        async with aiohttp.ClientSession(headers=cabecalhos) as sessao:
+            async def entregar(update):
+                while True:
+                    async with sessao.post(url, json=update) as resposta:
+                        if resposta.status != 429:
+                            break
+                        self.recusas += 1
+                        await asyncio.sleep(float(resposta.headers.get("Retry-After", "1")))
+                if self.aleatorio.random() < self.duplicatas:
+                    async with sessao.post(url, json=update):
+                        pass
+
+            tarefas = []
+            for _ in range(total):
+                tarefas.append(asyncio.create_task(entregar(self.criar())))
+                if taxa:
+                    await asyncio.sleep(1 / taxa)
+            await asyncio.gather(*tarefas)
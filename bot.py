@@ -1,66 +1,193 @@
 import os
-import google.generativeai as genai
-from groq import Groq
+import re
+import json
+import time
+import threading
 from dotenv import load_dotenv
 import requests
+import requests.adapters
+from pipeline import rodar_em_thread
+from despacho import HistoricoLatencia, RegistroDespacho, despachar, despachar_stream
+from saude import MonitorSaude, eh_rate_limit
+from cache import CacheLRU, CacheRespostas, hash_texto
+from contexto import ColetorContexto, FonteContexto
+from rag import MotorRAG
+from apoio import MemoriaApoio
+from orcamento import ajustar_secoes, contar_tokens, orcamento_tokens, montar_entrada
+from agendador import Agendador
+from metricas import telemetria
+from entidades import IndiceTitulosMemoria, carregar_indice, extrair_entidades
 
 load_dotenv()
 
+# Teto por chamada: com o circuit breaker, um provedor lento não deve segurar a fila por minutos
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+# Retentativas internas do SDK do Groq (o 429 agora vai para o breaker, que respeita o retry-after)
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "0"))
+# Fase 1 em uma chamada só: a correção da transcrição vai junto com o julgamento (ver processar_fase1)
+FASE1_RAPIDA = os.getenv("FASE1_RAPIDA", "1") == "1"
+FASE1_CHAVE = "1-rapida"   # Separa histórico de latência e cache do fluxo antigo
+VEREDITOS = ("CERTO", "ERRADO", "ERRO")
+# Avaliação em lote (lote.py): vários itens do mesmo Texto de Apoio por chamada
+FASE1_LOTE = "1-lote"
+MODELO_REVISOR = os.getenv("GROQ_MODELO_REVISOR", "llama-3.3-70b-versatile")
+
 # --- CLASSE AUXILIAR DE FERRAMENTAS (WIKIPÉDIA) ---
 class WikiTool:
-    def __init__(self):
+    TAMANHO_LOTE = 20           # a prop=extracts com exintro aceita até 20 páginas por chamada
+    TTL_POSITIVO = 24 * 3600
+    TTL_NEGATIVO = 6 * 3600     # "página não existe" também é memorizado, por menos tempo
+
+    def __init__(self, modo=None, caminho_dump=None):
         # Endpoint oficial da Wikipédia em Português
-        self.api_url = "https://pt.wikipedia.org/w/api.php"
+        self.api_url = os.getenv("WIKI_API_URL", "https://pt.wikipedia.org/w/api.php")
+        self.timeout = (1.0, float(os.getenv("WIKI_TIMEOUT", "2")))  # (conexão, leitura)
+        # online: só rede | offline: só dump local | hibrido: dump primeiro, rede se faltar
+        self.modo = modo or os.getenv("WIKI_MODO", "online")
+
+        # Sessão com pool: reaproveita a conexão TLS entre buscas
+        self.session = requests.Session()
+        adaptador = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        self.session.mount("https://", adaptador)
+        self.session.mount("http://", adaptador)
+        self.session.headers["User-Agent"] = "Resolve.ia/1.0 (bot de estudos CACD)"
+
+        # Cache título -> extrato ("" = não existe)
+        self.cache = CacheLRU(max_itens=int(os.getenv("WIKI_CACHE_ITENS", "2000")), ttl=self.TTL_POSITIVO)
+
+        # Só entidades com confiança >= limiar vão para a rede, no máximo max_titulos por item
+        self.limiar = float(os.getenv("WIKI_CONFIANCA_MINIMA", "0.6"))
+        self.max_titulos = int(os.getenv("WIKI_MAX_TITULOS", "3"))
+        self.estatisticas = {"buscas": 0, "sem_entidade": 0, "titulos": 0, "encontrados": 0}
+        # Títulos e redirecionamentos conhecidos (entidades.py); sem ele, só padrões de superfície
+        self.indice_titulos = carregar_indice()
+
+        self.indice_local = {}
+        caminho_dump = caminho_dump or os.getenv("WIKI_DUMP")
+        if caminho_dump:
+            self.carregar_dump(caminho_dump)
+        elif self.modo != "online":
+            print("⚠️ WikiTool: modo offline sem WIKI_DUMP, nenhuma busca vai encontrar nada")
+
+    @staticmethod
+    def _chave(titulo):
+        return " ".join(titulo.split()).casefold()
+
+    def carregar_dump(self, caminho):
+        """
+        Carrega um índice local de extratos.
+        Formato JSONL: {"title": ..., "extract": ..., "redirects": [...]} por linha.
+        """
+        inicio = time.perf_counter()
+        titulos = []
+        with open(caminho, encoding="utf-8") as arquivo:
+            for linha in arquivo:
+                if not linha.strip():
+                    continue
+                pagina = json.loads(linha)
+                extract = pagina.get("extract", "")
+                for titulo in [pagina["title"], *pagina.get("redirects", [])]:
+                    self.indice_local[self._chave(titulo)] = extract
+                    titulos.append((titulo, "" if titulo == pagina["title"] else pagina["title"]))
+        # Sem o índice completo (WIKI_INDICE), as entidades são conferidas nos títulos do dump
+        if self.indice_titulos is None and self.modo == "offline":
+            self.indice_titulos = IndiceTitulosMemoria(titulos)
+        print(f"📚 WikiTool: {len(self.indice_local)} títulos locais em {time.perf_counter() - inicio:.2f}s")
+
+    def aquecer(self):
+        """Abre a conexão do pool com uma consulta mínima (siteinfo)."""
+        if self.modo != "offline":
+            self.session.get(self.api_url, params={"action": "query", "meta": "siteinfo", "format": "json"},
+                             timeout=self.timeout).raise_for_status()
+
+    def titulos_da_consulta(self, query):
+        """Títulos confiáveis do item, já resolvidos para a página de destino quando há índice."""
+        entidades = extrair_entidades(query, self.indice_titulos)
+        return [e.titulo for e in entidades if e.confianca >= self.limiar][:self.max_titulos]
+
+    def buscar_titulos(self, titulos):
+        """
+        Resolve vários títulos de uma vez (cache -> dump local -> uma chamada titles=a|b|c).
+        Retorna {titulo_pedido: extrato} ("" quando a página não existe).
+        """
+        resultado, faltando = {}, []
+        for titulo in titulos:
+            chave = self._chave(titulo)
+            if chave in self.cache:
+                resultado[titulo] = self.cache.get(chave)
+            elif self.modo != "online" and chave in self.indice_local:
+                resultado[titulo] = self.indice_local[chave]
+            elif self.modo == "offline":
+                resultado[titulo] = ""
+            else:
+                faltando.append(titulo)
+
+        for i in range(0, len(faltando), self.TAMANHO_LOTE):
+            resultado.update(self._buscar_lote_api(faltando[i:i + self.TAMANHO_LOTE]))
+        return resultado
+
+    def _buscar_lote_api(self, titulos):
+        # 2. Parâmetros da API MediaWiki
+        params = {
+            "action": "query",
+            "format": "json",
+            "titles": "|".join(titulos),
+            "prop": "extracts",
+            "explaintext": 1,   # Traz texto puro, sem HTML
+            "exintro": 1,       # Traz APENAS a introdução (resumo)
+            "exlimit": "max",   # Um extrato por página do lote
+            "redirects": 1      # Segue redirecionamentos automaticamente
+        }
+
+        # 3. Requisição HTTP (sessão com pool, timeout curto)
+        response = self.session.get(self.api_url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json().get("query", {})
+
+        # 4. Processamento: mapeia título pedido -> normalizado -> redirecionado -> página
+        destino = {t: t for t in titulos}
+        for etapa in ("normalized", "redirects"):
+            mapa = {item["from"]: item["to"] for item in data.get(etapa, [])}
+            destino = {pedido: mapa.get(atual, atual) for pedido, atual in destino.items()}
+        extratos = {}
+        for page_id, pagina in data.get("pages", {}).items():
+            if page_id != "-1" and "missing" not in pagina:
+                extratos[pagina.get("title")] = pagina.get("extract", "")
+
+        resultado = {}
+        for pedido in titulos:
+            extract = extratos.get(destino[pedido], "")
+            self.cache.set(self._chave(pedido), extract, ttl=self.TTL_POSITIVO if extract else self.TTL_NEGATIVO)
+            resultado[pedido] = extract
+        return resultado
 
     def search(self, query):
         """
         Faz uma busca direta na API da Wikipédia e retorna o resumo.
         """
         try:
-            # 1. Limpeza da query (para não buscar "Item 102 União Europeia")
-            termos_ignorados = ["julgue", "item", "texto de apoio", "texto base", "no que se refere", "acerca de"]
-            query_limpa = query.lower()
-            for termo in termos_ignorados:
-                query_limpa = query_limpa.replace(termo, "")
-            
-            query_limpa = query_limpa.strip()
+            self.estatisticas["buscas"] += 1
+            titulos = self.titulos_da_consulta(query)
 
-            # Se a query ficar vazia ou muito curta, aborta para não gastar tempo
-            if len(query_limpa) < 5:
+            # Nenhuma entidade confiável: o item inteiro como título quase nunca existe, não gasta a rede
+            if not titulos:
+                self.estatisticas["sem_entidade"] += 1
                 return ""
 
-            print(f"🌍 WikiTool: Buscando por '{query_limpa}'...")
-
-            # 2. Parâmetros da API MediaWiki
-            params = {
-                "action": "query",
-                "format": "json",
-                "titles": query_limpa,
-                "prop": "extracts",
-                "explaintext": 1,   # Traz texto puro, sem HTML
-                "exintro": 1,       # Traz APENAS a introdução (resumo)
-                "redirects": 1      # Segue redirecionamentos automaticamente
-            }
-
-            # 3. Requisição HTTP
-            response = requests.get(self.api_url, params=params, timeout=2) # Timeout curto
-            response.raise_for_status()
-            data = response.json()
-
-            # 4. Processamento da Resposta
-            pages = data['query']['pages']
-            page_id = next(iter(pages))
-            
-            if page_id == "-1":
-                return ""
+            print(f"🌍 WikiTool: Buscando por {titulos}...")
 
-            extract = pages[page_id].get('extract', '')
+            # Todos os títulos vão numa única requisição
+            encontrados = self.buscar_titulos(titulos)
+            extratos = [(t, encontrados[t]) for t in titulos if encontrados.get(t)]
+            self.estatisticas["titulos"] += len(titulos)
+            self.estatisticas["encontrados"] += len(extratos)
 
-            if not extract:
+            if not extratos:
                 return ""
 
-            # Retorna formatado para entrar no Contexto
-            return f"\n[FONTE WIKIPÉDIA - ATUALIDADES/FATOS]: {extract[:800]}..."
+            # Retorna formatado para entrar no Contexto (um trecho por verbete)
+            return "\n[FONTE WIKIPÉDIA - ATUALIDADES/FATOS]: " + "\n---\n".join(
+                f"{titulo}: {extract[:800]}..." for titulo, extract in extratos)
 
         except Exception as e:
             print(f"⚠️ Erro na WikiTool: {e}")
@@ -72,47 +199,152 @@ class ResolveIaBlindado:
         # 1. INICIALIZA A FERRAMENTA WIKI
         self.wiki = WikiTool()
 
-        # --- CONFIGURAÇÃO GEMINI (TITULAR) ---
+        # Motor RAG (índice local por padrão; Pinecone com RAG_INDICE=pinecone)
         try:
-            genai.configure(api_key=os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY"))
-            self.gemini_model = genai.GenerativeModel(
-                model_name=os.getenv("GEMINI_MODEL"),
-                generation_config={"temperature": 0.1} 
-            )
-            self.gemini_ok = True
+            self.rag = MotorRAG()
+            print(f"📚 Índice RAG com {len(self.rag.indice)} trechos")
         except Exception as e:
-            print(f"⚠️ Erro ao configurar Gemini: {e}")
-            self.gemini_ok = False
-
-        # --- CONFIGURAÇÃO GROQ (RESERVA DE LUXO) ---
+            print(f"⚠️ Erro ao abrir índice RAG: {e}")
+            self.rag = None
+
+        # Fontes de contexto independentes: rodam em paralelo, cada uma com seu orçamento
+        self.coletor = ColetorContexto([
+            FonteContexto("rag", self._buscar_rag, float(os.getenv("CONTEXTO_TIMEOUT_RAG", "1.5"))),
+            # Só ativa se o input for maior que 15 chars (evita "olá", "sim", etc)
+            FonteContexto("wiki", self.wiki.search, float(os.getenv("CONTEXTO_TIMEOUT_WIKI", "2.2")),
+                          ativa=lambda query: len(query) > 15),
+        ])
+
+        # Histórico de latência (base do hedge) e placar de quem venceu cada despacho
+        self.latencias = HistoricoLatencia()
+        self.despachos = RegistroDespacho()
+        # Circuit breaker por provedor (saúde dinâmica, ao contrário do *_configurado)
+        self.saude = MonitorSaude(["gemini", "groq"])
+        # Cache de respostas (itens do CEBRASPE se repetem muito entre treinos)
+        self.cache = CacheRespostas()
+        self._hash_templates = {}
+        # Cotas RPM/TPM por provedor e modelo, com a Fase 1 na frente da fila
+        self.agendador = Agendador()
+        # Textos de Apoio preparados uma vez (fatias + resumo), com o mesmo embedder do RAG
         try:
-            self.groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-            self.groq_model = os.getenv("GROQ_MODEL")
-            self.groq_ok = True
+            self.apoio = MemoriaApoio(embedder=self.rag.embedder if self.rag else None)
         except Exception as e:
-            print(f"⚠️ Erro ao configurar Groq: {e}")
-            self.groq_ok = False
+            print(f"⚠️ Memória de Textos de Apoio indisponível (texto vai inteiro): {e}")
+            self.apoio = None
+
+        # --- PROVEDORES (CLIENTES CRIADOS NO PRIMEIRO USO, VER _cliente) ---
+        # Importar google.generativeai custa ~1s: o worker entra no polling antes e o
+        # aquecimento (aquecer) cria os clientes em segundo plano
+        # GEMINI_API_ENDPOINT (REST) aponta para outro servidor, ex.: o falso dos benchmarks
+        self.gemini_endpoint = os.getenv("GEMINI_API_ENDPOINT")
+        self.gemini_model_name = os.getenv("GEMINI_MODEL")
+        self.groq_model = os.getenv("GROQ_MODEL")
+        self.gemini_configurado = True
+        self.groq_configurado = True
+        self._clientes = {}
+        self._lock_clientes = threading.Lock()
+
+    # --- CONFIGURAÇÃO GEMINI (TITULAR) ---
+    def _criar_gemini(self):
+        import google.generativeai as genai
+        extras = {"transport": "rest", "client_options": {"api_endpoint": self.gemini_endpoint}} if self.gemini_endpoint else {}
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY"), **extras)
+        return genai.GenerativeModel(
+            model_name=self.gemini_model_name,
+            generation_config={"temperature": 0.1}
+        )
+
+    # --- CONFIGURAÇÃO GROQ (RESERVA DE LUXO) ---
+    def _criar_groq(self):
+        from groq import Groq
+        return Groq(api_key=os.getenv("GROQ_API_KEY"), timeout=LLM_TIMEOUT, max_retries=GROQ_MAX_RETRIES)
+
+    def _criar_groq_async(self):
+        from groq import AsyncGroq
+        return AsyncGroq(api_key=os.getenv("GROQ_API_KEY"), timeout=LLM_TIMEOUT, max_retries=GROQ_MAX_RETRIES)
+
+    def _cliente(self, nome, fabrica, provedor):
+        """Cria o cliente uma vez só; se falhar, o provedor sai do despacho como antes."""
+        cliente = self._clientes.get(nome)
+        if cliente is not None:
+            return cliente
+        with self._lock_clientes:
+            if nome not in self._clientes:
+                try:
+                    self._clientes[nome] = fabrica()
+                except Exception as e:
+                    print(f"⚠️ Erro ao configurar {provedor.capitalize()}: {e}")
+                    setattr(self, f"{provedor}_configurado", False)
+                    raise
+            return self._clientes[nome]
+
+    @property
+    def gemini_model(self):
+        return self._cliente("gemini", self._criar_gemini, "gemini")
+
+    @property
+    def groq_client(self):
+        return self._cliente("groq", self._criar_groq, "groq")
+
+    @property
+    def groq_async_client(self):
+        return self._cliente("groq_async", self._criar_groq_async, "groq")
+
+    async def _cliente_async(self, propriedade):
+        """Nos caminhos assíncronos, a criação (imports pesados) não pode travar o event loop."""
+        return await rodar_em_thread("llm", getattr, self, propriedade)
+
+    def aquecer(self, rede=True, prioridade="groq"):
+        """
+        Cria os clientes e, com rede=True, abre as conexões (TLS) que a primeira pergunta
+        usaria. O provedor prioritário vem antes; o outro (o import do Gemini é o mais caro)
+        fica por último. Roda numa thread do worker; falhas só viram aviso.
+        """
+        provedores = {
+            "groq": [("groq", lambda: self.groq_client), ("groq_async", lambda: self.groq_async_client)]
+                    + ([("groq_conexao", lambda: self.groq_client.models.list())] if rede else []),
+            "gemini": [("gemini", lambda: self.gemini_model)],
+        }
+        outro = "gemini" if prioridade == "groq" else "groq"
+        etapas = provedores[prioridade] + ([("wiki", self.wiki.aquecer)] if rede else []) + provedores[outro]
+        tempos = {}
+        for nome, etapa in etapas:
+            inicio = time.perf_counter()
+            try:
+                etapa()
+                tempos[nome] = round(time.perf_counter() - inicio, 3)
+            except Exception as e:
+                print(f"⚠️ Aquecimento de {nome} falhou: {e}")
+        return tempos
+
+    # Configurado E com circuito não aberto
+    @property
+    def gemini_ok(self):
+        return self.gemini_configurado and self.saude.disponivel("gemini")
+
+    @property
+    def groq_ok(self):
+        return self.groq_configurado and self.saude.disponivel("groq")
 
     def _buscar_rag(self, query):
-        """Simulação ou chamada real do Pinecone"""
+        """Top-k trechos da bibliografia e das respostas de alta nota (ver rag.py)"""
+        if not self.rag:
+            return ""
         print(f"🔍 Buscando contexto RAG para: {query}")
-        # AQUI VAI SUA LÓGICA DE PINECONE
-        return f"[CONTEXTO BIBLIOGRÁFICO] (Aqui entraria o texto do PDF sobre {query})"
+        return MotorRAG.formatar(self.rag.buscar(query))
 
     def _montar_prompt(self, query, contexto, fase):
-        """Constrói o System Prompt adaptado para o CACD 2026"""
+        """
+        Constrói o System Prompt adaptado para o CACD 2026.
+        Instruções fixas primeiro, contexto e input no fim: o prefixo idêntico entre chamadas
+        é o que o cache de prompt do Groq/Gemini consegue reaproveitar.
+        """
         
         # --- FASE 1: CLASSIFICADOR BINÁRIO (Robô) ---
         if fase == '1':
             return f"""
             ATUE COMO UM CLASSIFICADOR LÓGICO DE QUESTÕES DO CEBRASPE.
             
-            --- CONTEXTO (FONTE DE VERDADE) ---
-            {contexto}
-            -----------------------------------
-            
-            INPUT DO USUÁRIO: "{query}"
-            
             SUA TAREFA:
             1. Identifique os fatos chave (datas, nomes, conceitos).
             2. Verifique se o Contexto suporta esses fatos.
@@ -131,6 +363,12 @@ class ResolveIaBlindado:
             - NÃO complete a frase (Ex: Não diga "O item está CERTO").
             
             Sua resposta deve conter EXATAMENTE UMA PALAVRA.
+            
+            --- CONTEXTO (FONTE DE VERDADE) ---
+            {contexto}
+            -----------------------------------
+            
+            INPUT DO USUÁRIO: "{query}"
             """
 
         # --- FASE 2: TUTOR / LEDOR (Humano Culto) ---
@@ -142,10 +380,6 @@ class ResolveIaBlindado:
         Seu texto deve parecer produzido por alguém que domina profundamente o conteúdo e escreve com naturalidade analítica.
         Sua resposta será convertida em áudio, portanto mantenha formalidade e ritmo de ditado.
 
-        --- CONTEXTO (RAG – BASE DE RESPOSTAS DE ALTA NOTA) ---
-        {contexto}
-        -------------------------------------------------------
-
         # MISSÃO
 
         Produzir uma redação analítica completa no padrão das melhores provas do CACD.
@@ -233,6 +467,10 @@ class ResolveIaBlindado:
         - Modele seu fluxo narrativo nesses padrões.
         - Preserve originalidade textual.
 
+        --- CONTEXTO (RAG – BASE DE RESPOSTAS DE ALTA NOTA) ---
+        {contexto}
+        -------------------------------------------------------
+
         # INPUT DO USUÁRIO
 
         Enunciado da questão:
@@ -241,39 +479,179 @@ class ResolveIaBlindado:
         Redija agora a resposta completa, em formato integralmente dissertativo.
         """
 
+    def _montar_prompt_fase1_rapida(self, query, contexto):
+        """Fase 1 com a revisão embutida: um único JSON com o item corrigido e o veredito."""
+        return f"""
+            ATUE COMO UM CLASSIFICADOR LÓGICO DE QUESTÕES DO CEBRASPE.
+            O INPUT DO USUÁRIO (no fim) é uma transcrição automática de áudio e pode ter erros fonéticos.
+            
+            SUA TAREFA:
+            1. Reescreva o ITEM corrigindo palavras ouvidas errado, nomes próprios e siglas, sem mudar o sentido.
+            2. Identifique os fatos chave (datas, nomes, conceitos) do item corrigido.
+            3. Verifique se o Contexto suporta esses fatos e se a relação de causa e efeito está correta.
+            4. Procure por "pegadinhas" (ex: "apenas", "exceto", "nunca").
+            
+            VEREDITO:
+            - Verdadeira segundo o contexto -> "CERTO"
+            - Falsa segundo o contexto -> "ERRADO"
+            - Contexto não menciona o assunto -> "ERRO"
+            
+            OUTPUT: APENAS um JSON, sem explicações:
+            {{"item": "<item corrigido>", "veredito": "CERTO" | "ERRADO" | "ERRO"}}
+            
+            --- CONTEXTO (FONTE DE VERDADE) ---
+            {contexto}
+            -----------------------------------
+            
+            INPUT DO USUÁRIO: "{query}"
+            """
+
+    def _montar_prompt_fase1_lote(self, itens, contexto):
+        """Vários itens numerados em uma chamada (lote.py): um veredito por número, em JSON."""
+        return f"""
+            ATUE COMO UM CLASSIFICADOR LÓGICO DE QUESTÕES DO CEBRASPE.
+            Os ITENS numerados (no fim, depois do Texto Base quando houver) devem ser julgados
+            um a um, de forma independente: o veredito de um item não influencia o de outro.
+            
+            PARA CADA ITEM:
+            1. Identifique os fatos chave (datas, nomes, conceitos).
+            2. Verifique se o Contexto e o Texto Base suportam esses fatos e se a relação de causa e efeito está correta.
+            3. Procure por "pegadinhas" (ex: "apenas", "exceto", "nunca").
+            
+            VEREDITO:
+            - Verdadeiro segundo o contexto -> "CERTO"
+            - Falso segundo o contexto -> "ERRADO"
+            - Contexto não menciona o assunto -> "ERRO"
+            
+            OUTPUT: APENAS um JSON, sem explicações, com todos os números:
+            {{"vereditos": [{{"n": 1, "veredito": "CERTO" | "ERRADO" | "ERRO"}}, ...]}}
+            
+            --- CONTEXTO (FONTE DE VERDADE) ---
+            {contexto}
+            -----------------------------------
+            
+            ITENS:
+            {itens}
+            """
+
     def _chamar_gemini(self, prompt):
         print("🤖 Tentando Gemini...")
-        response = self.gemini_model.generate_content(prompt)
+        response = self.gemini_model.generate_content(prompt, request_options={"timeout": LLM_TIMEOUT})
         return response.text
 
+    async def _stream_gemini(self, prompt):
+        print("🤖 Tentando Gemini (stream)...")
+        modelo = self._clientes.get("gemini") or await self._cliente_async("gemini_model")
+        if self.gemini_endpoint:
+            # O SDK não tem cliente assíncrono sobre REST: o stream síncrono avança no pool
+            response = await rodar_em_thread("llm", modelo.generate_content, prompt, stream=True,
+                                             request_options={"timeout": LLM_TIMEOUT})
+            trechos = iter(response)
+            while (chunk := await rodar_em_thread("llm", next, trechos, None)) is not None:
+                if chunk.text:
+                    yield chunk.text
+            return
+        response = await modelo.generate_content_async(prompt, stream=True, request_options={"timeout": LLM_TIMEOUT})
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+    def _parametros_groq(self, prompt, stream):
+        # LÓGICA ESPECIAL PARA O MODELO DE RACIOCÍNIO (GPT-OSS-120B)
+        if "oss" in self.groq_model or "120b" in self.groq_model:
+            return dict(
+                messages=[{"role": "user", "content": prompt}],
+                model=self.groq_model,
+                reasoning_effort="medium", 
+                temperature=1.0,
+                max_completion_tokens=8192,
+                top_p=1,
+                stream=stream,
+                stop=None
+            )
+        return dict(
+            messages=[{"role": "user", "content": prompt}],
+            model=self.groq_model,
+            temperature=0.1,
+            max_completion_tokens=4096,
+            top_p=1,
+            stream=stream
+        )
+
     def _chamar_groq(self, prompt):
         print(f"⚡ Acionando Backup Groq: {self.groq_model}")
         try:
-            # LÓGICA ESPECIAL PARA O MODELO DE RACIOCÍNIO (GPT-OSS-120B)
-            if "oss" in self.groq_model or "120b" in self.groq_model:
-                chat_completion = self.groq_client.chat.completions.create(
-                    messages=[{"role": "user", "content": prompt}],
-                    model=self.groq_model,
-                    reasoning_effort="medium", 
-                    temperature=1.0,
-                    max_completion_tokens=8192,
-                    top_p=1,
-                    stream=False,
-                    stop=None
-                )
-            else:
-                chat_completion = self.groq_client.chat.completions.create(
-                    messages=[{"role": "user", "content": prompt}],
-                    model=self.groq_model,
-                    temperature=0.1,
-                    max_completion_tokens=4096,
-                    top_p=1,
-                    stream=False
-                )
+            chat_completion = self.groq_client.chat.completions.create(**self._parametros_groq(prompt, stream=False))
             return chat_completion.choices[0].message.content
         except Exception as e:
             print(f"❌ Erro Crítico no Groq ({self.groq_model}): {e}")
-            return None # Retorna None para o loop tentar o próximo
+            raise # O despacho registra a falha no circuit breaker e tenta o próximo
+
+    async def _stream_groq(self, prompt):
+        print(f"⚡ Acionando Groq (stream): {self.groq_model}")
+        cliente = self._clientes.get("groq_async") or await self._cliente_async("groq_async_client")
+        stream = await cliente.chat.completions.create(**self._parametros_groq(prompt, stream=True))
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def _chamar_gemini_json(self, prompt):
+        print("🤖 Tentando Gemini (Fase 1 rápida)...")
+        response = self.gemini_model.generate_content(
+            prompt,
+            generation_config={"temperature": 0.1, "response_mime_type": "application/json", "max_output_tokens": 512},
+            request_options={"timeout": LLM_TIMEOUT},
+        )
+        uso = getattr(response, "usage_metadata", None)
+        if uso: print(f"🧾 Gemini: {uso.prompt_token_count} tokens de entrada, {uso.candidates_token_count} de saída")
+        return response.text
+
+    def _chamar_groq_json(self, prompt):
+        print(f"⚡ Acionando Groq (Fase 1 rápida): {self.groq_model}")
+        parametros = self._parametros_groq(prompt, stream=False)
+        parametros["response_format"] = {"type": "json_object"}
+        if "reasoning_effort" in parametros:
+            parametros["reasoning_effort"] = "low"
+        else:
+            parametros["max_completion_tokens"] = 512
+        chat_completion = self.groq_client.chat.completions.create(**parametros)
+        if chat_completion.usage:
+            print(f"🧾 Groq: {chat_completion.usage.prompt_tokens} tokens de entrada, {chat_completion.usage.completion_tokens} de saída")
+        return chat_completion.choices[0].message.content
+
+    @staticmethod
+    def _ler_veredito(resposta):
+        """(veredito, item corrigido) a partir do JSON; se o modelo fugir do formato, procura a palavra."""
+        try:
+            dados = json.loads(resposta[resposta.find("{"):resposta.rfind("}") + 1])
+        except Exception:
+            dados = {}
+        veredito = str(dados.get("veredito", "")).strip().upper()
+        if veredito not in VEREDITOS:
+            achados = re.findall(r"\b(CERTO|ERRADO|ERRO)\b", resposta.upper())
+            veredito = achados[-1] if achados else "ERRO"
+        return veredito, str(dados.get("item") or "").strip()
+
+    @staticmethod
+    def _ler_vereditos_lote(resposta, quantidade):
+        """Lista com um veredito por item (None para os que o modelo pulou ou respondeu fora do formato)."""
+        try:
+            dados = json.loads(resposta[resposta.find("{"):resposta.rfind("}") + 1])
+            lista = dados.get("vereditos") or []
+        except Exception:
+            lista = []
+        vereditos = [None] * quantidade
+        for posicao, entrada in enumerate(lista):
+            if not isinstance(entrada, dict):
+                continue
+            try:
+                n = int(entrada.get("n", posicao + 1))
+            except (TypeError, ValueError):
+                continue
+            veredito = str(entrada.get("veredito", "")).strip().upper()
+            if 1 <= n <= quantidade and veredito in VEREDITOS:
+                vereditos[n - 1] = veredito
+        return vereditos
 
     def _corrigir_transcricao(self, texto_sujo):
         """
@@ -305,71 +683,315 @@ class ResolveIaBlindado:
         try:
             # Usa Groq Llama 3 (Rápido)
             if self.groq_ok:
-                chat_completion = self.groq_client.chat.completions.create(
-                    messages=[{"role": "user", "content": prompt_revisao}],
-                    model="llama-3.3-70b-versatile",
-                    temperature=0.1,
-                    max_completion_tokens=1024
-                )
-                return chat_completion.choices[0].message.content.strip()
+                tokens = self.agendador.estimar_tokens(contar_tokens(prompt_revisao), "correcao")
+                self.agendador.aguardar("groq", MODELO_REVISOR, tokens, self.agendador.prioridade("correcao"))
+                with telemetria.span("llm", "groq", fase="correcao", tokens_entrada=contar_tokens(prompt_revisao)) as span:
+                    chat_completion = self.groq_client.chat.completions.create(
+                        messages=[{"role": "user", "content": prompt_revisao}],
+                        model=MODELO_REVISOR,
+                        temperature=0.1,
+                        max_completion_tokens=1024
+                    )
+                    texto = chat_completion.choices[0].message.content.strip()
+                    span.update(tokens_saida=contar_tokens(texto), chars=len(texto))
+                return texto
             return texto_sujo 
         except Exception as e:
             print(f"⚠️ Falha Editor: {e}")
+            # Mesma chave/cota do Groq: um 429 aqui também vale para o processar
+            if eh_rate_limit(e):
+                self.saude.falha("groq", e)
             return texto_sujo
 
-    def processar(self, inputs):
+    def _modelo_id(self, nome):
+        return f"gemini:{getattr(self, 'gemini_model_name', None)}" if nome == 'gemini' else f"groq:{getattr(self, 'groq_model', None)}"
+
+    def _hash_template(self, fase):
+        # Muda sempre que o texto do _montar_prompt mudar, invalidando respostas antigas
+        if fase not in self._hash_templates:
+            if fase == FASE1_CHAVE:
+                template = self._montar_prompt_fase1_rapida("{query}", "{contexto}")
+            elif fase == FASE1_LOTE:
+                template = self._montar_prompt_fase1_lote("{query}", "{contexto}")
+            else:
+                template = self._montar_prompt("{query}", "{contexto}", fase)
+            self._hash_templates[fase] = hash_texto(template)
+        return self._hash_templates[fase]
+
+    def _chaves_cache(self, inputs, nomes):
+        user_input, fase = inputs.get('user_input'), inputs.get('fase')
+        return [CacheRespostas.chave(user_input, fase, self._modelo_id(nome), self._hash_template(fase)) for nome in nomes]
+
+    def _consultar_cache(self, inputs, nomes):
+        if not self.cache.ativo(inputs.get('fase')) or inputs.get('sem_cache'):
+            return None
+        valor = self.cache.buscar(self._chaves_cache(inputs, nomes))
+        if valor:
+            print("🗃️ Resposta servida do cache")
+            return valor["resposta"], f"{valor['label']} (cache)"
+        return None
+
+    def _gravar_cache(self, inputs, nome, resposta, label_visual):
+        if self.cache.ativo(inputs.get('fase')) and resposta:
+            chave = self._chaves_cache(inputs, [nome])[0]
+            self.cache.set(chave, {"resposta": resposta, "label": label_visual, "criado": time.time()})
+
+    def coletar_contexto(self, query):
+        """RAG (Base Oficial) + Wikipédia (Atualidades) em paralelo, até o prazo."""
+        return self.coletor.coletar(query).texto
+
+    async def coletar_contexto_async(self, query):
+        return (await self.coletor.coletar_async(query)).texto
+
+    def _modelo(self, nome):
+        return getattr(self, 'gemini_model_name', None) if nome == 'gemini' else getattr(self, 'groq_model', None)
+
+    def _orcamento(self, nomes):
+        """O mesmo prompt pode ir para qualquer candidato: vale o menor orçamento entre eles."""
+        return min((orcamento_tokens(nome, self._modelo(nome)) for nome in nomes), default=orcamento_tokens(None))
+
+    def _agendado(self, nome, chamar, tipo, lote=False):
+        """Chamada síncrona que espera a vez na cota do provedor/modelo antes de sair (lote: atrás do bot ao vivo)."""
+        def chamada(prompt, cancelado=None):
+            entrada = contar_tokens(prompt)
+            with telemetria.span("fila", nome):
+                self.agendador.aguardar(nome, self._modelo(nome), self.agendador.estimar_tokens(entrada, tipo),
+                                        self.agendador.prioridade(tipo, lote), cancelado)
+            with telemetria.span("llm", nome, fase=str(tipo), tokens_entrada=entrada) as span:
+                resposta = chamar(prompt)
+                span.update(tokens_saida=contar_tokens(resposta), chars=len(resposta or ""))
+                return resposta
+        return chamada
+
+    def _agendado_stream(self, nome, stream, tipo):
+        """Mesmo que _agendado, para os geradores assíncronos (espera sem prender thread)."""
+        async def chamada(prompt):
+            entrada = contar_tokens(prompt)
+            with telemetria.span("fila", nome):
+                await self.agendador.aguardar_async(nome, self._modelo(nome), self.agendador.estimar_tokens(entrada, tipo),
+                                                    self.agendador.prioridade(tipo))
+            gerador = stream(prompt)
+            with telemetria.span("llm", nome, fase=f"{tipo}-stream", tokens_entrada=entrada) as span:
+                inicio, partes = time.perf_counter(), []
+                try:
+                    async for trecho in gerador:
+                        if not partes:
+                            span["ttfb"] = round(time.perf_counter() - inicio, 4)
+                        partes.append(trecho)
+                        yield trecho
+                finally:
+                    texto = "".join(partes)
+                    span.update(tokens_saida=contar_tokens(texto), chars=len(texto))
+                    await gerador.aclose()
+        return chamada
+
+    def _montar_prompt_orcado(self, query, contexto, fase, orcamento, montar=None):
+        """Mede template, entrada e contexto e corta o que passar do orçamento de tokens de entrada."""
+        montar = montar or (lambda q, c: self._montar_prompt(q, c, fase))
+        fixo = contar_tokens(montar("", ""))
+        query, contexto, medidas = ajustar_secoes(query or "", contexto or "", orcamento - fixo)
+        prompt = montar(query, contexto)
+        (entrada_antes, entrada), (contexto_antes, contexto_depois) = medidas["entrada"], medidas["contexto"]
+        cortes = "" if (entrada, contexto_depois) == (entrada_antes, contexto_antes) else \
+            f" | cortado: entrada {entrada_antes}->{entrada}, contexto {contexto_antes}->{contexto_depois}"
+        print(f"🧮 Prompt fase {fase}: {contar_tokens(prompt)} tokens (template {fixo}, entrada {entrada}, "
+              f"contexto {contexto_depois}) / orçamento {orcamento}{cortes}")
+        return prompt
+
+    def _preparar_prompt(self, inputs, nomes=('groq', 'gemini')):
         user_input = inputs.get('user_input')
         fase = inputs.get('fase')
-        prioridade = inputs.get('prioridade', 'gemini')
 
-        # 1. Busca dados do RAG (Base Oficial)
-        contexto_rag = self._buscar_rag(user_input)
-        
-        # 2. Busca dados da WIKIPÉDIA (Complemento de Atualidades)
-        # Só ativa se o input for maior que 15 chars (evita "olá", "sim", etc)
-        contexto_wiki = ""
-        if len(user_input) > 15:
-             contexto_wiki = self.wiki.search(user_input)
-
-        # 3. Consolidação do Contexto (RAG + Wiki)
-        # O prompt recebe tudo junto e trata como "Contexto"
-        contexto_final = f"{contexto_rag}\n{contexto_wiki}"
-
-        # 4. Monta o Prompt Único (com o contexto turbinado)
-        prompt_final = self._montar_prompt(user_input, contexto_final, fase)
-
-        # 5. Define a ordem de execução
-        ordem_tentativa = []
-        if prioridade == 'groq':
-            ordem_tentativa = [
-                ('groq', self.groq_ok, self._chamar_groq, "Groq ⚡"),
-                ('gemini', self.gemini_ok, self._chamar_gemini, "Gemini 💎")
-            ]
-        else:
-            ordem_tentativa = [
-                ('gemini', self.gemini_ok, self._chamar_gemini, "Gemini 💎"),
-                ('groq', self.groq_ok, self._chamar_groq, "Groq ⚡")
-            ]
-
-        # 6. Loop de Execução
-        errors = []
-        for nome, status_ok, funcao_chamar, label_visual in ordem_tentativa:
-            if status_ok:
-                try:
-                    print(f"🔄 Tentando via {nome}...")
-                    resposta = funcao_chamar(prompt_final)
-                    
-                    if resposta: # Garante que não voltou None ou Vazio
-                        resposta = resposta.strip()
-                        return resposta, label_visual
-                    else:
-                         errors.append(f"{nome} retornou vazio.")
+        # 1-3. Contexto: já coletado pelo chamador (ex.: em paralelo com a limpeza) ou coletado agora
+        contexto_final = inputs.get('contexto')
+        if contexto_final is None:
+            contexto_final = self.coletar_contexto(user_input)
 
-                except Exception as e:
-                    msg_erro = f"Falha em {nome}: {e}"
-                    print(f"❌ {msg_erro}")
-                    errors.append(msg_erro)
-            else:
-                errors.append(f"{nome} off.")
+        # 4. Monta o Prompt Único (com o contexto turbinado), dentro do orçamento dos candidatos
+        return self._montar_prompt_orcado(user_input, contexto_final, fase, self._orcamento(nomes))
+
+    def _ordem_tentativa(self, prioridade, fase=None):
+        """
+        Lista de (nome, chamada_sync, chamada_stream, label) na ordem de prioridade,
+        reordenada pelo circuit breaker (e pelo p95 da fase), e a lista de erros dos que ficaram de fora.
+        """
+        groq = ('groq', self.groq_configurado, self._chamar_groq, self._stream_groq, "Groq ⚡")
+        gemini = ('gemini', self.gemini_configurado, self._chamar_gemini, self._stream_gemini, "Gemini 💎")
+        ordem = [groq, gemini] if prioridade == 'groq' else [gemini, groq]
+        errors = [f"{nome} off." for nome, configurado, _, _, _ in ordem if not configurado]
+        ordenados, abertos = self.saude.ordenar([(nome, sync, stream, label) for nome, configurado, sync, stream, label in ordem if configurado],
+                                              fase, self.latencias)
+        return ordenados, errors + abertos
 
-        return f"⚠️ FALHA TOTAL: Nenhum modelo respondeu.\nErros: {errors}", "Offline 🔴"
\ No newline at end of file
+    def processar(self, inputs):
+        prioridade = inputs.get('prioridade', 'gemini')
+        politica = inputs.get('politica', 'sequencial')
+        ordem_nomes = ['groq', 'gemini'] if prioridade == 'groq' else ['gemini', 'groq']
+
+        # 0. Cache: item repetido não paga RAG, Wikipédia nem LLM
+        with telemetria.span("cache") as span:
+            em_cache = self._consultar_cache(inputs, ordem_nomes)
+            span["acerto"] = bool(em_cache)
+        if em_cache:
+            return em_cache
+
+        # 5. Define a ordem de execução (prioridade + saúde dos provedores)
+        ordem_tentativa, errors = self._ordem_tentativa(prioridade, inputs.get('fase'))
+        with telemetria.span("prompt", fase=str(inputs.get('fase'))):
+            prompt_final = self._preparar_prompt(inputs, [nome for nome, _, _, _ in ordem_tentativa])
+        candidatos = [(nome, self._agendado(nome, chamar, inputs.get('fase'), inputs.get('lote', False)), label)
+                      for nome, chamar, _, label in ordem_tentativa]
+        nome_por_label = {label: nome for nome, _, label in candidatos}
+
+        # 6. Despacho (sequencial, hedged ou corrida)
+        resposta, label_visual, erros_despacho = despachar(
+            candidatos, prompt_final, politica, inputs.get('fase'), self.latencias, self.despachos, self.saude
+        )
+        if resposta:
+            self._gravar_cache(inputs, nome_por_label[label_visual], resposta, label_visual)
+            return resposta, label_visual
+        errors.extend(erros_despacho)
+
+        return f"⚠️ FALHA TOTAL: Nenhum modelo respondeu.\nErros: {errors}", "Offline 🔴"
+
+    def processar_fase1(self, inputs):
+        """
+        Fase 1 em uma chamada: corrige o item e julga, com saída estruturada (JSON).
+        Substitui _corrigir_transcricao + processar. Retorna (veredito, item_corrigido, label).
+        """
+        prioridade = inputs.get('prioridade', 'gemini')
+        politica = inputs.get('politica', 'sequencial')
+        ordem_nomes = ['groq', 'gemini'] if prioridade == 'groq' else ['gemini', 'groq']
+
+        usar_cache = self.cache.ativo('1') and not inputs.get('sem_cache')
+        if usar_cache:
+            valor = self.cache.buscar(self._chaves_cache({**inputs, 'fase': FASE1_CHAVE}, ordem_nomes))
+            if valor:
+                print("🗃️ Veredito servido do cache")
+                return valor["resposta"], valor.get("item", ""), f"{valor['label']} (cache)"
+
+        contexto = inputs.get('contexto')
+        if contexto is None:
+            contexto = self.coletar_contexto(inputs.get('user_input'))
+        ordem_tentativa, errors = self._ordem_tentativa(prioridade, FASE1_CHAVE)
+        prompt_final = self._montar_prompt_orcado(
+            inputs.get('user_input'), contexto, FASE1_CHAVE,
+            self._orcamento([nome for nome, _, _, _ in ordem_tentativa]), montar=self._montar_prompt_fase1_rapida,
+        )
+        chamadas_json = {'groq': self._chamar_groq_json, 'gemini': self._chamar_gemini_json}
+        candidatos = [(nome, self._agendado(nome, chamadas_json[nome], FASE1_CHAVE, inputs.get('lote', False)), label)
+                      for nome, _, _, label in ordem_tentativa]
+        nome_por_label = {label: nome for nome, _, label in candidatos}
+
+        resposta, label_visual, erros_despacho = despachar(
+            candidatos, prompt_final, politica, FASE1_CHAVE, self.latencias, self.despachos, self.saude
+        )
+        if resposta:
+            veredito, item = self._ler_veredito(resposta)
+            if usar_cache:
+                chave = self._chaves_cache({**inputs, 'fase': FASE1_CHAVE}, [nome_por_label[label_visual]])[0]
+                self.cache.set(chave, {"resposta": veredito, "item": item, "label": label_visual, "criado": time.time()})
+            return veredito, item, label_visual
+        errors.extend(erros_despacho)
+
+        return f"⚠️ FALHA TOTAL: Nenhum modelo respondeu.\nErros: {errors}", "", "Offline 🔴"
+
+    def processar_fase1_lote(self, itens, inputs):
+        """
+        Fase 1 de vários itens (mesmo Texto de Apoio e contexto já unido) em uma só chamada JSON.
+        Retorna [(veredito, label)] na ordem dos itens; os que o modelo pular são julgados sozinhos.
+        """
+        prioridade = inputs.get('prioridade', 'gemini')
+        politica = inputs.get('politica', 'sequencial')
+        ordem_nomes = ['groq', 'gemini'] if prioridade == 'groq' else ['gemini', 'groq']
+        texto_apoio = inputs.get('texto_apoio')
+        contexto = inputs.get('contexto') or ""
+
+        # Cache por item: a mesma prova rodada de novo não gasta cota
+        usar_cache = self.cache.ativo('1') and not inputs.get('sem_cache')
+        entradas = [{'user_input': montar_entrada(texto_apoio, item), 'fase': FASE1_LOTE} for item in itens]
+        resultados = [None] * len(itens)
+        if usar_cache:
+            for i, entrada in enumerate(entradas):
+                valor = self.cache.buscar(self._chaves_cache(entrada, ordem_nomes))
+                if valor:
+                    resultados[i] = (valor["resposta"], f"{valor['label']} (cache)")
+
+        pendentes = [i for i, resultado in enumerate(resultados) if resultado is None]
+        if pendentes:
+            ordem_tentativa, _ = self._ordem_tentativa(prioridade, FASE1_LOTE)
+            numerados = "\n".join(f"{k}. {itens[i]}" for k, i in enumerate(pendentes, 1))
+            prompt_final = self._montar_prompt_orcado(
+                montar_entrada(texto_apoio, numerados), contexto, FASE1_LOTE,
+                self._orcamento([nome for nome, _, _, _ in ordem_tentativa]), montar=self._montar_prompt_fase1_lote,
+            )
+            chamadas_json = {'groq': self._chamar_groq_json, 'gemini': self._chamar_gemini_json}
+            candidatos = [(nome, self._agendado(nome, chamadas_json[nome], FASE1_LOTE, True), label) for nome, _, _, label in ordem_tentativa]
+            nome_por_label = {label: nome for nome, _, label in candidatos}
+            resposta, label_visual, _ = despachar(
+                candidatos, prompt_final, politica, FASE1_LOTE, self.latencias, self.despachos, self.saude
+            )
+            if resposta:
+                for k, veredito in enumerate(self._ler_vereditos_lote(resposta, len(pendentes))):
+                    if veredito is None:
+                        continue
+                    i = pendentes[k]
+                    resultados[i] = (veredito, label_visual)
+                    if usar_cache:
+                        chave = self._chaves_cache(entradas[i], [nome_por_label[label_visual]])[0]
+                        self.cache.set(chave, {"resposta": veredito, "label": label_visual, "criado": time.time()})
+
+        # Pulados (ou lote que falhou inteiro): um a um, pelo caminho normal da Fase 1, ainda com prioridade de lote
+        for i, resultado in enumerate(resultados):
+            if resultado is None:
+                veredito, _, label_visual = self.processar_fase1({**inputs, 'user_input': entradas[i]['user_input'],
+                                                                  'contexto': contexto, 'lote': True})
+                resultados[i] = (veredito, label_visual)
+        return resultados
+
+    async def astream(self, inputs):
+        """
+        Versão assíncrona e em streaming do processar.
+        Gera tuplas (trecho, label_visual) conforme os tokens chegam.
+        Se um provedor falhar antes do primeiro token, tenta o próximo;
+        depois do primeiro token não há como voltar atrás, então o texto parcial fica.
+        """
+        prioridade = inputs.get('prioridade', 'gemini')
+        politica = inputs.get('politica', 'sequencial')
+        ordem_nomes = ['groq', 'gemini'] if prioridade == 'groq' else ['gemini', 'groq']
+
+        with telemetria.span("cache") as span:
+            em_cache = await rodar_em_thread("contexto", self._consultar_cache, inputs, ordem_nomes)
+            span["acerto"] = bool(em_cache)
+        if em_cache:
+            yield em_cache
+            return
+
+        if inputs.get('contexto') is None:
+            inputs = {**inputs, 'contexto': await self.coletar_contexto_async(inputs.get('user_input'))}
+        ordem_tentativa, errors = self._ordem_tentativa(prioridade, inputs.get('fase'))
+        # Orçamento/contagem de tokens e o SQLite do cache saem do event loop, como as outras etapas
+        with telemetria.span("prompt", fase=str(inputs.get('fase'))):
+            prompt_final = await rodar_em_thread("contexto", self._preparar_prompt, inputs,
+                                                 [nome for nome, _, _, _ in ordem_tentativa])
+        candidatos = [(nome, self._agendado_stream(nome, stream, inputs.get('fase')), label) for nome, _, stream, label in ordem_tentativa]
+        if not candidatos:
+            yield f"⚠️ FALHA TOTAL: Nenhum modelo respondeu.\nErros: {errors}", "Offline 🔴"
+            return
+        status, partes = {}, []
+        async for trecho, label_visual in despachar_stream(
+            candidatos, prompt_final, politica, inputs.get('fase'), self.latencias, self.despachos, self.saude, status
+        ):
+            partes.append(trecho)
+            yield trecho, label_visual
+        # Só resposta inteira vai para o cache (stream interrompido no meio não)
+        if status.get("completo"):
+            await rodar_em_thread("contexto", self._gravar_cache, inputs, status["vencedor"], "".join(partes).strip(), label_visual)
+
+    async def processar_async(self, inputs):
+        """Mesmo contrato do processar (resposta, label), sem bloquear o event loop."""
+        partes = []
+        label_visual = "Offline 🔴"
+        async for trecho, label_visual in self.astream(inputs):
+            partes.append(trecho)
+        return "".join(partes).strip(), label_visual
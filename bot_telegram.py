@@ -0,0 +1,455 @@
+import os
+import io
+import time
+import socket
+import asyncio
+import threading
+from datetime import datetime
+
+# Telegram
+from telegram import Update
+from telegram.ext import ApplicationBuilder, ContextTypes, CommandHandler, MessageHandler, filters
+
+from bot import ResolveIaBlindado, FASE1_RAPIDA
+from pipeline import rodar_em_thread
+from sessoes import GerenciadorSessoes
+from stt import AgregadorLote, TAXA_AMOSTRAGEM
+from audio import converter_audio_nativo
+from tts import SintetizadorTTS, separar_frases_prontas
+from normalizador import normalizar_transcricao
+from orcamento import contar_tokens, montar_entrada
+from metricas import telemetria
+from canal import CanalEstado, CONFIG_PADRAO
+
+# --- BOT DO TELEGRAM (RODA NO PROCESSO DO WORKER, NÃO NO STREAMLIT) ---
+TOKEN = os.getenv("TELEGRAM_TOKEN")
+# Quantos updates do Telegram podem ser processados ao mesmo tempo
+MAX_UPDATES_SIMULTANEOS = int(os.getenv("BOT_CONCURRENT_UPDATES", "32"))
+# De quanto em quanto tempo o worker publica métricas, lê comandos do admin e renova a config
+INTERVALO_CANAL = float(os.getenv("CANAL_INTERVALO", "2"))
+# Bot API alternativa (servidor local próprio ou o Telegram falso dos benchmarks)
+TELEGRAM_BASE_URL = os.getenv("TELEGRAM_BASE_URL")              # ex.: http://127.0.0.1:8081/bot
+TELEGRAM_BASE_FILE_URL = os.getenv("TELEGRAM_BASE_FILE_URL")    # ex.: http://127.0.0.1:8081/file/bot
+# "polling" (getUpdates) ou "webhook" (servidor aiohttp; ver webhook.py)
+BOT_MODO = os.getenv("BOT_MODO", "polling")
+# Depois da subida, em segundo plano: "1" cria clientes LLM e STT e abre as conexões,
+# "local" não toca a rede, "0" deixa tudo para a primeira mensagem
+AQUECIMENTO = os.getenv("AQUECIMENTO", "1").lower()
+# Com a memória de textos ativa, a sessão guarda só o começo do Texto de Apoio (o resto fica em apoio.py)
+PREVIA_APOIO = 200
+# Quantos registros do anel da telemetria vão no retrato para o painel (o anel inteiro fica no worker)
+SPANS_NO_RETRATO = int(os.getenv("METRICAS_SPANS_PAINEL", "30"))
+
+
+class EstadoWorker:
+    """
+    O que o ServerState fazia, mas do lado do worker: padrões do admin vêm do canal
+    (relidos a cada INTERVALO_CANAL), logs vão para o canal e as sessões ficam no SQLite compartilhado.
+    """
+    def __init__(self, canal, origem):
+        self.canal = canal
+        self.origem = origem
+        self.sessoes = GerenciadorSessoes()
+        self._padroes = dict(CONFIG_PADRAO)
+        self._lidos_em = 0.0
+        self._cursor_comandos = canal.ultimo_comando()   # Comandos antigos não são reaplicados
+        self.webhook = None   # ServidorWebhook, quando o worker roda em modo webhook
+
+    def add_log(self, tipo, msg, status="Info"):
+        print(f"{datetime.now().strftime('%H:%M:%S')} [{tipo}] {msg}")
+        try:
+            self.canal.registrar_evento(self.origem, tipo, msg, status)
+        except Exception as e:
+            print(f"⚠️ Canal indisponível: {e}")
+
+    def padroes(self):
+        if time.monotonic() - self._lidos_em > INTERVALO_CANAL:
+            try:
+                self._padroes = self.canal.ler_config()
+            except Exception as e:
+                print(f"⚠️ Config do canal ilegível (mantendo a anterior): {e}")
+            self._lidos_em = time.monotonic()
+        return self._padroes
+
+    def set_texto_apoio(self, chat_id, texto, chave=None):
+        """chave = texto já guardado na memória de textos; sem ela, a sessão fica com o texto inteiro."""
+        self.sessoes.atualizar(chat_id, texto_apoio=texto[:PREVIA_APOIO] if chave else texto, apoio=chave)
+        self.add_log("Memória", f"Novo Texto de Apoio Memorizado (chat {chat_id})" if texto else f"Memória limpa (chat {chat_id})", "💾")
+
+    def config_sessao(self, sessao):
+        """Fase/prioridade/política efetivas: o que o aluno escolheu ou, senão, o padrão do admin."""
+        padroes = self.padroes()
+        return {
+            'fase': sessao.fase or padroes['fase_atual'],
+            'prioridade': sessao.prioridade or padroes['modelo_prioridade'],
+            'politica': sessao.politica or padroes['politica_despacho'],
+        }
+
+    def aplicar_comandos(self):
+        for id_, acao, dados in self.canal.comandos_desde(self._cursor_comandos):
+            self._cursor_comandos = id_
+            chat_id = dados.get("chat_id")
+            if acao == "limpar_memoria":
+                self.sessoes.atualizar(chat_id, texto_apoio=None, apoio=None)
+            elif acao == "encerrar_sessao":
+                self.sessoes.remover(chat_id)
+            else:
+                print(f"⚠️ Comando desconhecido no canal: {acao}")
+
+    def retrato(self):
+        """Tudo que o painel mostra, em JSON (o painel não tem acesso aos objetos deste processo)."""
+        return {
+            "pid": os.getpid(),
+            "sessoes": len(self.sessoes),
+            "saude": ai_system.saude.resumo(),
+            "cache": ai_system.cache.resumo(),
+            "contexto": ai_system.coletor.resumo(),
+            "stt": stt.resumo(),
+            "tts": tts.resumo(),
+            "agendador": ai_system.agendador.resumo(),
+            "despachos": ai_system.despachos.resumo(),
+            "percentis": [{"etapa": etapa, "provedor": provedor, **info}
+                          for (etapa, provedor), info in telemetria.percentis().items()],
+            "spans": telemetria.recentes(SPANS_NO_RETRATO),
+            "webhook": self.webhook.resumo() if self.webhook else None,
+            "apoio": ai_system.apoio.resumo() if ai_system.apoio else None,
+        }
+
+    def sincronizar(self):
+        """Laço da thread do canal: comandos do admin + retrato/batimento."""
+        while True:
+            try:
+                self.aplicar_comandos()
+                self.canal.publicar(self.origem, self.retrato())
+            except Exception as e:
+                print(f"⚠️ Falha ao sincronizar com o canal: {e}")
+            time.sleep(INTERVALO_CANAL)
+
+
+# Preenchidos por preparar() no processo do worker
+state = None
+ai_system = None
+stt = None
+tts = None
+
+
+def preparar(origem=None, canal=None):
+    """Carrega IA, STT e TTS e liga o worker ao canal. Chamado uma vez por processo."""
+    global state, ai_system, stt, tts
+    origem = origem or os.getenv("WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+    print(f"🚀 Inicializando Cérebro Resolve.ia (worker {origem})...")
+    ai_system = ResolveIaBlindado()
+    # STT carregado uma vez, no aquecimento ou na primeira nota (modelo local fica quente depois)
+    stt = AgregadorLote()
+    # TTS com cache por frase; vereditos da Fase 1 já sintetizados na subida
+    tts = SintetizadorTTS()
+    tts.precomputar()
+    state = EstadoWorker(canal or CanalEstado(), origem)
+    threading.Thread(target=state.sincronizar, daemon=True, name="canal").start()
+    state.add_log("Worker", f"Worker {origem} no ar", "Info")
+    return state
+
+
+def aquecer(rede=True):
+    """
+    Backend de STT, clientes LLM e conexões prontos antes da primeira mensagem (ou quase).
+    Disparado depois do initialize da app: os imports disputam o GIL com a subida do bot.
+    """
+    inicio = time.perf_counter()
+    tempos = {}
+    try:
+        stt.carregar()
+        tempos["stt"] = round(time.perf_counter() - inicio, 3)
+    except Exception as e:
+        print(f"⚠️ Aquecimento do STT falhou: {e}")
+    tempos.update(ai_system.aquecer(rede, state.padroes().get("modelo_prioridade", "groq")))
+    detalhes = ", ".join(f"{nome} {segundos:.2f}s" for nome, segundos in tempos.items())
+    state.add_log("Worker", f"Aquecido em {time.perf_counter() - inicio:.1f}s ({detalhes})", "Info")
+
+
+# --- RESPOSTA PROGRESSIVA NO TELEGRAM ---
+class MensagemProgressiva:
+    """Edita a mensagem do Telegram conforme os tokens chegam (com limite de edições)."""
+    LIMITE_CHARS = 4000        # Telegram corta em 4096
+    INTERVALO_EDICAO = 1.0     # segundos entre edições (evita flood control)
+
+    def __init__(self, update):
+        self.update = update
+        self.mensagem = None
+        self.texto = ""
+        self.ultimo_enviado = ""
+        self.ultima_edicao = 0.0
+
+    async def adicionar(self, trecho):
+        self.texto += trecho
+        if time.monotonic() - self.ultima_edicao >= self.INTERVALO_EDICAO:
+            await self._sincronizar()
+
+    async def finalizar(self):
+        await self._sincronizar()
+
+    async def _sincronizar(self):
+        # Estourou o limite: congela a mensagem atual e abre outra com o excedente
+        while len(self.texto) > self.LIMITE_CHARS:
+            corte = self.texto.rfind(" ", 0, self.LIMITE_CHARS)
+            if corte <= 0: corte = self.LIMITE_CHARS
+            await self._enviar(self.texto[:corte])
+            self.mensagem, self.ultimo_enviado = None, ""
+            self.texto = self.texto[corte:].lstrip()
+        if self.texto.strip():
+            await self._enviar(self.texto)
+        self.ultima_edicao = time.monotonic()
+
+    async def _enviar(self, texto):
+        if texto == self.ultimo_enviado:
+            return
+        if self.mensagem is None:
+            self.mensagem = await self.update.message.reply_text(texto)
+        else:
+            await self.mensagem.edit_text(texto)
+        self.ultimo_enviado = texto
+
+# --- TEXTO DE APOIO (RESUMO + FATIAS DO ITEM) ---
+async def memorizar_texto(chat_id, texto):
+    """Prepara o texto uma vez (ou reaproveita o de outra sessão) e guarda só a chave na sessão."""
+    chave = None
+    if ai_system.apoio:
+        try:
+            chave = await rodar_em_thread("contexto", ai_system.apoio.guardar, texto)
+        except Exception as e:
+            print(f"⚠️ Texto de Apoio não preparado (vai inteiro em cada item): {e}")
+    await rodar_em_thread("contexto", state.set_texto_apoio, chat_id, texto, chave)
+
+
+async def entrada_com_memoria(sessao, item):
+    """
+    Item com o Texto de Apoio da sessão: resumo + fatias ligadas ao item quando o texto
+    está na memória de textos, o texto inteiro quando não está. None se o texto venceu.
+    """
+    if ai_system.apoio and not sessao.apoio:
+        # Sessão de antes da memória de textos: o texto inteiro ainda está nela
+        await memorizar_texto(sessao.chat_id, sessao.texto_apoio)
+    if sessao.apoio:
+        if not ai_system.apoio:
+            # Só a chave e o começo do texto estão na sessão: sem a memória de textos, vale como vencido
+            return None
+        with telemetria.span("apoio") as span:
+            entrada = await rodar_em_thread("contexto", ai_system.apoio.entrada, sessao.apoio, item)
+            span["tokens"] = contar_tokens(entrada)
+        return entrada
+    return montar_entrada(sessao.texto_apoio, item)
+
+
+# --- LÓGICA DO BOT TELEGRAM ---
+async def handle_audio(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user.first_name
+    chat_id = update.effective_chat.id
+    # SQLite das sessões (e o que mais tocar disco) fora do event loop
+    sessao = await rodar_em_thread("contexto", state.sessoes.obter, chat_id, user)
+    state.add_log("Telegram", f"Áudio de {user}", "Recebido")
+    inicio = time.monotonic()
+    tarefa_contexto = None
+    
+    try:
+        msg_wait = await update.message.reply_text("⬇️ Ouvindo...")
+        # Tudo em memória: download -> ffmpeg (stdin/stdout) -> PCM -> STT, sem tocar o disco
+        with telemetria.span("download") as span:
+            f = await context.bot.get_file(update.message.voice.file_id)
+            ogg = bytes(await f.download_as_bytearray())
+            span["bytes"] = len(ogg)
+        
+        with telemetria.span("ffmpeg"):
+            pcm = await converter_audio_nativo(ogg)
+        if not pcm: raise Exception("Falha Conversão")
+
+        # 1. Transcrição (Google ou Whisper local) - notas simultâneas viram um lote só
+        with telemetria.span("stt", stt.nome) as span:
+            texto_bruto = await stt.transcrever(pcm, TAXA_AMOSTRAGEM)
+            span.update(audio_s=round(len(pcm) / 2 / TAXA_AMOSTRAGEM, 2), chars=len(texto_bruto or ""))
+        if not texto_bruto: raise Exception("Nenhuma fala reconhecida")
+        
+        config = state.config_sessao(sessao)
+        # Fase 1 rápida: regras fixas locais agora, correção fonética junto com o veredito (1 chamada)
+        rapida = FASE1_RAPIDA and config['fase'] == '1'
+
+        # 2. Agente Faxineiro, com a busca de contexto (RAG + Wiki) já correndo em paralelo
+        # sobre a transcrição bruta: a limpeza não segura mais o resto do pipeline
+        tarefa_contexto = asyncio.create_task(ai_system.coletar_contexto_async(texto_bruto))
+        with telemetria.span("limpeza", "local" if rapida else "groq"):
+            if rapida:
+                texto_limpo = normalizar_transcricao(texto_bruto)
+            else:
+                # CORREÇÃO CRUCIAL: Usamos 'ai_system' direto (Global), SEM 'state.'
+                texto_limpo = await rodar_em_thread("llm", ai_system._corrigir_transcricao, texto_bruto)
+                state.add_log("Correção", f"'{texto_bruto}' -> '{texto_limpo}'", "✨")
+        
+        await context.bot.edit_message_text(
+            chat_id=update.effective_chat.id, 
+            message_id=msg_wait.message_id, 
+            text=f"📝 {texto_limpo}"
+        )
+        
+        # 3. Contexto
+        inicio_frase = texto_limpo.lower()[:40]
+        gatilhos_texto = ["texto de apoio", "texto base", "novo texto", "leia o texto"]
+        gatilhos_item = ["item", "questão", "julgue", "número"]
+
+        eh_comando_texto = any(g in inicio_frase for g in gatilhos_texto)
+        tem_item_junto = any(g in texto_limpo.lower() for g in gatilhos_item)
+
+        prompt_final = ""
+
+        if eh_comando_texto:
+            await memorizar_texto(chat_id, texto_limpo)
+            if not tem_item_junto:
+                await update.message.reply_text("🧠 **Texto Base Memorizado!** Pode mandar os itens.")
+                return 
+            prompt_final = texto_limpo
+            aviso = "🧠 Texto salvo e processando item..."
+        else:
+            memoria = await entrada_com_memoria(sessao, texto_limpo) if sessao.texto_apoio else None
+            if memoria:
+                aviso = "💡 Usando Texto Base da memória..."
+                prompt_final = memoria
+            elif sessao.texto_apoio:
+                # A chave ficou na sessão, mas o texto venceu na memória de textos (APOIO_TTL_DIAS)
+                # ou a memória de textos não está disponível neste worker
+                await rodar_em_thread("contexto", state.set_texto_apoio, chat_id, None)
+                aviso = "⚠️ Texto Base expirou; mande de novo. Processando item isolado..."
+                prompt_final = texto_limpo
+            else:
+                aviso = "⚠️ Processando item isolado..."
+                prompt_final = texto_limpo
+
+        await update.message.reply_text(aviso)
+
+        # 4. Executa a IA
+        # Só o que sobrou da coleta depois da limpeza fica no caminho crítico
+        with telemetria.span("contexto_espera"):
+            contexto_coletado = await tarefa_contexto
+        inputs = {
+            'user_input': prompt_final,
+            **config,
+            'contexto': contexto_coletado
+        }
+        
+        tarefas_tts = []
+        inicio_resposta = time.perf_counter()
+        if rapida:
+            # Uma chamada: item corrigido + veredito (JSON); o áudio do veredito já está em cache
+            veredito, item_corrigido, modelo_utilizado = await rodar_em_thread("llm", ai_system.processar_fase1, inputs)
+            if item_corrigido:
+                state.add_log("Correção", f"'{texto_bruto}' -> '{item_corrigido}'", "✨")
+            await update.message.reply_text(veredito)
+            tarefas_tts.append(asyncio.create_task(tts.sintetizar(veredito)))
+        else:
+            # CORREÇÃO CRUCIAL: Usamos 'ai_system' direto (Global), SEM 'state.'
+            # Streaming: o texto aparece aos poucos e o TTS começa a cada frase pronta
+            saida = MensagemProgressiva(update)
+            pendente = ""
+            modelo_utilizado = "Offline 🔴"
+            async for trecho, modelo_utilizado in ai_system.astream(inputs):
+                await saida.adicionar(trecho)
+                frases, pendente = separar_frases_prontas(pendente + trecho)
+                for frase in frases:
+                    tarefas_tts.append(asyncio.create_task(tts.sintetizar(frase)))
+            await saida.finalizar()
+            if pendente.strip():
+                tarefas_tts.append(asyncio.create_task(tts.sintetizar(pendente)))
+        telemetria.registrar("resposta", time.perf_counter() - inicio_resposta, modelo_utilizado, fase=config['fase'])
+        if tarefas_tts:
+            # Tempo até o primeiro áudio: da chegada da nota até a 1ª frase sintetizada
+            tarefas_tts[0].add_done_callback(lambda _: tts.registrar("primeiro_trecho", time.monotonic() - inicio))
+
+        # 5. TTS (frames MP3 concatenados em ordem formam um único áudio, enviado como OGG/Opus)
+        if tarefas_tts:
+            with telemetria.span("tts") as span:
+                partes_audio = await asyncio.gather(*tarefas_tts)
+                voz = await tts.para_voz(b"".join(partes_audio))
+                span.update(trechos=len(partes_audio), bytes=len(voz))
+            with telemetria.span("envio"):
+                with io.BytesIO(voz) as buffer_voz:
+                    await update.message.reply_voice(voice=buffer_voz)
+            tts.registrar("voz_enviada", time.monotonic() - inicio)
+        
+        # Não regrava por cima: o admin pode ter encerrado a sessão (ou outro worker a alterado) no meio do pedido
+        await rodar_em_thread("contexto", state.sessoes.contar_item, sessao)
+        state.add_log("Ciclo", f"Resp. via {modelo_utilizado}", "Finalizado")
+        telemetria.registrar("total", time.monotonic() - inicio, fase=config['fase'])
+
+    except Exception as e:
+        error_msg = str(e)
+        telemetria.registrar("total", time.monotonic() - inicio, status="erro")
+        state.add_log("Erro", error_msg, "Erro")
+        await update.message.reply_text(f"⚠️ Erro interno: {error_msg}")
+    finally:
+        # Pedido que falhou (ou saiu cedo) não segura fontes nem threads da coleta de contexto
+        if tarefa_contexto and not tarefa_contexto.done():
+            tarefa_contexto.cancel()
+
+async def start(u, c): await u.message.reply_text("🤖 Resolve.ia Online!")
+
+# --- PREFERÊNCIAS DO ALUNO (POR CHAT) ---
+async def cmd_fase(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    fase = context.args[0] if context.args else None
+    if fase not in ('1', '2'):
+        await update.message.reply_text("Uso: /fase 1 ou /fase 2")
+        return
+    state.sessoes.atualizar(update.effective_chat.id, fase=fase)
+    state.add_log("Config", f"Chat {update.effective_chat.id}: fase {fase}", "⚙️")
+    await update.message.reply_text(f"⚙️ Fase {fase} ativada para este chat.")
+
+async def cmd_prioridade(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    prioridade = context.args[0].lower() if context.args else None
+    if prioridade not in ('groq', 'gemini'):
+        await update.message.reply_text("Uso: /prioridade groq ou /prioridade gemini")
+        return
+    state.sessoes.atualizar(update.effective_chat.id, prioridade=prioridade)
+    state.add_log("Config", f"Chat {update.effective_chat.id}: prioridade {prioridade}", "⚙️")
+    await update.message.reply_text(f"⚙️ Prioridade {prioridade} para este chat.")
+
+async def cmd_limpar(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    state.set_texto_apoio(update.effective_chat.id, None)
+    await update.message.reply_text("🧹 Texto Base esquecido.")
+
+# --- APLICAÇÃO DO TELEGRAM ---
+async def _aquecer_em_segundo_plano(app):
+    threading.Thread(target=aquecer, args=(AQUECIMENTO != "local",), daemon=True, name="aquecimento").start()
+
+
+def construir_app(token=None, concorrencia=None):
+    # concurrent_updates: cada áudio vira sua própria task, sem fila única
+    construtor = ApplicationBuilder().token(token or TOKEN).concurrent_updates(concorrencia or MAX_UPDATES_SIMULTANEOS)
+    if TELEGRAM_BASE_URL:
+        construtor = construtor.base_url(TELEGRAM_BASE_URL)
+    if TELEGRAM_BASE_FILE_URL:
+        construtor = construtor.base_file_url(TELEGRAM_BASE_FILE_URL)
+    if AQUECIMENTO != "0":
+        construtor = construtor.post_init(_aquecer_em_segundo_plano)
+    app = construtor.build()
+    app.add_handler(CommandHandler("start", start))
+    app.add_handler(CommandHandler("fase", cmd_fase))
+    app.add_handler(CommandHandler("prioridade", cmd_prioridade))
+    app.add_handler(CommandHandler("limpar", cmd_limpar))
+    app.add_handler(MessageHandler(filters.VOICE, handle_audio))
+    return app
+
+
+def run_bot(modo=None):
+    """Roda no thread principal do worker, até SIGINT/SIGTERM."""
+    if not TOKEN:
+        print("❌ TELEGRAM_TOKEN ausente: worker sem bot")
+        return
+    modo = modo or BOT_MODO
+    if modo == "webhook":
+        from webhook import rodar_webhook   # aiohttp só no modo webhook
+        # Os consumidores do webhook já limitam a concorrência: a app processa cada update direto
+        app = construir_app()
+        def ao_iniciar(servidor):
+            state.webhook = servidor
+            # rodar_webhook faz o initialize na mão: o post_init (aquecimento) não é chamado
+            if AQUECIMENTO != "0":
+                threading.Thread(target=aquecer, args=(AQUECIMENTO != "local",), daemon=True, name="aquecimento").start()
+        asyncio.run(rodar_webhook(app, MAX_UPDATES_SIMULTANEOS, ao_iniciar=ao_iniciar))
+    else:
+        construir_app().run_polling()
@@ -0,0 +1,214 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+# --- CACHE EM MEMÓRIA (LRU + TTL) ---
+class CacheLRU:
+    """Dicionário limitado: expulsa o menos usado e descarta itens vencidos."""
+    def __init__(self, max_itens=1000, ttl=None):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chave, padrao=None):
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is None:
+                return padrao
+            valor, expira = item
+            if expira is not None and time.time() > expira:
+                del self._dados[chave]
+                return padrao
+            self._dados.move_to_end(chave)
+            return valor
+
+    def set(self, chave, valor, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._dados[chave] = (valor, time.time() + ttl if ttl else None)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_itens:
+                self._dados.popitem(last=False)
+
+    def __contains__(self, chave):
+        return self.get(chave, _AUSENTE) is not _AUSENTE
+
+    def __len__(self):
+        return len(self._dados)
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+
+
+_AUSENTE = object()
+
+
+# --- CACHE EM DISCO (SQLITE COM TTL E LIMITE DE TAMANHO) ---
+class CacheDisco:
+    def __init__(self, caminho, ttl=None, max_bytes=50 * 1024 * 1024):
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                chave TEXT PRIMARY KEY,
+                valor TEXT NOT NULL,
+                tamanho INTEGER NOT NULL,
+                criado REAL NOT NULL,
+                acessado REAL NOT NULL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_acessado ON cache(acessado)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(tamanho), 0) FROM cache").fetchone()[0]
+
+    def get(self, chave):
+        agora = time.time()
+        with self._lock:
+            linha = self._conn.execute("SELECT valor, criado FROM cache WHERE chave = ?", (chave,)).fetchone()
+            if linha is None:
+                return None
+            valor, criado = linha
+            if self.ttl and agora - criado > self.ttl:
+                self._remover(chave)
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE cache SET acessado = ? WHERE chave = ?", (agora, chave))
+            self._conn.commit()
+            return json.loads(valor)
+
+    def set(self, chave, valor):
+        texto = json.dumps(valor, ensure_ascii=False)
+        tamanho = len(texto.encode("utf-8"))
+        agora = time.time()
+        with self._lock:
+            self._remover(chave)
+            self._conn.execute(
+                "INSERT INTO cache (chave, valor, tamanho, criado, acessado) VALUES (?, ?, ?, ?, ?)",
+                (chave, texto, tamanho, agora, agora),
+            )
+            self._total_bytes += tamanho
+            self._expurgar(agora)
+            self._conn.commit()
+
+    def _remover(self, chave):
+        linha = self._conn.execute("SELECT tamanho FROM cache WHERE chave = ?", (chave,)).fetchone()
+        if linha:
+            self._conn.execute("DELETE FROM cache WHERE chave = ?", (chave,))
+            self._total_bytes -= linha[0]
+
+    def _expurgar(self, agora):
+        if self.ttl:
+            vencidos = self._conn.execute("SELECT COALESCE(SUM(tamanho), 0) FROM cache WHERE criado < ?", (agora - self.ttl,)).fetchone()[0]
+            if vencidos:
+                self._conn.execute("DELETE FROM cache WHERE criado < ?", (agora - self.ttl,))
+                self._total_bytes -= vencidos
+        # Passou do limite: remove os acessados há mais tempo até ficar em 90%
+        while self._total_bytes > self.max_bytes:
+            lote = self._conn.execute("SELECT chave, tamanho FROM cache ORDER BY acessado LIMIT 50").fetchall()
+            if not lote:
+                break
+            for chave, tamanho in lote:
+                self._conn.execute("DELETE FROM cache WHERE chave = ?", (chave,))
+                self._total_bytes -= tamanho
+                if self._total_bytes <= self.max_bytes * 0.9:
+                    break
+
+    def resumo(self):
+        with self._lock:
+            itens = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        return {"itens": itens, "bytes": self._total_bytes}
+
+
+# --- CACHE DE RESPOSTAS DO PROCESSAR ---
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+
+
+def normalizar_texto(texto):
+    """Ignora caixa, acentuação composta, espaços e pontuação final ao comparar itens."""
+    texto = unicodedata.normalize("NFC", texto or "").lower()
+    texto = re.sub(r"\s+", " ", texto).strip()
+    return texto.rstrip(" .!?;:")
+
+
+def hash_texto(texto):
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+class CacheRespostas:
+    """
+    Duas camadas: LRU em memória na frente de um SQLite em disco.
+    Chave = item normalizado + fase + modelo + hash do template do prompt.
+    """
+    def __init__(self, caminho=None, max_memoria=None, ttl=None, max_bytes=None):
+        ttl = ttl if ttl is not None else float(os.getenv("CACHE_TTL_HORAS", "168")) * 3600
+        self.memoria = CacheLRU(max_itens=max_memoria or int(os.getenv("CACHE_MEMORIA_ITENS", "512")), ttl=ttl)
+        try:
+            self.disco = CacheDisco(
+                caminho or os.path.join(CACHE_DIR, "respostas.sqlite3"),
+                ttl=ttl,
+                max_bytes=max_bytes or int(float(os.getenv("CACHE_DISCO_MAX_MB", "50")) * 1024 * 1024),
+            )
+        except Exception as e:
+            print(f"⚠️ Cache em disco indisponível, usando só memória: {e}")
+            self.disco = None
+        self.fases = set(os.getenv("CACHE_FASES", "1,2").split(","))
+        self.hits_memoria = 0
+        self.hits_disco = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def ativo(self, fase):
+        return str(fase) in self.fases
+
+    @staticmethod
+    def chave(user_input, fase, modelo, hash_template):
+        return hash_texto("\x1f".join([normalizar_texto(user_input), str(fase), modelo or "", hash_template]))
+
+    def buscar(self, chaves):
+        """Tenta as chaves em ordem (uma por modelo candidato); conta um único hit ou miss."""
+        for chave in chaves:
+            valor = self.memoria.get(chave)
+            if valor is not None:
+                with self._lock: self.hits_memoria += 1
+                return valor
+            valor = self.disco.get(chave) if self.disco else None
+            if valor is not None:
+                self.memoria.set(chave, valor)  # Promove para a camada quente
+                with self._lock: self.hits_disco += 1
+                return valor
+        with self._lock: self.misses += 1
+        return None
+
+    def set(self, chave, valor):
+        self.memoria.set(chave, valor)
+        if self.disco:
+            try:
+                self.disco.set(chave, valor)
+            except Exception as e:
+                print(f"⚠️ Falha ao gravar cache em disco: {e}")
+
+    def resumo(self):
+        with self._lock:
+            hits = self.hits_memoria + self.hits_disco
+            total = hits + self.misses
+            info = {
+                "hits_memoria": self.hits_memoria,
+                "hits_disco": self.hits_disco,
+                "misses": self.misses,
+                "taxa_acerto": round(hits / total, 3) if total else 0.0,
+                "itens_memoria": len(self.memoria),
+            }
+        if self.disco:
+            info.update({f"disco_{k}": v for k, v in self.disco.resumo().items()})
+        return info
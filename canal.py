@@ -0,0 +1,118 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+# --- CANAL LOCAL ENTRE WORKERS DO BOT E O PAINEL (SQLITE WAL) ---
+# O bot roda em processo(s) próprio(s) (worker.py) e o Streamlit só lê/escreve aqui:
+#   config   -> padrões do admin (fase, prioridade, despacho), lidos pelos workers
+#   comandos -> ações pontuais do admin (limpar memória, encerrar sessão), aplicadas por todo worker
+#   eventos  -> logs dos workers, exibidos no painel
+#   workers  -> retrato das métricas de cada worker + batimento (quem está vivo)
+# WAL deixa leitores e o escritor trabalharem ao mesmo tempo, entre processos.
+CANAL_DB = os.getenv("CANAL_DB", os.path.join(os.getenv("CACHE_DIR", ".cache"), "canal.sqlite3"))
+MAX_EVENTOS = int(os.getenv("CANAL_MAX_EVENTOS", "500"))
+# Worker sem batimento há mais que isso é considerado fora do ar
+TOLERANCIA_BATIMENTO = float(os.getenv("CANAL_TOLERANCIA", "10"))
+
+CONFIG_PADRAO = {
+    "fase_atual": "1",
+    "modelo_prioridade": "groq",
+    "politica_despacho": os.getenv("POLITICA_DESPACHO", "sequencial"),
+}
+
+
+class CanalEstado:
+    def __init__(self, caminho=None):
+        caminho = caminho or CANAL_DB
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(caminho, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS config (chave TEXT PRIMARY KEY, valor TEXT, atualizado REAL);
+            CREATE TABLE IF NOT EXISTS comandos (id INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL, acao TEXT, dados TEXT);
+            CREATE TABLE IF NOT EXISTS eventos (id INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL, origem TEXT,
+                                                tipo TEXT, msg TEXT, status TEXT);
+            CREATE TABLE IF NOT EXISTS workers (origem TEXT PRIMARY KEY, dados TEXT, alterado REAL, batimento REAL);
+        """)
+        self._conn.commit()
+        self._ultima_poda = 0.0
+
+    def _executar(self, sql, parametros=()):
+        with self._lock:
+            cursor = self._conn.execute(sql, parametros)
+            self._conn.commit()
+            return cursor
+
+    def _consultar(self, sql, parametros=()):
+        with self._lock:
+            return self._conn.execute(sql, parametros).fetchall()
+
+    # --- CONFIG (ADMIN -> WORKERS) ---
+    def definir(self, chave, valor):
+        self._executar("INSERT OR REPLACE INTO config (chave, valor, atualizado) VALUES (?, ?, ?)",
+                       (chave, str(valor), time.time()))
+
+    def ler_config(self):
+        return {**CONFIG_PADRAO, **dict(self._consultar("SELECT chave, valor FROM config"))}
+
+    # --- COMANDOS (ADMIN -> TODOS OS WORKERS) ---
+    def enviar_comando(self, acao, **dados):
+        self._executar("INSERT INTO comandos (ts, acao, dados) VALUES (?, ?, ?)",
+                       (time.time(), acao, json.dumps(dados)))
+
+    def ultimo_comando(self):
+        return self._consultar("SELECT COALESCE(MAX(id), 0) FROM comandos")[0][0]
+
+    def comandos_desde(self, cursor):
+        return [(id_, acao, json.loads(dados))
+                for id_, acao, dados in self._consultar("SELECT id, acao, dados FROM comandos WHERE id > ? ORDER BY id", (cursor,))]
+
+    # --- EVENTOS (WORKERS -> PAINEL) ---
+    def registrar_evento(self, origem, tipo, msg, status="Info"):
+        self._executar("INSERT INTO eventos (ts, origem, tipo, msg, status) VALUES (?, ?, ?, ?, ?)",
+                       (time.time(), origem, tipo, msg, status))
+        if time.time() - self._ultima_poda > 30:
+            self._ultima_poda = time.time()
+            self._executar("DELETE FROM eventos WHERE id <= (SELECT MAX(id) FROM eventos) - ?", (MAX_EVENTOS,))
+            self._executar("DELETE FROM comandos WHERE ts < ?", (time.time() - 3600,))
+
+    def eventos(self, n=50):
+        linhas = self._consultar("SELECT ts, origem, tipo, msg, status FROM eventos ORDER BY id DESC LIMIT ?", (n,))
+        return [{"ts": ts, "origem": origem, "type": tipo, "msg": msg, "status": status}
+                for ts, origem, tipo, msg, status in linhas]
+
+    # --- RETRATO DOS WORKERS (MÉTRICAS + BATIMENTO) ---
+    def publicar(self, origem, dados):
+        """Grava o retrato; 'alterado' só muda quando o conteúdo muda (o painel não redesenha à toa)."""
+        texto = json.dumps(dados, ensure_ascii=False, sort_keys=True, default=str)
+        agora = time.time()
+        with self._lock:
+            linha = self._conn.execute("SELECT dados FROM workers WHERE origem = ?", (origem,)).fetchone()
+            if linha and linha[0] == texto:
+                self._conn.execute("UPDATE workers SET batimento = ? WHERE origem = ?", (agora, origem))
+            else:
+                self._conn.execute("INSERT OR REPLACE INTO workers (origem, dados, alterado, batimento) VALUES (?, ?, ?, ?)",
+                                   (origem, texto, agora, agora))
+            self._conn.commit()
+
+    def encerrar(self, origem):
+        self._executar("DELETE FROM workers WHERE origem = ?", (origem,))
+
+    def workers(self, tolerancia=TOLERANCIA_BATIMENTO):
+        """{origem: retrato} dos workers com batimento recente."""
+        limite = time.time() - tolerancia
+        return {origem: json.loads(dados)
+                for origem, dados in self._consultar("SELECT origem, dados FROM workers WHERE batimento >= ?", (limite,))}
+
+    def versao(self, tolerancia=TOLERANCIA_BATIMENTO):
+        """Muda quando há evento, config ou retrato novo, ou quando um worker cai/sobe."""
+        return self._consultar("""
+            SELECT (SELECT COALESCE(MAX(id), 0) FROM eventos),
+                   (SELECT COALESCE(MAX(atualizado), 0) FROM config),
+                   (SELECT COALESCE(MAX(alterado), 0) FROM workers),
+                   (SELECT COUNT(*) FROM workers WHERE batimento >= ?)
+        """, (time.time() - tolerancia,))[0]
@@ -0,0 +1,133 @@
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from pipeline import rodar_em_thread
+from metricas import telemetria
+
+# Pool próprio: a coleta roda de dentro do processar, que já ocupa o pool do pipeline
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("CONTEXTO_MAX_THREADS", "8")), thread_name_prefix="contexto"
+)
+
+PRAZO_TOTAL_PADRAO = float(os.getenv("CONTEXTO_PRAZO", "2.5"))
+
+
+class FonteContexto:
+    """Uma fonte de contexto independente (RAG, Wikipédia...) com seu próprio orçamento de tempo."""
+    def __init__(self, nome, funcao, timeout, ativa=None):
+        self.nome = nome
+        self.funcao = funcao
+        self.timeout = timeout
+        self.ativa = ativa or (lambda query: True)
+
+
+class ResultadoColeta:
+    def __init__(self, textos, relatorio):
+        self.textos = textos          # {nome: texto} só das fontes que responderam no prazo
+        self.relatorio = relatorio
+
+    @property
+    def texto(self):
+        # O prompt recebe tudo junto e trata como "Contexto"
+        return "\n".join(t for t in self.textos.values() if t)
+
+
+def _cronometrar(funcao, query):
+    inicio = time.monotonic()
+    try:
+        return funcao(query), time.monotonic() - inicio, None
+    except Exception as e:
+        return "", time.monotonic() - inicio, e
+
+
+class ColetorContexto:
+    """
+    Dispara todas as fontes em paralelo e segue com o que voltou até o prazo.
+    Relata, por fonte, quanto tempo foi economizado em relação à execução em série.
+    """
+    def __init__(self, fontes, prazo_total=None):
+        self.fontes = fontes
+        self.prazo_total = prazo_total or PRAZO_TOTAL_PADRAO
+        self.ultimo_relatorio = None
+        self.acumulado = {f.nome: {"chamadas": 0, "timeouts": 0, "erros": 0, "economia": 0.0} for f in fontes}
+        self._lock = threading.Lock()
+
+    def _relatar(self, resultados, parede):
+        """
+        resultados = {nome: (texto, latencia, status)}.
+        Em série, cada fonte somaria sua latência ao total; em paralelo só a mais lenta
+        fica no caminho crítico. A economia de cada fonte é a latência que deixou de somar.
+        """
+        critica = max(resultados, key=lambda n: resultados[n][1]) if resultados else None
+        fontes = {}
+        for nome, (texto, latencia, status) in resultados.items():
+            telemetria.registrar("contexto", latencia, nome, status, chars=len(texto or ""))
+            fontes[nome] = {
+                "latencia": round(latencia, 3),
+                "status": status,
+                "chars": len(texto or ""),
+                "economia": 0.0 if nome == critica else round(min(latencia, parede), 3),
+            }
+        relatorio = {
+            "parede": round(parede, 3),
+            "serie": round(sum(r[1] for r in resultados.values()), 3),
+            "economia": round(sum(f["economia"] for f in fontes.values()), 3),
+            "fontes": fontes,
+        }
+        with self._lock:
+            self.ultimo_relatorio = relatorio
+            for nome, info in fontes.items():
+                acumulado = self.acumulado[nome]
+                acumulado["chamadas"] += 1
+                acumulado["economia"] += info["economia"]
+                if info["status"] == "timeout": acumulado["timeouts"] += 1
+                if info["status"] == "erro": acumulado["erros"] += 1
+        resumo_fontes = ", ".join(f"{n} {i['latencia']:.2f}s ({i['status']}, -{i['economia']:.2f}s)" for n, i in fontes.items())
+        print(f"🧩 Contexto em {parede:.2f}s (série seria {relatorio['serie']:.2f}s): {resumo_fontes}")
+        return relatorio
+
+    def _ativas(self, query):
+        return [f for f in self.fontes if f.ativa(query)]
+
+    def coletar(self, query):
+        """Versão síncrona (threads). Fontes estouradas continuam no pool, mas são ignoradas."""
+        inicio = time.monotonic()
+        futuros = {f.nome: (f, _executor.submit(_cronometrar, f.funcao, query)) for f in self._ativas(query)}
+        resultados = {}
+        for nome, (fonte, futuro) in futuros.items():
+            restante = min(fonte.timeout, self.prazo_total) - (time.monotonic() - inicio)
+            wait([futuro], timeout=max(0.0, restante))
+            if futuro.done():
+                texto, latencia, erro = futuro.result()
+                if erro: print(f"⚠️ Fonte {nome} falhou: {erro}")
+                resultados[nome] = (texto, latencia, "erro" if erro else "ok")
+            else:
+                resultados[nome] = ("", time.monotonic() - inicio, "timeout")
+        textos = {n: r[0] for n, r in resultados.items() if r[2] == "ok"}
+        return ResultadoColeta(textos, self._relatar(resultados, time.monotonic() - inicio))
+
+    async def coletar_async(self, query):
+        """Versão assíncrona: cada fonte roda no pool do pipeline com seu próprio wait_for."""
+        inicio = time.monotonic()
+
+        async def uma(fonte):
+            try:
+                texto, latencia, erro = await asyncio.wait_for(
+                    rodar_em_thread("contexto", _cronometrar, fonte.funcao, query),
+                    timeout=min(fonte.timeout, self.prazo_total),
+                )
+                if erro: print(f"⚠️ Fonte {fonte.nome} falhou: {erro}")
+                return fonte.nome, (texto, latencia, "erro" if erro else "ok")
+            except asyncio.TimeoutError:
+                return fonte.nome, ("", time.monotonic() - inicio, "timeout")
+
+        resultados = dict(await asyncio.gather(*(uma(f) for f in self._ativas(query))))
+        textos = {n: r[0] for n, r in resultados.items() if r[2] == "ok"}
+        return ResultadoColeta(textos, self._relatar(resultados, time.monotonic() - inicio))
+
+    def resumo(self):
+        with self._lock:
+            return {"ultimo": self.ultimo_relatorio, "acumulado": {n: dict(a) for n, a in self.acumulado.items()}}
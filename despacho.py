@@ -0,0 +1,312 @@
+import os
+import time
+import asyncio
+import threading
+from collections import deque, Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# --- POLÍTICAS DE DESPACHO ENTRE PROVEDORES ---
+# sequencial: tenta um de cada vez (comportamento original)
+# hedged:     dispara o secundário se o primário passar do p95 histórico
+# corrida:    dispara todos juntos e fica com a primeira resposta válida
+POLITICAS = ("sequencial", "hedged", "corrida")
+
+ATRASO_HEDGE_PADRAO = float(os.getenv("HEDGE_ATRASO_PADRAO", "4.0"))  # sem histórico suficiente
+AMOSTRAS_MINIMAS_P95 = 5
+
+# Pool próprio: o processar já roda dentro do pool do pipeline e não pode esperar por ele mesmo
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("DESPACHO_MAX_THREADS", "8")), thread_name_prefix="despacho"
+)
+
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+class HistoricoLatencia:
+    """Janela móvel das latências bem-sucedidas por provedor e fase."""
+    def __init__(self, tamanho=100):
+        self.tamanho = tamanho
+        self._janelas = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, nome, fase, segundos):
+        with self._lock:
+            self._janelas.setdefault((nome, fase), deque(maxlen=self.tamanho)).append(segundos)
+
+    def p95(self, nome, fase):
+        with self._lock:
+            amostras = list(self._janelas.get((nome, fase), ()))
+        if len(amostras) < AMOSTRAS_MINIMAS_P95:
+            return None
+        return percentil(amostras, 95)
+
+    def atraso_hedge(self, nome, fase):
+        p95 = self.p95(nome, fase)
+        return ATRASO_HEDGE_PADRAO if p95 is None else p95
+
+
+class RegistroDespacho:
+    """Guarda quem venceu cada despacho e por quanto (margem sobre o segundo colocado)."""
+    def __init__(self, tamanho=200):
+        self.registros = deque(maxlen=tamanho)
+        self.vitorias = Counter()
+        self._lock = threading.Lock()
+
+    def registrar(self, politica, vencedor, latencia, perdedor=None):
+        registro = {
+            "time": time.strftime("%H:%M:%S"),
+            "politica": politica,
+            "vencedor": vencedor,
+            "latencia": round(latencia, 3),
+            "perdedor": perdedor,
+            "margem": None,          # segundos que o vencedor economizou sobre o perdedor
+            "margem_minima": False,  # True quando o perdedor foi cancelado (margem é um piso)
+        }
+        with self._lock:
+            self.registros.append(registro)
+            self.vitorias[vencedor] += 1
+        return registro
+
+    def fechar_margem(self, registro, latencia_perdedor, minima=False):
+        with self._lock:
+            registro["margem"] = round(latencia_perdedor - registro["latencia"], 3)
+            registro["margem_minima"] = minima
+
+    def resumo(self):
+        with self._lock:
+            margens = [r["margem"] for r in self.registros if r["margem"] is not None]
+            return {
+                "total": len(self.registros),
+                "vitorias": dict(self.vitorias),
+                "margem_media": round(sum(margens) / len(margens), 3) if margens else None,
+                "ultimo": dict(self.registros[-1]) if self.registros else None,
+            }
+
+
+class ErroLocal(Exception):
+    """
+    Falha do lado de cá (fila do agendador esgotada, pedido cancelado): não diz nada sobre
+    a saúde do provedor, então não conta para o circuit breaker.
+    """
+
+
+class _SemSaude:
+    """Stand-in quando ninguém acompanha a saúde dos provedores."""
+    def permitir(self, nome): return True
+    def sucesso(self, nome, latencia=None): pass
+    def falha(self, nome, erro=None): pass
+    def liberar(self, nome): pass
+
+
+def _cronometrar(funcao, prompt, cancelado=None):
+    inicio = time.monotonic()
+    try:
+        resposta = funcao(prompt, cancelado=cancelado) if cancelado is not None else funcao(prompt)
+        return resposta.strip() if resposta else None, time.monotonic() - inicio, None
+    except Exception as e:
+        return None, time.monotonic() - inicio, e
+
+
+def _anotar(saude, nome, resposta, duracao, erro):
+    if resposta:
+        saude.sucesso(nome, duracao)
+    elif isinstance(erro, ErroLocal):
+        saude.liberar(nome)   # Nem chegou ao provedor: só devolve a reserva (sondagem do meio-aberto)
+    else:
+        saude.falha(nome, erro)
+
+
+def despachar(candidatos, prompt, politica, fase, historico, registro, saude=None):
+    """
+    Versão síncrona. candidatos = [(nome, funcao, label)] já na ordem de prioridade.
+    Retorna (resposta, label, erros); resposta None se ninguém respondeu.
+    Em hedged/corrida cada função recebe também cancelado (threading.Event), ligado quando
+    outro candidato vence: quem ainda está na fila do agendador sai sem gastar cota.
+    """
+    saude = saude or _SemSaude()
+    errors = []
+    if not candidatos:
+        return None, None, errors
+
+    if politica not in ("hedged", "corrida") or len(candidatos) == 1:
+        for nome, funcao, label in candidatos:
+            if not saude.permitir(nome):
+                errors.append(f"{nome}: circuito aberto.")
+                continue
+            print(f"🔄 Tentando via {nome}...")
+            resposta, duracao, erro = _cronometrar(funcao, prompt)
+            _anotar(saude, nome, resposta, duracao, erro)
+            if resposta:
+                historico.registrar(nome, fase, duracao)
+                registro.registrar("sequencial", nome, duracao)
+                return resposta, label, errors
+            errors.append(f"Falha em {nome}: {erro}" if erro else f"{nome} retornou vazio.")
+            if erro: print(f"❌ Falha em {nome}: {erro}")
+        return None, None, errors
+
+    inicio = time.monotonic()
+    futuros = {}
+    fila = list(candidatos)
+
+    def lancar():
+        # Pula quem teve o circuito aberto enquanto esperávamos
+        while fila:
+            nome, funcao, label = fila.pop(0)
+            if saude.permitir(nome):
+                print(f"🏁 Disparando {nome} ({politica})...")
+                cancelado = threading.Event()
+                futuro = _executor.submit(_cronometrar, funcao, prompt, cancelado)
+                futuros[futuro] = (nome, label, time.monotonic() - inicio, cancelado)
+                return
+            errors.append(f"{nome}: circuito aberto.")
+
+    lancar()
+    if politica == "corrida":
+        while fila: lancar()
+    proximo_hedge = inicio + historico.atraso_hedge(candidatos[0][0], fase)
+
+    while futuros:
+        timeout = max(0.0, proximo_hedge - time.monotonic()) if fila else None
+        prontos, _ = wait(futuros, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not prontos:
+            # Primário passou do p95: dispara o próximo sem cancelar o atual
+            lancar()
+            proximo_hedge = time.monotonic() + historico.atraso_hedge(candidatos[0][0], fase)
+            continue
+        for futuro in prontos:
+            nome, label, disparo, _ = futuros.pop(futuro)
+            resposta, duracao, erro = futuro.result()
+            _anotar(saude, nome, resposta, duracao, erro)
+            if resposta:
+                historico.registrar(nome, fase, duracao)
+                total = disparo + duracao
+                pendente = next(iter(futuros.values()), None)
+                reg = registro.registrar(politica, nome, total, perdedor=pendente[0] if pendente else None)
+                # Threads não são canceláveis: quem ainda espera cota desiste; quem já está no provedor
+                # termina e a margem real é gravada
+                for futuro_perdedor, (nome_p, _, disparo_p, cancelado_p) in futuros.items():
+                    cancelado_p.set()
+                    def _fechar(f, disparo_p=disparo_p, nome_p=nome_p):
+                        resp_p, dur_p, erro_p = f.result()
+                        _anotar(saude, nome_p, resp_p, dur_p, erro_p)
+                        if resp_p: historico.registrar(nome_p, fase, dur_p)
+                        if reg["perdedor"] == nome_p: registro.fechar_margem(reg, disparo_p + dur_p)
+                    futuro_perdedor.add_done_callback(_fechar)
+                return resposta, label, errors
+            errors.append(f"Falha em {nome}: {erro}" if erro else f"{nome} retornou vazio.")
+            if fila:
+                lancar()  # Hedged: falha rápida do primário libera o próximo na hora
+    return None, None, errors
+
+
+async def _primeiro_trecho(gerador):
+    async for trecho in gerador:
+        if trecho:
+            return trecho
+    return None
+
+
+async def _fechar_gerador(gerador):
+    try:
+        await gerador.aclose()
+    except Exception:
+        pass
+
+
+async def despachar_stream(candidatos, prompt, politica, fase, historico, registro, saude=None, status=None):
+    """
+    Versão assíncrona/streaming. candidatos = [(nome, funcao_stream, label)].
+    Gera (trecho, label). O vencedor é quem entrega o primeiro token; os demais são cancelados.
+    Se 'status' (dict) for passado, recebe 'vencedor' e 'completo' ao final.
+    """
+    saude = saude or _SemSaude()
+    status = status if status is not None else {}
+    status.update(vencedor=None, completo=False)
+    # No streaming o que importa para o hedge é o tempo até o primeiro token, não o total
+    fase = f"{fase}-stream"
+    errors = []
+    loop = asyncio.get_running_loop()
+    inicio = loop.time()
+    fila = list(candidatos)
+    tarefas = {}
+
+    def lancar():
+        while fila:
+            nome, funcao_stream, label = fila.pop(0)
+            if not saude.permitir(nome):
+                errors.append(f"{nome}: circuito aberto.")
+                continue
+            gerador = funcao_stream(prompt)
+            tarefa = asyncio.ensure_future(_primeiro_trecho(gerador))
+            tarefas[tarefa] = (nome, label, gerador, loop.time() - inicio)
+            return
+
+    async def cancelar_todas():
+        for tarefa, (nome, _, gerador, _) in list(tarefas.items()):
+            saude.liberar(nome)
+            tarefa.cancel()
+            try:
+                await tarefa
+            except (asyncio.CancelledError, Exception):
+                pass
+            await _fechar_gerador(gerador)
+        tarefas.clear()
+
+    paralelo = politica in ("hedged", "corrida")
+    if fila: lancar()
+    if politica == "corrida":
+        while fila: lancar()
+    proximo_hedge = inicio + historico.atraso_hedge(candidatos[0][0], fase) if candidatos else None
+
+    try:
+        while tarefas:
+            timeout = max(0.0, proximo_hedge - loop.time()) if (politica == "hedged" and fila) else None
+            prontas, _ = await asyncio.wait(tarefas, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not prontas:
+                lancar()
+                proximo_hedge = loop.time() + historico.atraso_hedge(candidatos[0][0], fase)
+                continue
+            for tarefa in prontas:
+                nome, label, gerador, disparo = tarefas.pop(tarefa)
+                erro = tarefa.exception()
+                primeiro = None if erro else tarefa.result()
+                if not primeiro:
+                    _anotar(saude, nome, None, 0.0, erro)
+                    errors.append(f"Falha em {nome}: {erro}" if erro else f"{nome} retornou vazio.")
+                    if erro: print(f"❌ Falha em {nome}: {erro}")
+                    await _fechar_gerador(gerador)
+                    if fila and (paralelo or not tarefas): lancar()
+                    continue
+
+                # Vencedor: cancela quem ainda estava correndo
+                ttfb = loop.time() - inicio
+                historico.registrar(nome, fase, ttfb - disparo)
+                perdedor = next(iter(tarefas.values()), None)
+                reg = registro.registrar(politica if paralelo else "sequencial", nome, ttfb,
+                                         perdedor=perdedor[0] if perdedor else None)
+                if perdedor:
+                    registro.fechar_margem(reg, loop.time() - inicio, minima=True)
+                await cancelar_todas()
+
+                status["vencedor"] = nome
+                yield primeiro, label
+                try:
+                    async for trecho in gerador:
+                        yield trecho, label
+                    saude.sucesso(nome, (loop.time() - inicio) - disparo)
+                    status["completo"] = True
+                except Exception as e:
+                    # Depois do primeiro token não há volta: o texto parcial fica
+                    saude.falha(nome, e)
+                    print(f"❌ Falha em {nome} no meio do stream: {e}")
+                return
+    finally:
+        await cancelar_todas()
+
+    yield f"⚠️ FALHA TOTAL: Nenhum modelo respondeu.\nErros: {errors}", "Offline 🔴"
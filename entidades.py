@@ -0,0 +1,387 @@
+"""
+Entendimento da consulta da WikiTool: extrai as entidades do item (siglas, nomes próprios,
+tratados, datas) e só manda para a Wikipédia os títulos em que confia.
+
+- IndiceTitulos: títulos e redirecionamentos da Wikipédia em português num arquivo ordenado,
+  mapeado em memória (mmap). Busca binária por chave e por prefixo, sem carregar o arquivo.
+- extrair_entidades: com índice, os n-gramas do item são conferidos nele (maior casamento
+  primeiro, parando quando nenhum título começa com o n-grama) e pontuados pela superfície
+  (sigla, caixa alta, número de palavras). Sem índice, valem só os padrões de superfície,
+  com confiança menor.
+
+Construção do índice (dump https://dumps.wikimedia.org/ptwiki/latest/):
+    python entidades.py --titulos ptwiki-latest-all-titles-in-ns0.gz [--redirects redirects.tsv]
+    python entidades.py --dump wiki.jsonl          # o mesmo JSONL do WIKI_DUMP
+    python entidades.py --testar "Item 3. O Tratado de Assunção criou o Mercosul em 1991."
+"""
+import os
+import re
+import gzip
+import json
+import mmap
+import struct
+import argparse
+import unicodedata
+from bisect import bisect_left
+
+from cache import CACHE_DIR
+from normalizador import SIGLAS
+
+WIKI_INDICE = os.getenv("WIKI_INDICE", os.path.join(CACHE_DIR, "wiki_titulos.idx"))
+MAX_PALAVRAS = 8               # títulos mais longos que isso não saem de um item de prova
+MAGICO = b"RIATIT01"
+# Registro: chave \t título \t destino do redirecionamento ("" = página própria) \n
+
+TOKEN = re.compile(r"\w+(?:[-'’]\w+)*")
+PARTICULAS = {"de", "da", "do", "das", "dos", "e", "a", "o", "as", "os", "em", "no", "na", "nos", "nas",
+              "para", "por", "pela", "pelo", "com", "ao", "aos", "um", "uma", "que", "se"}
+# Só estas ligam palavras de um mesmo nome (Barão do Rio Branco); "e", "no", "a"... separam nomes
+PONTES_NOME = {"de", "da", "do", "das", "dos"}
+_SIGLAS = {s.casefold(): s for s in SIGLAS}
+ROMANO = re.compile(r"^[IVXLC]+$")
+# "Item 12.", "julgue o item", "texto de apoio"... não fazem parte do assunto
+RUIDO = re.compile(r"\b(?:[íi]tem\s+\d+\s*[.:,-]?|julgue(?:\s+o\s+item)?|texto\s+(?:de\s+apoio|base)"
+                   r"|no\s+que\s+se\s+refere\s+a|acerca\s+d[aeo]s?)", re.IGNORECASE)
+EVENTO = re.compile(r"\b(?i:tratado|acordo|protocolo|conven[çc][ãa]o|confer[êe]ncia|declara[çc][ãa]o|carta|pacto"
+                    r"|consenso|doutrina|rodada|revolu[çc][ãa]o|guerra|crise|plano|c[úu]pula|ata)"
+                    r"(?:\s+(?i:d[aeo]s?|de\s+la)\s+\w+|\s+[A-ZÀ-Ú]\w+)(?:\s+(?:d[aeo]s?\s+)?[A-ZÀ-Ú]\w+)*")
+MESES = "janeiro|fevereiro|março|marco|abril|maio|junho|julho|agosto|setembro|outubro|novembro|dezembro"
+DATA = re.compile(rf"\b(?:\d{{1,2}}\s+de\s+(?:{MESES})\s+de\s+)?(?:1[5-9]\d\d|20\d\d)\b", re.IGNORECASE)
+
+
+def sem_acento(texto):
+    return "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c))
+
+
+def chave(texto):
+    """Forma comparável de títulos e trechos do item: sem acento, sem caixa, só palavras."""
+    return " ".join(TOKEN.findall(sem_acento(texto.replace("_", " ")).casefold()))
+
+
+def _titulo_provavel(superficie):
+    """Wikipédia diferencia caixa (menos a 1ª letra): 'tratado de assunção' -> 'Tratado de Assunção'."""
+    palavras = superficie.split()
+    return " ".join(p if p.casefold() in PARTICULAS and i else p[:1].upper() + p[1:] for i, p in enumerate(palavras))
+
+
+class Entidade:
+    def __init__(self, superficie, titulo, tipo, confianca, posicao):
+        self.superficie = superficie
+        self.titulo = titulo          # o que vai para a API (destino do redirecionamento, se houver)
+        self.tipo = tipo              # sigla | nome | evento | data | titulo
+        self.confianca = confianca
+        self.posicao = posicao
+
+    def __repr__(self):
+        return f"Entidade({self.titulo!r}, {self.tipo}, {self.confianca:.2f})"
+
+
+# --- ÍNDICE DE TÍTULOS ---
+def _preparar(registros):
+    """(título, destino) -> [(chave, título, destino)] ordenado pela chave, sem desambiguações."""
+    linhas = {}
+    for titulo, destino in registros:
+        titulo = " ".join(titulo.replace("_", " ").split())
+        # "Assunção (Paraguai)" nunca casa com o texto de um item: fica de fora
+        if not titulo or "(" in titulo:
+            continue
+        k = chave(titulo)
+        if k and k.count(" ") < MAX_PALAVRAS:
+            linhas[(k, titulo)] = destino or linhas.get((k, titulo), "")
+    return [(k, titulo, destino) for (k, titulo), destino in sorted(linhas.items())]
+
+
+def construir_indice(saida, registros):
+    """Grava o arquivo do IndiceTitulos: cabeçalho, n deslocamentos (uint64) e os registros."""
+    linhas = _preparar(registros)
+    base = len(MAGICO) + 8 + 8 * len(linhas)
+    corpo, deslocamentos = bytearray(), []
+    for k, titulo, destino in linhas:
+        deslocamentos.append(base + len(corpo))
+        corpo += f"{k}\t{titulo}\t{destino}\n".encode("utf-8")
+    os.makedirs(os.path.dirname(saida) or ".", exist_ok=True)
+    temporario = saida + ".tmp"
+    with open(temporario, "wb") as arquivo:
+        arquivo.write(MAGICO + struct.pack("<Q", len(linhas)))
+        arquivo.write(struct.pack(f"<{len(linhas)}Q", *deslocamentos))
+        arquivo.write(corpo)
+    os.replace(temporario, saida)
+    return len(linhas)
+
+
+class IndiceTitulos:
+    """Arquivo ordenado mapeado em memória: só as páginas tocadas pela busca binária são lidas."""
+    def __init__(self, caminho):
+        self.caminho = caminho
+        with open(caminho, "rb") as arquivo:
+            self._mapa = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mapa[:len(MAGICO)] != MAGICO:
+            raise ValueError(f"{caminho} não é um índice de títulos")
+        self._n = struct.unpack_from("<Q", self._mapa, len(MAGICO))[0]
+        self._base = len(MAGICO) + 8
+
+    def __len__(self):
+        return self._n
+
+    def _inicio(self, i):
+        return struct.unpack_from("<Q", self._mapa, self._base + 8 * i)[0]
+
+    def _chave_em(self, i):
+        inicio = self._inicio(i)
+        return self._mapa[inicio:self._mapa.find(b"\t", inicio)]
+
+    def _registro(self, i):
+        inicio = self._inicio(i)
+        _, titulo, destino = self._mapa[inicio:self._mapa.find(b"\n", inicio)].decode("utf-8").split("\t")
+        return titulo, destino
+
+    def _posicao(self, alvo):
+        baixo, alto = 0, len(self)
+        while baixo < alto:
+            meio = (baixo + alto) // 2
+            if self._chave_em(meio) < alvo:
+                baixo = meio + 1
+            else:
+                alto = meio
+        return baixo
+
+    def procurar(self, k):
+        """[(título, destino)] com essa chave (acentos e caixa diferentes dão a mesma chave)."""
+        alvo = k.encode("utf-8")
+        i, achados = self._posicao(alvo), []
+        while i < len(self) and self._chave_em(i) == alvo:
+            achados.append(self._registro(i))
+            i += 1
+        return achados
+
+    def tem_prefixo(self, prefixo):
+        alvo = prefixo.encode("utf-8")
+        i = self._posicao(alvo)
+        return i < len(self) and self._chave_em(i).startswith(alvo)
+
+
+class IndiceTitulosMemoria(IndiceTitulos):
+    """Mesma busca sobre listas em memória: títulos do WIKI_DUMP, benchmarks."""
+    def __init__(self, registros):
+        self.caminho = None
+        linhas = _preparar(registros)
+        self._chaves = [k.encode("utf-8") for k, _, _ in linhas]
+        self._dados = [(titulo, destino) for _, titulo, destino in linhas]
+
+    def __len__(self):
+        return len(self._chaves)
+
+    def _chave_em(self, i):
+        return self._chaves[i]
+
+    def _registro(self, i):
+        return self._dados[i]
+
+    def _posicao(self, alvo):
+        return bisect_left(self._chaves, alvo)
+
+
+def carregar_indice(caminho=None):
+    caminho = caminho or WIKI_INDICE
+    if not os.path.exists(caminho):
+        return None
+    try:
+        indice = IndiceTitulos(caminho)
+        print(f"📚 Índice de títulos da Wikipédia: {len(indice)} títulos ({caminho})")
+        return indice
+    except Exception as e:
+        print(f"⚠️ Erro ao abrir o índice de títulos {caminho}: {e}")
+        return None
+
+
+# --- EXTRAÇÃO ---
+def _inicio_de_frase(texto, posicao):
+    antes = texto[:posicao].rstrip()
+    return not antes or antes[-1] in ".!?:;\"“(—-"
+
+
+def _confianca(tokens, i, j, texto):
+    """Quanto um trecho tokens[i:j] que existe como título parece ser o assunto do item."""
+    palavras = [t for t, _ in tokens[i:j] if chave(t) not in PARTICULAS]
+    maiusculas = sum(p[:1].isupper() for p in palavras)
+    if len(palavras) == 1:
+        palavra = palavras[0]
+        if palavra.isdigit():
+            return "data", 0.35
+        if chave(palavra) in _SIGLAS or (palavra.isupper() and len(palavra) >= 2 and not ROMANO.match(palavra)):
+            return "sigla", 0.9
+        if maiusculas and not _inicio_de_frase(texto, tokens[i][1]):
+            return "nome", 0.65
+        return "titulo", 0.3      # palavra comum que por acaso é verbete ("Criação", "Sede")
+    return ("nome" if maiusculas else "titulo"), min(0.95, 0.7 + 0.05 * (len(palavras) - 1) + 0.05 * bool(maiusculas))
+
+
+def _escolher(achados, superficie):
+    """Entre títulos de mesma chave, o de grafia idêntica; senão uma página própria."""
+    alvo = superficie.casefold()
+    return (next((a for a in achados if a[0].casefold() == alvo), None)
+            or next((a for a in achados if not a[1]), None) or achados[0])
+
+
+def _pelo_indice(texto, tokens, indice, max_palavras):
+    entidades, i = [], 0
+    chaves = [chave(t) for t, _ in tokens]
+    while i < len(tokens):
+        if chaves[i] in PARTICULAS:
+            i += 1
+            continue
+        melhor = None
+        for j in range(i + 1, min(len(tokens), i + max_palavras) + 1):
+            k = " ".join(chaves[i:j])
+            if chaves[j - 1] not in PARTICULAS:
+                achados = indice.procurar(k)
+                if achados:
+                    melhor = (j, achados)
+            # Nenhum título continua assim: não adianta crescer o n-grama
+            if j < len(tokens) and not indice.tem_prefixo(k + " "):
+                break
+        if not melhor:
+            i += 1
+            continue
+        j, achados = melhor
+        superficie = texto[tokens[i][1]:tokens[j - 1][1] + len(tokens[j - 1][0])]
+        titulo, destino = _escolher(achados, superficie)
+        tipo, confianca = _confianca(tokens, i, j, texto)
+        entidades.append(Entidade(superficie, destino or titulo, tipo, confianca, tokens[i][1]))
+        i = j
+    return entidades
+
+
+def _pela_superficie(texto, tokens):
+    """Sem índice: siglas, eventos ('Tratado de ...'), nomes próprios em sequência e datas."""
+    entidades = []
+    for m in EVENTO.finditer(texto):
+        entidades.append(Entidade(m.group(), _titulo_provavel(m.group()), "evento", 0.8, m.start()))
+    for m in DATA.finditer(texto):
+        entidades.append(Entidade(m.group(), m.group(), "data", 0.35, m.start()))
+
+    i = 0
+    while i < len(tokens):
+        token, posicao = tokens[i]
+        if chave(token) in _SIGLAS or (token.isupper() and len(token) >= 2 and not ROMANO.match(token)
+                                        and not token.isdigit()):
+            entidades.append(Entidade(token, _SIGLAS.get(chave(token), token), "sigla", 0.85, posicao))
+            i += 1
+            continue
+        if not token[:1].isupper() or chave(token) in PARTICULAS:
+            i += 1
+            continue
+        # Sequência de palavras com maiúscula, admitindo "de/da/do" no meio (Barão do Rio Branco);
+        # "Brasil e Argentina" são dois nomes, não um
+        j = i + 1
+        while j < len(tokens):
+            if tokens[j][0][:1].isupper():
+                j += 1
+            elif chave(tokens[j][0]) in PONTES_NOME and j + 1 < len(tokens) and tokens[j + 1][0][:1].isupper():
+                j += 2
+            else:
+                break
+        palavras = j - i
+        superficie = texto[posicao:tokens[j - 1][1] + len(tokens[j - 1][0])]
+        if palavras > 1:
+            confianca = 0.7
+        else:
+            confianca = 0.3 if _inicio_de_frase(texto, posicao) else 0.6
+        entidades.append(Entidade(superficie, superficie, "nome", confianca, posicao))
+        i = j
+
+    # "Guerra Mundial" dentro de "Segunda Guerra Mundial": fica o trecho maior, com a maior confiança
+    def fim(e):
+        return e.posicao + len(e.superficie)
+    maiores = []
+    for entidade in sorted(entidades, key=lambda e: (e.posicao, -fim(e))):
+        if maiores and fim(entidade) <= fim(maiores[-1]):
+            maiores[-1].confianca = max(maiores[-1].confianca, entidade.confianca)
+        else:
+            maiores.append(entidade)
+    return maiores
+
+
+def extrair_entidades(texto, indice=None, max_palavras=MAX_PALAVRAS):
+    """Entidades do item, da mais para a menos confiável (uma por título)."""
+    texto = RUIDO.sub(" ", texto or "")
+    tokens = [(m.group(), m.start()) for m in TOKEN.finditer(texto)]
+    if indice is not None:
+        entidades = _pelo_indice(texto, tokens, indice, max_palavras)
+    else:
+        entidades = _pela_superficie(texto, tokens)
+    unicas = {}
+    for entidade in entidades:
+        k = chave(entidade.titulo)
+        if k not in unicas or entidade.confianca > unicas[k].confianca:
+            unicas[k] = entidade
+    return sorted(unicas.values(), key=lambda e: (-e.confianca, e.posicao))
+
+
+# --- LEITURA DOS DUMPS ---
+def _abrir(caminho):
+    if caminho.endswith(".gz"):
+        return gzip.open(caminho, "rt", encoding="utf-8")
+    return open(caminho, encoding="utf-8")
+
+
+def ler_titulos(caminho):
+    """all-titles-in-ns0: um título por linha (com _ no lugar de espaço), redirecionamentos inclusive."""
+    with _abrir(caminho) as arquivo:
+        for linha in arquivo:
+            titulo = linha.rstrip("\n")
+            if titulo and titulo != "page_title":
+                yield titulo, ""
+
+
+def ler_redirects(caminho):
+    """TSV 'origem<TAB>destino' por linha."""
+    with _abrir(caminho) as arquivo:
+        for linha in arquivo:
+            partes = linha.rstrip("\n").split("\t")
+            if len(partes) == 2 and partes[0] and partes[1]:
+                yield partes[0], partes[1].replace("_", " ")
+
+
+def ler_dump(caminho):
+    """O JSONL do WIKI_DUMP: {"title": ..., "redirects": [...]} por linha."""
+    with _abrir(caminho) as arquivo:
+        for linha in arquivo:
+            if linha.strip():
+                pagina = json.loads(linha)
+                yield pagina["title"], ""
+                for redirect in pagina.get("redirects", []):
+                    yield redirect, pagina["title"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--titulos", action="append", default=[], help="arquivo de títulos (.txt/.gz)")
+    parser.add_argument("--redirects", action="append", default=[], help="TSV origem<TAB>destino")
+    parser.add_argument("--dump", action="append", default=[], help="JSONL do WIKI_DUMP")
+    parser.add_argument("--saida", default=WIKI_INDICE)
+    parser.add_argument("--testar", help="só extrai as entidades desta frase (com o índice de --saida, se existir)")
+    args = parser.parse_args()
+
+    if args.testar:
+        for entidade in extrair_entidades(args.testar, carregar_indice(args.saida)):
+            print(f"{entidade.confianca:.2f}  {entidade.tipo:<7} {entidade.superficie!r} -> {entidade.titulo!r}")
+        return
+
+    def registros():
+        for caminho in args.titulos:
+            yield from ler_titulos(caminho)
+        # Redirecionamentos por último: o destino conhecido vale mais que o "" do all-titles
+        for caminho in args.dump:
+            yield from ler_dump(caminho)
+        for caminho in args.redirects:
+            yield from ler_redirects(caminho)
+
+    if not (args.titulos or args.dump or args.redirects):
+        parser.error("informe --titulos, --dump ou --redirects")
+    total = construir_indice(args.saida, registros())
+    print(f"✅ {total} títulos em {args.saida} ({os.path.getsize(args.saida) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
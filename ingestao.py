@@ -0,0 +1,256 @@
+"""
+Ingestão incremental do corpus RAG (bibliografia do CACD + respostas de alta nota).
+
+- Extrai páginas com PyMuPDF em um pool de processos (PDFs grandes são divididos em faixas).
+- Fatia em streaming: cada faixa vira trechos assim que chega, sem carregar o corpus inteiro.
+- Hash de conteúdo por documento e por trecho: só o que é novo ou mudou é embedado e enviado.
+- Embeddings em lotes; arquivos apagados saem do índice.
+
+Uso:
+    python ingestao.py bibliografia/ respostas_alta_nota/
+    python ingestao.py bibliografia/ --forcar        # reembeda tudo
+"""
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from rag import RAG_DIR, MotorRAG, criar_fatiador
+
+PAGINAS_POR_TAREFA = int(os.getenv("INGESTAO_PAGINAS_POR_TAREFA", "40"))
+LOTE_EMBEDDING = int(os.getenv("RAG_EMBED_LOTE", "64"))
+
+
+# --- TRABALHO NOS PROCESSOS FILHOS ---
+def _contar_paginas(caminho):
+    import pymupdf
+    with pymupdf.open(caminho) as documento:
+        return documento.page_count
+
+
+def _extrair_faixa(caminho, inicio, fim):
+    import pymupdf
+    paginas = []
+    with pymupdf.open(caminho) as documento:
+        for numero in range(inicio, fim):
+            texto = documento[numero].get_text("text").strip()
+            if texto:
+                paginas.append((numero + 1, texto))
+    return caminho, inicio, paginas
+
+
+# --- MANIFESTO (O QUE JÁ ESTÁ NO ÍNDICE) ---
+class Manifesto:
+    def __init__(self, caminho):
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(caminho)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documentos (
+                caminho TEXT PRIMARY KEY, hash TEXT NOT NULL, paginas INTEGER, atualizado REAL
+            );
+            CREATE TABLE IF NOT EXISTS trechos (
+                id TEXT PRIMARY KEY, documento TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_trechos_documento ON trechos(documento);
+        """)
+
+    def hash_documento(self, caminho):
+        linha = self.conn.execute("SELECT hash FROM documentos WHERE caminho = ?", (caminho,)).fetchone()
+        return linha[0] if linha else None
+
+    def trechos(self, caminho):
+        return {i for (i,) in self.conn.execute("SELECT id FROM trechos WHERE documento = ?", (caminho,))}
+
+    def documentos(self):
+        return [c for (c,) in self.conn.execute("SELECT caminho FROM documentos")]
+
+    def gravar(self, caminho, hash_doc, paginas, ids):
+        self.conn.execute("DELETE FROM trechos WHERE documento = ?", (caminho,))
+        self.conn.executemany("INSERT OR REPLACE INTO trechos (id, documento) VALUES (?, ?)", [(i, caminho) for i in ids])
+        self.conn.execute("INSERT OR REPLACE INTO documentos VALUES (?, ?, ?, ?)", (caminho, hash_doc, paginas, time.time()))
+
+    def apagar(self, caminho):
+        self.conn.execute("DELETE FROM trechos WHERE documento = ?", (caminho,))
+        self.conn.execute("DELETE FROM documentos WHERE caminho = ?", (caminho,))
+
+    def confirmar(self):
+        # Só depois que o índice foi salvo: se cair no meio, a próxima rodada refaz o que faltou
+        self.conn.commit()
+
+
+def hash_arquivo(caminho):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def id_trecho(caminho, texto):
+    # Mesmo texto no mesmo documento = mesmo id, mesmo que a página tenha mudado de lugar.
+    # Caminho inteiro (a chave do manifesto), não só o nome: a/edital.pdf e b/edital.pdf não dividem ids
+    return hashlib.sha256(f"{caminho}\x1f{texto}".encode("utf-8")).hexdigest()[:32]
+
+
+def listar_pdfs(entradas):
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            for raiz, _, arquivos in os.walk(entrada):
+                for nome in sorted(arquivos):
+                    if nome.lower().endswith(".pdf"):
+                        yield os.path.abspath(os.path.join(raiz, nome))
+        elif entrada.lower().endswith(".pdf"):
+            yield os.path.abspath(entrada)
+
+
+# --- PIPELINE ---
+class Metricas:
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.ultimo_print = self.inicio
+        self.paginas = self.trechos = self.embedados = self.pulados = 0
+        self.docs_novos = self.docs_iguais = self.docs_removidos = 0
+
+    def progresso(self, forcar=False):
+        agora = time.perf_counter()
+        if forcar or agora - self.ultimo_print >= 2:
+            self.ultimo_print = agora
+            decorrido = max(agora - self.inicio, 1e-9)
+            print(f"⏳ {self.paginas} páginas ({self.paginas / decorrido:.1f}/s) · "
+                  f"{self.trechos} trechos ({self.trechos / decorrido:.1f}/s) · "
+                  f"{self.embedados} embedados · {self.pulados} sem mudança")
+
+    def resumo(self):
+        decorrido = time.perf_counter() - self.inicio
+        return {
+            "segundos": round(decorrido, 2),
+            "paginas": self.paginas, "paginas_s": round(self.paginas / decorrido, 1) if decorrido else 0,
+            "trechos": self.trechos, "trechos_s": round(self.trechos / decorrido, 1) if decorrido else 0,
+            "embedados": self.embedados, "pulados": self.pulados,
+            "docs_novos_ou_alterados": self.docs_novos, "docs_iguais": self.docs_iguais,
+            "docs_removidos": self.docs_removidos,
+        }
+
+
+class Ingestor:
+    def __init__(self, motor=None, manifesto=None, processos=None):
+        self.motor = motor or MotorRAG()
+        self.manifesto = manifesto or Manifesto(os.path.join(RAG_DIR, "manifesto.sqlite3"))
+        self.processos = processos or os.cpu_count()
+        self.fatiador = criar_fatiador()
+        self.metricas = Metricas()
+        self._fila_ids, self._fila_textos, self._fila_meta = [], [], []
+
+    def _enfileirar(self, id_, texto, meta):
+        self._fila_ids.append(id_)
+        self._fila_textos.append(texto)
+        self._fila_meta.append(meta)
+        if len(self._fila_ids) >= LOTE_EMBEDDING:
+            self._descarregar()
+
+    def _descarregar(self):
+        if not self._fila_ids:
+            return
+        vetores = self.motor.embedder.embed_documentos(self._fila_textos)
+        self.motor.indice.upsert(self._fila_ids, vetores, self._fila_meta)
+        self.metricas.embedados += len(self._fila_ids)
+        self._fila_ids, self._fila_textos, self._fila_meta = [], [], []
+
+    def executar(self, entradas, forcar=False, podar=True):
+        pdfs = list(dict.fromkeys(listar_pdfs(entradas)))
+
+        # 1. Descobre o que mudou (hash do arquivo inteiro)
+        pendentes = {}
+        for caminho in pdfs:
+            hash_doc = hash_arquivo(caminho)
+            if not forcar and self.manifesto.hash_documento(caminho) == hash_doc:
+                self.metricas.docs_iguais += 1
+            else:
+                pendentes[caminho] = hash_doc
+        print(f"📂 {len(pdfs)} PDFs: {len(pendentes)} novos/alterados, {self.metricas.docs_iguais} sem mudança")
+
+        remover = set()
+        if podar:
+            # Só poda dentro das pastas/arquivos informados nesta rodada
+            raizes = tuple(os.path.abspath(e) for e in entradas)
+            sumidos = {c for c in self.manifesto.documentos() if c.startswith(raizes)} - set(pdfs)
+            for caminho in sumidos:
+                remover |= self.manifesto.trechos(caminho)
+                self.manifesto.apagar(caminho)
+                self.metricas.docs_removidos += 1
+
+        # Trechos que cada documento alterado já tinha: os idênticos não são reembedados
+        anteriores = {caminho: self.manifesto.trechos(caminho) for caminho in pendentes}
+        reaproveitaveis = {caminho: set() if forcar else ids for caminho, ids in anteriores.items()}
+
+        # 2. Extração em paralelo, fatiamento em streaming conforme as faixas chegam
+        if pendentes:
+            with ProcessPoolExecutor(max_workers=self.processos) as pool:
+                total_paginas = dict(zip(pendentes, pool.map(_contar_paginas, pendentes)))
+                faltam = {}
+                futuros = []
+                for caminho, paginas in total_paginas.items():
+                    faixas = range(0, paginas, PAGINAS_POR_TAREFA)
+                    faltam[caminho] = len(faixas)
+                    futuros += [pool.submit(_extrair_faixa, caminho, i, min(i + PAGINAS_POR_TAREFA, paginas)) for i in faixas]
+                    if not paginas:
+                        self._finalizar_documento(caminho, pendentes[caminho], 0, set(), anteriores[caminho], remover)
+
+                vistos = {caminho: set() for caminho in pendentes}
+                for futuro in as_completed(futuros):
+                    caminho, _, paginas = futuro.result()
+                    self._fatiar(caminho, paginas, vistos[caminho], reaproveitaveis[caminho])
+                    faltam[caminho] -= 1
+                    if faltam[caminho] == 0:
+                        self._finalizar_documento(caminho, pendentes[caminho], total_paginas[caminho],
+                                                  vistos[caminho], anteriores[caminho], remover)
+                    self.metricas.progresso()
+
+        # 3. Último lote, remoções e persistência
+        self._descarregar()
+        if remover:
+            self.motor.indice.remover(remover)
+        self.motor.indice.salvar()
+        self.manifesto.confirmar()
+        self.metricas.progresso(forcar=True)
+        return self.metricas.resumo()
+
+    def _fatiar(self, caminho, paginas, vistos, ja_indexados):
+        fonte = os.path.basename(caminho)
+        for pagina, texto in paginas:
+            self.metricas.paginas += 1
+            for trecho in self.fatiador.split_text(texto):
+                id_ = id_trecho(caminho, trecho)
+                if id_ in vistos:
+                    continue
+                vistos.add(id_)
+                self.metricas.trechos += 1
+                if id_ in ja_indexados:
+                    self.metricas.pulados += 1  # Trecho idêntico já está no índice
+                    continue
+                self._enfileirar(id_, trecho, {"texto": trecho, "fonte": fonte, "pagina": pagina})
+
+    def _finalizar_documento(self, caminho, hash_doc, paginas, vistos, anteriores, remover):
+        # Trechos que sumiram do documento saem do índice
+        remover |= anteriores - vistos
+        self.manifesto.gravar(caminho, hash_doc, paginas, vistos)
+        self.metricas.docs_novos += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("entradas", nargs="+", help="PDFs ou pastas com PDFs")
+    parser.add_argument("--forcar", action="store_true", help="Ignora o manifesto e reprocessa tudo")
+    parser.add_argument("--sem-podar", action="store_true", help="Não remove do índice PDFs que sumiram")
+    parser.add_argument("--processos", type=int, default=None)
+    args = parser.parse_args()
+
+    resumo = Ingestor(processos=args.processos).executar(args.entradas, forcar=args.forcar, podar=not args.sem_podar)
+    print(f"✅ Ingestão concluída: {resumo}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""
+Avaliação em lote: roda uma prova inteira do CEBRASPE pelo ResolveIaBlindado, sem áudio.
+
+Itens (--itens):
+  .txt    um item por linha
+  .jsonl  {"id": ..., "item": "...", "gabarito": "C", "texto_apoio": "..."} por linha
+  .json   lista de itens (texto ou objeto) ou {"texto_apoio": "...", "itens": [...]}
+Gabarito (--gabarito, opcional): .json {"id": "C"} ou .txt com um "C"/"E" (ou "id C") por linha.
+
+O contexto de cada Texto de Apoio é buscado uma vez e reaproveitado por todos os seus itens;
+na Fase 1 os itens do mesmo texto vão juntos em prompts de --por-prompt itens; na Fase 2 cada
+item leva só o resumo e as fatias do texto ligadas a ele (apoio.py). Tudo passa
+pelo agendador (cotas RPM/TPM), com prioridade abaixo do bot ao vivo.
+
+Uso: python lote.py --itens prova.jsonl --gabarito gabarito.txt --saida resultados.jsonl
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from despacho import percentil
+from metricas import telemetria
+from orcamento import montar_entrada, unir_contextos
+
+ITENS_POR_PROMPT = int(os.getenv("LOTE_ITENS_POR_PROMPT", "5"))
+CONCORRENCIA = int(os.getenv("LOTE_CONCORRENCIA", "4"))
+GABARITO = {"C": "CERTO", "CERTO": "CERTO", "E": "ERRADO", "ERRADO": "ERRADO"}
+
+
+# --- LEITURA DOS ARQUIVOS ---
+def _item(dados, posicao, texto_apoio):
+    if isinstance(dados, str):
+        dados = {"item": dados}
+    return {
+        "id": str(dados.get("id", posicao)),
+        "item": (dados.get("item") or dados.get("texto") or "").strip(),
+        "texto_apoio": dados.get("texto_apoio", texto_apoio),
+        "gabarito": normalizar_gabarito(dados.get("gabarito")),
+    }
+
+
+def ler_itens(caminho, texto_apoio=None):
+    with open(caminho, encoding="utf-8") as arquivo:
+        conteudo = arquivo.read()
+    if caminho.endswith(".jsonl"):
+        brutos = [json.loads(linha) for linha in conteudo.splitlines() if linha.strip()]
+    elif caminho.endswith(".json"):
+        dados = json.loads(conteudo)
+        if isinstance(dados, dict):
+            texto_apoio = dados.get("texto_apoio", texto_apoio)
+            dados = dados.get("itens", [])
+        brutos = dados
+    else:
+        brutos = [linha for linha in conteudo.splitlines() if linha.strip()]
+    itens = [_item(dados, posicao, texto_apoio) for posicao, dados in enumerate(brutos, 1)]
+    return [item for item in itens if item["item"]]
+
+
+def normalizar_gabarito(valor):
+    return GABARITO.get(str(valor).strip().upper()) if valor not in (None, "") else None
+
+
+def ler_gabarito(caminho):
+    """{id: CERTO/ERRADO}; linhas sem id valem pela posição (1, 2, 3...). Anulados ficam de fora."""
+    with open(caminho, encoding="utf-8") as arquivo:
+        if caminho.endswith(".json"):
+            return {str(k): normalizar_gabarito(v) for k, v in json.load(arquivo).items()}
+        gabarito = {}
+        for posicao, linha in enumerate((l for l in arquivo if l.strip()), 1):
+            partes = linha.replace(",", " ").replace(";", " ").split()
+            chave, valor = (partes[0], partes[1]) if len(partes) > 1 else (str(posicao), partes[0])
+            gabarito[chave] = normalizar_gabarito(valor)
+        return gabarito
+
+
+# --- EXECUÇÃO ---
+def _cronometrado(funcao, *args):
+    inicio = time.perf_counter()
+    return funcao(*args), time.perf_counter() - inicio
+
+
+def avaliar_lote(ia, itens, fase="1", prioridade="groq", politica="sequencial",
+                 por_prompt=ITENS_POR_PROMPT, concorrencia=CONCORRENCIA, sem_cache=False):
+    """
+    Julga (Fase 1) ou responde (Fase 2) todos os itens. Devolve os resultados na ordem
+    de entrada, cada um com veredito/resposta, modelo e a latência que o item custou.
+    """
+    # lote=True: toda chamada (Fase 2 e fallback um a um da Fase 1) entra na fila atrás do bot ao vivo
+    base = {'fase': fase, 'prioridade': prioridade, 'politica': politica, 'sem_cache': sem_cache, 'lote': True}
+    resultados = [dict(item) for item in itens]
+    grupos = {}
+    for i, item in enumerate(itens):
+        grupos.setdefault(item["texto_apoio"] or "", []).append(i)
+
+    with ThreadPoolExecutor(max_workers=concorrencia, thread_name_prefix="lote") as pool:
+        # 1. Contexto de cada Texto de Apoio: uma busca só, reaproveitada por todos os seus itens
+        apoio = dict(zip(grupos, pool.map(lambda texto: ia.coletar_contexto(texto) if texto else "", grupos)))
+        # Fase 2: cada texto preparado uma vez (fatias + resumo) para os itens irem sem o texto inteiro
+        chaves = {texto: ia.apoio.guardar(texto) for texto in grupos if texto and fase != "1" and ia.apoio}
+        # 2. Contexto de cada item, em paralelo (o coletor ainda paraleliza RAG x Wikipédia)
+        contextos = list(pool.map(lambda item: _cronometrado(ia.coletar_contexto, item["item"]), itens))
+
+        def julgar_grupo(texto_apoio, indices):
+            contexto = unir_contextos([apoio[texto_apoio]] + [contextos[i][0] for i in indices])
+            inputs = {**base, 'texto_apoio': texto_apoio or None, 'contexto': contexto}
+            vereditos, duracao = _cronometrado(ia.processar_fase1_lote, [itens[i]["item"] for i in indices], inputs)
+            for i, (veredito, label) in zip(indices, vereditos):
+                resultados[i].update(veredito=veredito, modelo=label, latencia_s=round(contextos[i][1] + duracao, 3))
+
+        def responder(i):
+            item = itens[i]
+            entrada = ia.apoio.entrada(chaves[item["texto_apoio"]], item["item"]) if item["texto_apoio"] in chaves else None
+            inputs = {**base, 'user_input': entrada or montar_entrada(item["texto_apoio"], item["item"]),
+                      'contexto': unir_contextos([apoio[item["texto_apoio"] or ""], contextos[i][0]])}
+            (resposta, label), duracao = _cronometrado(ia.processar, inputs)
+            resultados[i].update(resposta=resposta, modelo=label, latencia_s=round(contextos[i][1] + duracao, 3))
+
+        # 3. Fase 1: blocos de até 'por_prompt' itens do mesmo texto por chamada; Fase 2: um a um
+        if fase == "1":
+            tarefas = [pool.submit(julgar_grupo, texto, indices[k:k + por_prompt])
+                       for texto, indices in grupos.items() for k in range(0, len(indices), max(1, por_prompt))]
+        else:
+            tarefas = [pool.submit(responder, i) for i in range(len(itens))]
+        for tarefa in tarefas:
+            tarefa.result()
+    return resultados
+
+
+def relatorio(resultados, duracao, tokens):
+    latencias = [r["latencia_s"] for r in resultados if "latencia_s" in r]
+    info = {
+        "itens": len(resultados),
+        "duracao_s": round(duracao, 2),
+        "latencia_item_p50_s": percentil(latencias, 50),
+        "latencia_item_p95_s": percentil(latencias, 95),
+        "chamadas_llm": tokens["chamadas"],
+        "tokens_entrada": tokens["tokens_entrada"],
+        "tokens_saida": tokens["tokens_saida"],
+    }
+    com_gabarito = [r for r in resultados if r.get("gabarito") and "veredito" in r]
+    if com_gabarito:
+        acertos = sum(r["veredito"] == r["gabarito"] for r in com_gabarito)
+        em_branco = sum(r["veredito"] not in ("CERTO", "ERRADO") for r in com_gabarito)
+        erros = len(com_gabarito) - acertos - em_branco
+        info.update({
+            "com_gabarito": len(com_gabarito),
+            "acertos": acertos,
+            "erros": erros,
+            "em_branco": em_branco,   # ERRO/falha: no CEBRASPE, item não marcado
+            "acuracia": round(acertos / len(com_gabarito), 3),
+            "acuracia_respondidos": round(acertos / (acertos + erros), 3) if acertos + erros else None,
+            "nota_cebraspe": acertos - erros,   # cada erro anula um acerto
+        })
+    return info
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--itens", required=True)
+    parser.add_argument("--texto-apoio", help="arquivo com o Texto de Apoio comum a todos os itens")
+    parser.add_argument("--gabarito")
+    parser.add_argument("--saida", default="resultados.jsonl")
+    parser.add_argument("--relatorio", help="grava o relatório (JSON) neste arquivo")
+    parser.add_argument("--fase", choices=("1", "2"), default="1")
+    parser.add_argument("--prioridade", choices=("groq", "gemini"), default="groq")
+    parser.add_argument("--politica", default=os.getenv("POLITICA_DESPACHO", "sequencial"))
+    parser.add_argument("--por-prompt", type=int, default=ITENS_POR_PROMPT, help="itens da Fase 1 por chamada")
+    parser.add_argument("--concorrencia", type=int, default=CONCORRENCIA)
+    parser.add_argument("--sem-cache", action="store_true")
+    args = parser.parse_args()
+
+    texto_apoio = None
+    if args.texto_apoio:
+        with open(args.texto_apoio, encoding="utf-8") as arquivo:
+            texto_apoio = arquivo.read().strip()
+    itens = ler_itens(args.itens, texto_apoio)
+    if args.gabarito:
+        gabarito = ler_gabarito(args.gabarito)
+        for item in itens:
+            item["gabarito"] = gabarito.get(item["id"], item["gabarito"])
+    if not itens:
+        sys.exit("❌ Nenhum item encontrado")
+
+    from bot import ResolveIaBlindado
+    ia = ResolveIaBlindado()
+    print(f"📝 {len(itens)} itens, Fase {args.fase}, {args.por_prompt} por prompt, concorrência {args.concorrencia}")
+
+    antes = telemetria.totais("llm")
+    inicio = time.perf_counter()
+    resultados = avaliar_lote(ia, itens, args.fase, args.prioridade, args.politica,
+                              args.por_prompt, args.concorrencia, args.sem_cache)
+    duracao = time.perf_counter() - inicio
+    depois = telemetria.totais("llm")
+    tokens = {campo: depois[campo] - antes[campo] for campo in depois}
+
+    with open(args.saida, "w", encoding="utf-8") as arquivo:
+        for resultado in resultados:
+            resultado["acerto"] = (resultado.get("veredito") == resultado["gabarito"]) if resultado.get("gabarito") else None
+            arquivo.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+    info = relatorio(resultados, duracao, tokens)
+    print(f"💾 Resultados em {args.saida}")
+    for chave, valor in info.items():
+        print(f"   {chave}: {valor}")
+    if args.relatorio:
+        with open(args.relatorio, "w", encoding="utf-8") as arquivo:
+            json.dump(info, arquivo, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
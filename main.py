@@ -1,25 +1,21 @@
 import os
-import streamlit as st
-import threading
-import asyncio
-import time
+import sys
 import subprocess
-import speech_recognition as sr
-import tempfile
+import streamlit as st
 from datetime import datetime
-from gtts import gTTS
 from dotenv import load_dotenv
 
-# Telegram
-from telegram import Update
-from telegram.ext import ApplicationBuilder, ContextTypes, CommandHandler, MessageHandler, filters
-
-# Importação da sua IA
-from bot import ResolveIaBlindado 
+from despacho import POLITICAS
+from sessoes import GerenciadorSessoes
+from canal import CanalEstado
 
 # --- CARREGA VARIÁVEIS ---
 load_dotenv() 
 TOKEN = os.getenv("TELEGRAM_TOKEN")
+# De quanto em quanto tempo o painel confere se algo mudou (segundos)
+INTERVALO_PAINEL = float(os.getenv("PAINEL_INTERVALO", "1"))
+# 1 = o painel sobe um worker (python worker.py) como processo filho; 0 = workers sobem à parte
+BOT_EMBUTIDO = os.getenv("BOT_EMBUTIDO", "1") == "1"
 
 # --- CONFIGURAÇÃO DA PÁGINA STREAMLIT ---
 st.set_page_config(
@@ -29,172 +25,35 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# --- GERENCIADOR DE ESTADO (DADOS LEVES) ---
-class ServerState:
-    def __init__(self):
-        self.logs = []
-        self.fase_atual = '1'
-        self.modelo_prioridade = 'groq' 
-        self.texto_apoio_atual = None   
-    
-    def add_log(self, tipo, msg, status="Info"):
-        ts = datetime.now().strftime("%H:%M:%S")
-        self.logs.insert(0, {"time": ts, "type": tipo, "msg": msg, "status": status})
-        if len(self.logs) > 50: self.logs.pop()
-        
-    def set_fase(self, nova_fase):
-        self.fase_atual = nova_fase
-        self.add_log("Config", f"Fase alterada para {nova_fase}", "⚙️")
-
-    def set_prioridade(self, nova_prioridade):
-        self.modelo_prioridade = nova_prioridade.lower()
-        self.add_log("Config", f"Prioridade alterada para {nova_prioridade}", "⚙️")
-
-    def set_texto_apoio(self, texto):
-        self.texto_apoio_atual = texto
-        self.add_log("Memória", "Novo Texto de Apoio Memorizado", "💾")
-
-    def get_texto_apoio(self):
-        return self.texto_apoio_atual
-
+# --- ESTADO COMPARTILHADO COM OS WORKERS (CANAL SQLITE) ---
+# O bot não roda mais aqui: este processo só lê eventos/métricas e grava os padrões do admin.
 @st.cache_resource
-def get_state(): return ServerState()
-state = get_state()
+def get_canal(): return CanalEstado()
+canal = get_canal()
 
-# --- INICIALIZAÇÃO DA IA (PESADA) ---
 @st.cache_resource
-def get_ai_system():
-    print("🚀 Inicializando Cérebro Resolve.ia...")
-    return ResolveIaBlindado()
-
-# Variável Global da IA
-ai_system = get_ai_system()
-
-# --- UTILITÁRIOS DE ÁUDIO ---
-def converter_audio_nativo(input_path):
-    output_path = input_path.replace(".ogg", ".wav")
-    ffmpeg_cmd = "ffmpeg"
-    possible_paths = ["/usr/bin/ffmpeg", "/usr/local/bin/ffmpeg", "/opt/homebrew/bin/ffmpeg"]
-    for path in possible_paths:
-        if os.path.exists(path):
-            ffmpeg_cmd = path
-            break     
-    cmd = [ffmpeg_cmd, "-i", input_path, "-ac", "1", "-ar", "16000", output_path, "-y"]
-    try:
-        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
-        return output_path
-    except Exception as e:
-        print(f"Erro ffmpeg: {e}")
-        return None
+def get_sessoes(): return GerenciadorSessoes()
+sessoes = get_sessoes()
 
-# --- LÓGICA DO BOT TELEGRAM ---
-async def handle_audio(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = update.effective_user.first_name
-    state.add_log("Telegram", f"Áudio de {user}", "Recebido")
-    
-    temp_dir = tempfile.gettempdir()
-    ogg_file = os.path.join(temp_dir, f"voice_{int(time.time())}.ogg")
-    
-    try:
-        msg_wait = await update.message.reply_text("⬇️ Ouvindo...")
-        f = await context.bot.get_file(update.message.voice.file_id)
-        await f.download_to_drive(ogg_file)
-        
-        wav = converter_audio_nativo(ogg_file)
-        if not wav: raise Exception("Falha Conversão")
-
-        # 1. Transcrição (Google)
-        r = sr.Recognizer()
-        with sr.AudioFile(wav) as source:
-            texto_bruto = r.recognize_google(r.record(source), language="pt-BR")
-        
-        # 2. Agente Faxineiro
-        # CORREÇÃO CRUCIAL: Usamos 'ai_system' direto (Global), SEM 'state.'
-        texto_limpo = ai_system._corrigir_transcricao(texto_bruto)
-        state.add_log("Correção", f"'{texto_bruto}' -> '{texto_limpo}'", "✨")
-        
-        await context.bot.edit_message_text(
-            chat_id=update.effective_chat.id, 
-            message_id=msg_wait.message_id, 
-            text=f"📝 {texto_limpo}"
-        )
-        
-        # 3. Contexto
-        inicio_frase = texto_limpo.lower()[:40]
-        gatilhos_texto = ["texto de apoio", "texto base", "novo texto", "leia o texto"]
-        gatilhos_item = ["item", "questão", "julgue", "número"]
-
-        eh_comando_texto = any(g in inicio_frase for g in gatilhos_texto)
-        tem_item_junto = any(g in texto_limpo.lower() for g in gatilhos_item)
-
-        prompt_final = ""
-
-        if eh_comando_texto:
-            state.set_texto_apoio(texto_limpo)
-            if not tem_item_junto:
-                await update.message.reply_text("🧠 **Texto Base Memorizado!** Pode mandar os itens.")
-                return 
-            prompt_final = texto_limpo
-            aviso = "🧠 Texto salvo e processando item..."
-        else:
-            memoria = state.get_texto_apoio()
-            if memoria:
-                aviso = "💡 Usando Texto Base da memória..."
-                prompt_final = f"TEXTO BASE (MEMÓRIA):\n{memoria}\n\nITEM ATUAL:\n{texto_limpo}"
-            else:
-                aviso = "⚠️ Processando item isolado..."
-                prompt_final = texto_limpo
-
-        await update.message.reply_text(aviso)
-
-        # 4. Executa a IA
-        inputs = {
-            'user_input': prompt_final,
-            'fase': state.fase_atual,
-            'prioridade': state.modelo_prioridade
-        }
-        
-        # CORREÇÃO CRUCIAL: Usamos 'ai_system' direto (Global), SEM 'state.'
-        resposta_final, modelo_utilizado = ai_system.processar(inputs)
-        
-        await update.message.reply_text(resposta_final)
-
-        # 5. TTS
-        tts = gTTS(text=resposta_final, lang='pt', slow=False) 
-        mp3 = wav.replace(".wav", ".mp3")
-        tts.save(mp3)
-        await update.message.reply_voice(voice=open(mp3, 'rb'))
-        
-        state.add_log("Ciclo", f"Resp. via {modelo_utilizado}", "Finalizado")
-
-    except Exception as e:
-        error_msg = str(e)
-        state.add_log("Erro", error_msg, "Erro")
-        await update.message.reply_text(f"⚠️ Erro interno: {error_msg}")
-
-async def start(u, c): await u.message.reply_text("🤖 Resolve.ia Online!")
-
-# --- THREAD DO TELEGRAM ---
-def run_bot():
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    if not TOKEN: return
-    app = ApplicationBuilder().token(TOKEN).build()
-    app.add_handler(CommandHandler("start", start))
-    app.add_handler(MessageHandler(filters.VOICE, handle_audio))
-    app.run_polling(stop_signals=[], close_loop=False)
 
+def registrar(tipo, msg, status="⚙️"):
+    canal.registrar_evento("painel", tipo, msg, status)
+
+
+# --- WORKER EMBUTIDO (PROCESSO FILHO, SEM DISPUTAR O GIL COM O STREAMLIT) ---
 @st.cache_resource
 def start_bg_bot():
-    t = threading.Thread(target=run_bot, daemon=True)
-    t.start()
-    return t
+    if not (BOT_EMBUTIDO and TOKEN):
+        return None
+    pasta = os.path.dirname(os.path.abspath(__file__))
+    return subprocess.Popen([sys.executable, os.path.join(pasta, "worker.py"), "--pai", str(os.getpid())], cwd=pasta)
 
 start_bg_bot()
 
 # ==========================================
 #      INTERFACE VISUAL (STREAMLIT)
 # ==========================================
+config = canal.ler_config()
 
 # Layout Topo
 col_icon, col_title, col_vazia, col_fase, col_ai = st.columns([0.6, 2.5, 0.5, 1.2, 1.2])
@@ -210,47 +69,195 @@ with col_title:
     st.caption("Central de Comando")
 
 with col_fase:
-    modo_fase2 = st.toggle("Fase 2 (Discursiva)", value=(state.fase_atual == '2'))
+    modo_fase2 = st.toggle("Fase 2 (Discursiva)", value=(config['fase_atual'] == '2'))
     nova_fase = '2' if modo_fase2 else '1'
-    if nova_fase != state.fase_atual:
-        state.set_fase(nova_fase)
+    if nova_fase != config['fase_atual']:
+        canal.definir("fase_atual", nova_fase)
+        registrar("Config", f"Fase alterada para {nova_fase}")
         st.rerun()
 
 with col_ai:
-    prioridade_sel = st.radio("Prioridade IA", ["Groq", "Gemini"], index=0 if state.modelo_prioridade == 'groq' else 1, horizontal=True, label_visibility="collapsed")
-    if prioridade_sel.lower() != state.modelo_prioridade:
-        state.set_prioridade(prioridade_sel)
+    prioridade_sel = st.radio("Prioridade IA", ["Groq", "Gemini"], index=0 if config['modelo_prioridade'] == 'groq' else 1, horizontal=True, label_visibility="collapsed")
+    if prioridade_sel.lower() != config['modelo_prioridade']:
+        canal.definir("modelo_prioridade", prioridade_sel.lower())
+        registrar("Config", f"Prioridade alterada para {prioridade_sel}")
+        st.rerun()
+    politica_sel = st.selectbox("Despacho", POLITICAS, index=POLITICAS.index(config['politica_despacho']), label_visibility="collapsed")
+    if politica_sel != config['politica_despacho']:
+        canal.definir("politica_despacho", politica_sel)
+        registrar("Config", f"Despacho alterado para {politica_sel}")
         st.rerun()
 
 st.markdown("---")
 
-# Métricas
-m1, m2, m3 = st.columns(3)
-m1.metric("Status", "Online 🟢" if TOKEN else "Erro Token")
-memoria_status = "Ativa 💾" if state.texto_apoio_atual else "Vazia ⚪"
-m2.metric("Memória Contexto", memoria_status)
-
-with m3:
-    if state.texto_apoio_atual:
-        if st.button("Limpar Memória", type="primary"):
-            state.set_texto_apoio(None)
-            st.rerun()
+# Painel ao vivo: fragment próprio que roda sozinho a cada INTERVALO_PAINEL (e nos botões daqui).
+# Só relê o canal quando a versão mudou (evento, config, métricas ou worker caiu/subiu);
+# senão redesenha o retrato já lido, sem consultas e sem rerun da página inteira.
+@st.fragment(run_every=INTERVALO_PAINEL)
+def painel_ao_vivo():
+    versao = canal.versao()
+    lido = st.session_state.get("painel_lido")
+    if lido is None or lido["versao"] != versao:
+        lido = {
+            "versao": versao,
+            "workers": canal.workers(),
+            "config": canal.ler_config(),
+            "sessoes": sessoes.listar_persistidas(),
+            "logs": canal.eventos(50),
+        }
+        st.session_state["painel_lido"] = lido
+    workers = lido["workers"]
+    config = lido["config"]
+
+    # Métricas
+    m1, m2, m3 = st.columns(3)
+    if workers:
+        m1.metric("Status", "Online 🟢", f"{len(workers)} worker(s)", delta_color="off")
     else:
-        st.metric("Logs", len(state.logs))
-
-# Logs
-st.markdown("### 📜 Logs")
-if state.logs:
-    with st.container(height=300):
-        for log in state.logs:
+        m1.metric("Status", "Offline 🔴" if TOKEN else "Erro Token")
+    sessoes_ativas = lido["sessoes"]
+    com_memoria = sum(1 for s in sessoes_ativas if s["texto_apoio"])
+    m2.metric("Sessões Ativas", len(sessoes_ativas), f"{com_memoria} com Texto de Apoio 💾", delta_color="off")
+    logs = lido["logs"]
+    m3.metric("Logs", len(logs))
+
+    # Sessões por chat (cada aluno com sua fase, prioridade e memória)
+    if sessoes_ativas:
+        with st.expander(f"👥 Sessões ({len(sessoes_ativas)})"):
+            st.dataframe([{
+                "chat": s["chat_id"],
+                "aluno": s["usuario"],
+                "fase": s["fase"] or f"{config['fase_atual']} (padrão)",
+                "prioridade": s["prioridade"] or f"{config['modelo_prioridade']} (padrão)",
+                "itens": s["itens"],
+                "memória": (s["texto_apoio"] or "")[:80],
+                "último uso": datetime.fromtimestamp(s["ultimo_uso"]).strftime("%H:%M:%S"),
+            } for s in sessoes_ativas], use_container_width=True, hide_index=True)
+            chat_sel = st.selectbox("Chat", [s["chat_id"] for s in sessoes_ativas],
+                                    format_func=lambda c: next(f"{s['usuario']} ({c})" for s in sessoes_ativas if s["chat_id"] == c))
+            # As sessões vivem na memória dos workers: o painel só pede, cada worker aplica
+            b1, b2 = st.columns(2)
+            if b1.button("Limpar Memória", type="primary"):
+                canal.enviar_comando("limpar_memoria", chat_id=chat_sel)
+                registrar("Memória", f"Limpeza da memória pedida (chat {chat_sel})", "💾")
+                st.rerun(scope="fragment")
+            if b2.button("Encerrar Sessão"):
+                canal.enviar_comando("encerrar_sessao", chat_id=chat_sel)
+                registrar("Sessão", f"Encerramento pedido (chat {chat_sel})")
+                st.rerun(scope="fragment")
+
+    # Métricas vêm do retrato que cada worker publica no canal
+    if workers:
+        origem = next(iter(workers))
+        if len(workers) > 1:
+            origem = st.selectbox("Worker", sorted(workers))
+        painel_worker(workers[origem])
+
+    # Logs
+    st.markdown("### 📜 Logs")
+    if logs:
+        varios = len({log["origem"] for log in logs}) > 1
+        linhas = []
+        for log in logs:
             icon = "ℹ️"
             if log["status"] == "Erro": icon = "🔴"
             elif log["status"] == "Finalizado": icon = "✅"
             elif log["status"] == "✨": icon = "✨" 
             elif log["status"] == "💾": icon = "💾"
-            st.text(f"{log['time']} {icon} [{log['type']}] {log['msg']}")
-else:
-    st.info("Aguardando conexões...")
-
-time.sleep(2)
-st.rerun()
\ No newline at end of file
+            origem_log = f" ({log['origem']})" if varios else ""
+            linhas.append(f"{datetime.fromtimestamp(log['ts']).strftime('%H:%M:%S')} {icon} [{log['type']}]{origem_log} {log['msg']}")
+        # Um único elemento de texto em vez de 50
+        with st.container(height=300):
+            st.text("\n".join(linhas))
+    else:
+        st.info("Aguardando conexões...")
+
+
+def painel_worker(retrato):
+    # Saúde dos provedores (circuit breaker ao vivo)
+    ICONES_CIRCUITO = {"fechado": "🟢", "meio-aberto": "🟡", "aberto": "🔴"}
+    colunas_saude = st.columns(len(retrato["saude"]))
+    for coluna, (nome, info) in zip(colunas_saude, retrato["saude"].items()):
+        latencia = f"p50 {info['p50']:.1f}s · p95 {info['p95']:.1f}s" if info["p50"] is not None else "sem amostras"
+        detalhe = f" · reabre em {info['reabre_em']:.0f}s" if info["estado"] == "aberto" else ""
+        coluna.metric(f"{nome.capitalize()} {ICONES_CIRCUITO[info['estado']]}", info["estado"],
+                      f"erro {info['taxa_erro']:.0%} · {latencia}{detalhe}", delta_color="off")
+
+    # Cache de respostas (hits poupam RAG, Wikipédia e LLM)
+    info_cache = retrato["cache"]
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Cache (acerto)", f"{info_cache['taxa_acerto']:.0%}")
+    c2.metric("Hits memória / disco", f"{info_cache['hits_memoria']} / {info_cache['hits_disco']}")
+    c3.metric("Misses", info_cache["misses"], f"{info_cache.get('disco_itens', 0)} itens em disco", delta_color="off")
+
+    # Coleta de contexto em paralelo (quanto cada fonte deixou de somar na latência)
+    info_contexto = retrato["contexto"]
+    if info_contexto["ultimo"]:
+        ultimo = info_contexto["ultimo"]
+        por_fonte = " · ".join(
+            f"{nome}: {a['economia']:.1f}s poupados em {a['chamadas']} ({a['timeouts']} timeouts)"
+            for nome, a in info_contexto["acumulado"].items() if a["chamadas"]
+        )
+        st.caption(f"🧩 Último contexto em {ultimo['parede']:.2f}s (série: {ultimo['serie']:.2f}s) — {por_fonte}")
+
+    # Reconhecimento de fala (quantas notas foram decodificadas juntas)
+    info_stt = retrato["stt"]
+    if info_stt["notas"]:
+        st.caption(f"🎙️ STT {info_stt['backend']}: {info_stt['notas']} notas em {info_stt['lotes']} lotes (média {info_stt['media_lote']})")
+
+    # TTS (cache de frases e tempo até o primeiro áudio)
+    info_tts = retrato["tts"]
+    if info_tts["voz_enviada"]["p50"] is not None:
+        st.caption(f"🔊 TTS: acerto {info_tts['taxa_acerto']:.0%} ({info_tts['itens']} frases) | 1ª frase p50 "
+                   f"{info_tts['primeiro_trecho']['p50']:.2f}s · voz enviada p50 {info_tts['voz_enviada']['p50']:.2f}s "
+                   f"p95 {info_tts['voz_enviada']['p95']:.2f}s")
+
+    # Agendador (fila por cota de provedor/modelo)
+    filas = retrato["agendador"]
+    if filas:
+        st.caption("🚦 Cotas: " + " · ".join(
+            f"{chave}: {info['fila']} na fila, espera p95 {info['espera_p95'] or 0:.2f}s, {info['tpm_livre']} TPM livres"
+            + (f", {info['esgotados']} esgotados" if info["esgotados"] else "")
+            for chave, info in filas.items()
+        ))
+
+    # Webhook (fila limitada, duplicatas descartadas, 429 quando cheia)
+    info_webhook = retrato.get("webhook")
+    if info_webhook:
+        st.caption(f"🪝 Webhook: {info_webhook['processados']} processados, fila {info_webhook['fila']}/{info_webhook['fila_max']}, "
+                   f"espera p95 {info_webhook['espera_p95'] or 0:.2f}s, {info_webhook['duplicados']} duplicados, "
+                   f"{info_webhook['recusados']} recusados (429)")
+
+    # Textos de Apoio (resumo + fatias do item no lugar do texto inteiro)
+    info_apoio = retrato.get("apoio")
+    if info_apoio and info_apoio["entradas"]:
+        st.caption(f"📎 Textos de Apoio: {info_apoio['persistidos']} guardados ({info_apoio['reaproveitados']} reaproveitados), "
+                   f"{info_apoio['entradas']} itens com {info_apoio.get('economia', 0):.0%} menos tokens de texto")
+
+    # Placar do despacho (quem respondeu primeiro e com quanta folga)
+    placar = retrato["despachos"]
+    if placar["ultimo"]:
+        ultimo = placar["ultimo"]
+        margem = ultimo["margem"]
+        folga = "" if margem is None else f" | folga {'≥' if ultimo['margem_minima'] else ''}{margem:.2f}s sobre {ultimo['perdedor']}"
+        vitorias = ", ".join(f"{k}: {v}" for k, v in placar["vitorias"].items())
+        st.caption(f"🏁 Último despacho ({ultimo['politica']}): {ultimo['vencedor']} em {ultimo['latencia']:.2f}s{folga} — vitórias {vitorias}")
+
+    # Latência por etapa (p50/p95/p99 das amostras recentes; histograma completo em /metrics)
+    if retrato["percentis"]:
+        with st.expander("⏱️ Latência por etapa"):
+            st.dataframe([{
+                "etapa": p["etapa"], "provedor": p["provedor"], "n": p["n"], "erros": p["erros"],
+                "p50 (s)": round(p["p50"], 3), "p95 (s)": round(p["p95"], 3), "p99 (s)": round(p["p99"], 3),
+            } for p in retrato["percentis"]], use_container_width=True, hide_index=True)
+            # Registros estruturados mais recentes do anel da telemetria (o que compôs os percentis acima)
+            spans = retrato.get("spans")
+            if spans:
+                st.caption(f"Últimas {len(spans)} etapas registradas")
+                st.dataframe([{
+                    "hora": datetime.fromtimestamp(s["ts"]).strftime("%H:%M:%S"), "etapa": s["etapa"],
+                    "provedor": s["provedor"], "duração (s)": s["duracao"], "status": s["status"],
+                } for s in reversed(spans)], use_container_width=True, hide_index=True)
+
+
+painel_ao_vivo()
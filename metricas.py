@@ -0,0 +1,166 @@
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from despacho import percentil
+
+# --- TELEMETRIA POR ETAPA (SPANS, HISTOGRAMAS E EXPORTAÇÃO PROMETHEUS) ---
+METRICAS_PORTA = int(os.getenv("METRICAS_PORTA", "9464"))   # 0 desliga o endpoint
+METRICAS_HOST = os.getenv("METRICAS_HOST", "127.0.0.1")
+TAMANHO_ANEL = int(os.getenv("METRICAS_REGISTROS", "2000"))
+AMOSTRAS_POR_SERIE = 1000
+BALDES = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0)
+
+
+class _Serie:
+    """Uma combinação etapa + provedor: histograma cumulativo (Prometheus) e amostras recentes (percentis)."""
+    def __init__(self):
+        self.baldes = [0] * len(BALDES)
+        self.soma = 0.0
+        self.total = 0
+        self.erros = 0
+        self.amostras = deque(maxlen=AMOSTRAS_POR_SERIE)
+
+    def observar(self, duracao, erro):
+        for i, limite in enumerate(BALDES):
+            if duracao <= limite:
+                self.baldes[i] += 1
+        self.soma += duracao
+        self.total += 1
+        self.erros += erro
+        self.amostras.append(duracao)
+
+
+class Telemetria:
+    def __init__(self, tamanho=TAMANHO_ANEL):
+        self.registros = deque(maxlen=tamanho)   # anel com os registros estruturados mais recentes
+        self._series = {}
+        self._contadores = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, etapa, duracao, provedor="", status="ok", **extras):
+        registro = {"ts": time.time(), "etapa": etapa, "provedor": provedor or "", "duracao": round(duracao, 4),
+                    "status": status, **extras}
+        with self._lock:
+            self.registros.append(registro)
+            serie = self._series.setdefault((etapa, provedor or ""), _Serie())
+            serie.observar(duracao, status == "erro")
+            for campo in ("tokens_entrada", "tokens_saida", "chars"):
+                if extras.get(campo):
+                    chave = (campo, etapa, provedor or "")
+                    self._contadores[chave] = self._contadores.get(chave, 0) + extras[campo]
+        return registro
+
+    @contextmanager
+    def span(self, etapa, provedor="", **extras):
+        """
+        Cronometra um bloco (síncrono ou dentro de corrotina). O dict devolvido pode
+        receber provedor/tokens/chars durante o bloco; exceções marcam status=erro.
+        """
+        dados = {"provedor": provedor, **extras}
+        inicio = time.perf_counter()
+        try:
+            yield dados
+        except BaseException as e:
+            # CancelledError/GeneratorExit não são Exception: stream perdedor cancelado, não falha
+            dados.setdefault("status", "erro" if isinstance(e, Exception) else "cancelado")
+            raise
+        finally:
+            provedor = dados.pop("provedor", "")
+            status = dados.pop("status", "ok")
+            self.registrar(etapa, time.perf_counter() - inicio, provedor, status, **dados)
+
+    def percentis(self):
+        with self._lock:
+            return {
+                chave: {
+                    "n": serie.total,
+                    "erros": serie.erros,
+                    "p50": percentil(list(serie.amostras), 50),
+                    "p95": percentil(list(serie.amostras), 95),
+                    "p99": percentil(list(serie.amostras), 99),
+                }
+                for chave, serie in sorted(self._series.items())
+            }
+
+    def zerar(self):
+        """Descarta séries e registros (benchmarks medem cada rodada do zero)."""
+        with self._lock:
+            self.registros.clear()
+            self._series.clear()
+            self._contadores.clear()
+
+    def totais(self, etapa):
+        """Chamadas e tokens acumulados de uma etapa, somando os provedores."""
+        with self._lock:
+            info = {"chamadas": sum(s.total for (e, _), s in self._series.items() if e == etapa)}
+            for campo in ("tokens_entrada", "tokens_saida"):
+                info[campo] = sum(v for (c, e, _), v in self._contadores.items() if c == campo and e == etapa)
+        return info
+
+    def recentes(self, n=50):
+        with self._lock:
+            return list(self.registros)[-n:]
+
+    def prometheus(self):
+        """Formato texto de exposição do Prometheus."""
+        linhas = [
+            "# HELP resolveia_etapa_segundos Duração de cada etapa do pipeline.",
+            "# TYPE resolveia_etapa_segundos histogram",
+        ]
+        with self._lock:
+            for (etapa, provedor), serie in sorted(self._series.items()):
+                rotulos = f'etapa="{etapa}",provedor="{provedor}"'
+                for limite, quantidade in zip(BALDES, serie.baldes):
+                    linhas.append(f'resolveia_etapa_segundos_bucket{{{rotulos},le="{limite}"}} {quantidade}')
+                linhas.append(f'resolveia_etapa_segundos_bucket{{{rotulos},le="+Inf"}} {serie.total}')
+                linhas.append(f"resolveia_etapa_segundos_sum{{{rotulos}}} {serie.soma:.6f}")
+                linhas.append(f"resolveia_etapa_segundos_count{{{rotulos}}} {serie.total}")
+            linhas += ["# HELP resolveia_etapa_erros_total Execuções da etapa que terminaram em erro.",
+                       "# TYPE resolveia_etapa_erros_total counter"]
+            for (etapa, provedor), serie in sorted(self._series.items()):
+                linhas.append(f'resolveia_etapa_erros_total{{etapa="{etapa}",provedor="{provedor}"}} {serie.erros}')
+            for campo in ("tokens_entrada", "tokens_saida", "chars"):
+                linhas += [f"# HELP resolveia_{campo}_total Volume de {campo.replace('_', ' ')} por etapa.",
+                           f"# TYPE resolveia_{campo}_total counter"]
+                for (nome, etapa, provedor), valor in sorted(self._contadores.items()):
+                    if nome == campo:
+                        linhas.append(f'resolveia_{campo}_total{{etapa="{etapa}",provedor="{provedor}"}} {valor}')
+        return "\n".join(linhas) + "\n"
+
+
+telemetria = Telemetria()
+
+
+def iniciar_servidor(porta=None, host=None):
+    """GET /metrics em uma thread própria. Retorna o servidor (ou None se desligado/porta ocupada)."""
+    porta = METRICAS_PORTA if porta is None else porta
+    if not porta:
+        return None
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            corpo = telemetria.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, *args):
+            pass
+
+    try:
+        servidor = ThreadingHTTPServer((host or METRICAS_HOST, porta), Handler)
+    except OSError as e:
+        print(f"⚠️ Métricas sem endpoint (porta {porta}): {e}")
+        return None
+    threading.Thread(target=servidor.serve_forever, daemon=True, name="metricas").start()
+    print(f"📈 Métricas Prometheus em http://{host or METRICAS_HOST}:{porta}/metrics")
+    return servidor
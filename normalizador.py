@@ -0,0 +1,56 @@
+import re
+
+# --- NORMALIZADOR LOCAL DA TRANSCRIÇÃO (SEM LLM) ---
+# Cobre as regras fixas que o Agente Editor aplicava: "e tem"/"aí tem" + número -> "Item X",
+# "texto de apoio" -> "Texto de Apoio" e caixa de siglas. A correção fonética fica para o LLM.
+
+NUMEROS = {
+    "um": 1, "uma": 1, "dois": 2, "duas": 2, "três": 3, "tres": 3, "quatro": 4, "cinco": 5,
+    "seis": 6, "sete": 7, "oito": 8, "nove": 9, "dez": 10, "onze": 11, "doze": 12, "treze": 13,
+    "catorze": 14, "quatorze": 14, "quinze": 15, "dezesseis": 16, "dezessete": 17, "dezoito": 18,
+    "dezenove": 19, "vinte": 20, "trinta": 30, "quarenta": 40, "cinquenta": 50,
+}
+
+SIGLAS = [
+    "ONU", "OEA", "OMC", "OTAN", "NATO", "FMI", "BIRD", "OCDE", "OIT", "OMS", "AIEA", "UNESCO", "UNCTAD",
+    "GATT", "TNP", "CSNU", "CIJ", "TPI", "BRICS", "IBAS", "CPLP", "OTCA", "ASEAN", "OPEP", "EUA", "URSS",
+    "UE", "CEE", "CACD", "BNDES", "PIB", "CEPAL", "ALADI", "ALALC", "ALCA", "Mercosul", "Unasul", "CELAC",
+    "G20", "G7", "G77", "PEI", "IRBr", "MRE", "ECOSOC", "ACNUR", "FAO", "OMPI", "UNICEF", "PNUD",
+]
+
+_NUMERO = "|".join(sorted(NUMEROS, key=len, reverse=True))
+# "e tem 3", "aí tem três", "item vinte e um", "julgue o ítem 4" - só no começo da fala ou de uma frase:
+# no meio ("a ONU foi criada em 1945 e tem 193 membros") é texto comum, não o número do item
+ITEM = re.compile(
+    rf"(^|[.!?;:]\s*)(julgue\s+o\s+)?(?:e\s+tem|a[íi]\s+tem|o\s+[íi]tem|[íi]tem)\s+"
+    rf"(\d+|(?:{_NUMERO})(?:\s+e\s+(?:{_NUMERO}))?)\b[\s,:.]*(\w?)",
+    re.IGNORECASE,
+)
+TEXTO_APOIO = re.compile(r"\btexto\s+de\s+apoio\b", re.IGNORECASE)
+SIGLA = re.compile(r"\b(" + "|".join(re.escape(s) for s in SIGLAS) + r")\b", re.IGNORECASE)
+_CANONICA = {s.lower(): s for s in SIGLAS}
+
+
+def _numero(texto):
+    if texto.isdigit():
+        return texto
+    return str(sum(NUMEROS[p] for p in texto.lower().split() if p in NUMEROS))
+
+
+def _item(m):
+    # "e tem 3 a ONU..." -> "Item 3. A ONU..."
+    prefixo, julgue, numero, seguinte = m.groups()
+    return f"{prefixo}{julgue or ''}Item {_numero(numero)}" + (f". {seguinte.upper()}" if seguinte else "")
+
+
+def normalizar_transcricao(texto):
+    if not texto or not texto.strip():
+        return texto
+    texto = " ".join(texto.split())
+    texto = ITEM.sub(_item, texto)
+    texto = TEXTO_APOIO.sub("Texto de Apoio", texto)
+    texto = SIGLA.sub(lambda m: _CANONICA[m.group(1).lower()], texto)
+    texto = texto[0].upper() + texto[1:]
+    if texto[-1] not in ".!?":
+        texto += "."
+    return texto
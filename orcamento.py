@@ -0,0 +1,177 @@
+import os
+import re
+import json
+import math
+import unicodedata
+
+# --- ORÇAMENTO DE TOKENS DO PROMPT ---
+# Contagem exata com tiktoken se estiver instalado; senão, estimativa por caracteres
+# (português fica em ~3,6 caracteres por token nos tokenizadores do Llama e do Gemini).
+try:
+    import tiktoken
+    _codificador = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _codificador = None
+
+CHARS_POR_TOKEN = float(os.getenv("CHARS_POR_TOKEN", "3.6"))
+
+# Teto de tokens de ENTRADA por chamada. Por provedor, com exceções por modelo em JSON:
+# ORCAMENTO_MODELOS='{"llama-3.3-70b-versatile": 6000, "gemini-2.0-flash": 60000}'
+ORCAMENTO_PROVEDOR = {
+    "groq": int(os.getenv("ORCAMENTO_GROQ", "6000")),
+    "gemini": int(os.getenv("ORCAMENTO_GEMINI", "30000")),
+}
+ORCAMENTO_MODELOS = json.loads(os.getenv("ORCAMENTO_MODELOS", "{}") or "{}")
+ORCAMENTO_PADRAO = 8000
+# Se entrada e contexto não couberem juntos, a entrada (Texto de Apoio + item) fica com no máximo esta fração
+FRACAO_ENTRADA = float(os.getenv("ORCAMENTO_FRACAO_ENTRADA", "0.5"))
+
+MARCADOR_MEMORIA = "TEXTO BASE (MEMÓRIA):\n"
+MARCADOR_ITEM = "\n\nITEM ATUAL:\n"
+CORTE = " [...] "
+
+
+def contar_tokens(texto):
+    if not texto:
+        return 0
+    if _codificador:
+        return len(_codificador.encode(texto, disallowed_special=()))
+    return math.ceil(len(texto) / CHARS_POR_TOKEN)
+
+
+def orcamento_tokens(provedor, modelo=None):
+    return int(ORCAMENTO_MODELOS.get(modelo or "") or ORCAMENTO_PROVEDOR.get(provedor, ORCAMENTO_PADRAO))
+
+
+def montar_entrada(texto_apoio, item):
+    """Item com o Texto de Apoio memorizado na frente (formato que o orçamento sabe separar)."""
+    return f"{MARCADOR_MEMORIA}{texto_apoio}{MARCADOR_ITEM}{item}" if texto_apoio else item
+
+
+def separar_entrada(entrada):
+    if entrada.startswith(MARCADOR_MEMORIA) and MARCADOR_ITEM in entrada:
+        memoria, item = entrada[len(MARCADOR_MEMORIA):].split(MARCADOR_ITEM, 1)
+        return memoria, item
+    return None, entrada
+
+
+# --- RELEVÂNCIA (SOBREPOSIÇÃO LÉXICA COM O ITEM) ---
+def _termos(texto):
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return {t for t in re.findall(r"\w+", texto) if len(t) > 3 or t.isdigit()}
+
+
+def _relevancia(trecho, termos_consulta, posicao):
+    termos = _termos(trecho)
+    comuns = len(termos & termos_consulta)
+    # Normaliza pelo tamanho e dá um leve peso à ordem original (o RAG já vem ordenado por score)
+    return comuns / math.sqrt(len(termos) + 1) + 0.05 / (1 + posicao)
+
+
+def selecionar(trechos, consulta, orcamento):
+    """Índices dos trechos mais relevantes que cabem no orçamento, na ordem original."""
+    termos_consulta = _termos(consulta)
+    ranking = sorted(range(len(trechos)), key=lambda i: -_relevancia(trechos[i], termos_consulta, i))
+    escolhidos, usado = [], 0
+    for i in ranking:
+        custo = contar_tokens(trechos[i]) + 2
+        if usado + custo <= orcamento:
+            escolhidos.append(i)
+            usado += custo
+    return sorted(escolhidos)
+
+
+def truncar(texto, orcamento):
+    if contar_tokens(texto) <= orcamento:
+        return texto
+    limite = max(0, int(orcamento * CHARS_POR_TOKEN))
+    corte = texto.rfind(" ", 0, limite)
+    return texto[:corte if corte > 0 else limite] + CORTE.rstrip()
+
+
+# --- CONTEXTO: BLOCOS POR FONTE, TRECHOS SEPARADOS POR --- ---
+CABECALHO = re.compile(r"^\s*(\[[^\]\n]+\]:?)", re.MULTILINE)
+
+
+def _blocos(contexto):
+    """[(cabeçalho, [trechos])]: '[CONTEXTO BIBLIOGRÁFICO]', '[FONTE WIKIPÉDIA ...]:' etc."""
+    posicoes = [m.start(1) for m in CABECALHO.finditer(contexto)]
+    if not posicoes or posicoes[0] > 0 and contexto[:posicoes[0]].strip():
+        posicoes = [0] + posicoes
+    blocos = []
+    for inicio, fim in zip(posicoes, posicoes[1:] + [len(contexto)]):
+        bloco = contexto[inicio:fim].strip()
+        cabecalho = CABECALHO.match(bloco)
+        titulo = cabecalho.group(1) if cabecalho else ""
+        corpo = bloco[len(titulo):].strip()
+        blocos.append((titulo, [t.strip() for t in corpo.split("\n---\n") if t.strip()]))
+    return blocos
+
+
+def compactar_contexto(contexto, consulta, orcamento):
+    if contar_tokens(contexto) <= orcamento:
+        return contexto
+    blocos = _blocos(contexto)
+    trechos = [(b, t) for b, (_, lista) in enumerate(blocos) for t in lista]
+    custo_cabecalhos = sum(contar_tokens(titulo) + 1 for titulo, _ in blocos)
+    escolhidos = selecionar([t for _, t in trechos], consulta, orcamento - custo_cabecalhos)
+    if not escolhidos and trechos:
+        # Nenhum trecho inteiro cabe: fica o mais relevante, cortado
+        melhor = selecionar([t for _, t in trechos], consulta, 10 ** 9)[0]
+        trechos[melhor] = (trechos[melhor][0], truncar(trechos[melhor][1], orcamento - custo_cabecalhos))
+        escolhidos = [melhor]
+    por_bloco = {}
+    for i in escolhidos:
+        por_bloco.setdefault(trechos[i][0], []).append(trechos[i][1])
+    return "\n".join(
+        (blocos[b][0] + (" " if blocos[b][0].endswith(":") else "\n") if blocos[b][0] else "") + "\n---\n".join(lista)
+        for b, lista in sorted(por_bloco.items())
+    )
+
+
+def unir_contextos(contextos):
+    """Junta contextos de vários itens num só, sem repetir trechos (mesma fonte fica no mesmo bloco)."""
+    por_titulo = {}
+    for contexto in contextos:
+        for titulo, trechos in _blocos(contexto or ""):
+            lista = por_titulo.setdefault(titulo, [])
+            lista.extend(t for t in trechos if t not in lista)
+    return "\n".join(
+        (titulo + (" " if titulo.endswith(":") else "\n") if titulo else "") + "\n---\n".join(trechos)
+        for titulo, trechos in por_titulo.items() if trechos
+    )
+
+
+def compactar_entrada(entrada, orcamento):
+    """Encolhe só o Texto de Apoio (frases mais ligadas ao item); o item nunca é cortado."""
+    memoria, item = separar_entrada(entrada)
+    if memoria is None or contar_tokens(entrada) <= orcamento:
+        return entrada
+    disponivel = orcamento - contar_tokens(item) - contar_tokens(MARCADOR_MEMORIA + MARCADOR_ITEM)
+    frases = [f for f in re.split(r"(?<=[.!?;])\s+|\n+", memoria) if f.strip()]
+    escolhidas = selecionar(frases, item, max(0, disponivel))
+    partes, anterior = [], None
+    for i in escolhidas:
+        if anterior is not None and i != anterior + 1:
+            partes.append(CORTE.strip())
+        partes.append(frases[i])
+        anterior = i
+    return montar_entrada(" ".join(partes) or CORTE.strip(), item)
+
+
+def ajustar_secoes(entrada, contexto, disponivel):
+    """
+    Encaixa entrada e contexto nos tokens que sobram depois do template fixo.
+    Devolve (entrada, contexto, relatório com as contagens antes/depois).
+    """
+    antes_entrada, antes_contexto = contar_tokens(entrada), contar_tokens(contexto)
+    if antes_entrada + antes_contexto > disponivel:
+        teto_entrada = max(disponivel * FRACAO_ENTRADA, disponivel - antes_contexto)
+        if antes_entrada > teto_entrada:
+            entrada = compactar_entrada(entrada, teto_entrada)
+        contexto = compactar_contexto(contexto or "", entrada, max(0, disponivel - contar_tokens(entrada)))
+    return entrada, contexto, {
+        "entrada": (antes_entrada, contar_tokens(entrada)),
+        "contexto": (antes_contexto, contar_tokens(contexto)),
+    }
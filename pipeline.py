@@ -0,0 +1,59 @@
+import os
+import asyncio
+import functools
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+# --- POOL DE THREADS COMPARTILHADO (TRABALHO BLOQUEANTE) ---
+# SDKs síncronos (Groq, Gemini, SpeechRecognition, gTTS) rodam aqui,
+# nunca direto no event loop do Telegram.
+MAX_THREADS = int(os.getenv("PIPELINE_MAX_THREADS", "16"))
+
+# Quantas execuções simultâneas cada etapa do pipeline aceita
+LIMITES_ETAPA = {
+    "ffmpeg": int(os.getenv("LIMITE_FFMPEG", "4")),
+    "stt": int(os.getenv("LIMITE_STT", "4")),
+    "llm": int(os.getenv("LIMITE_LLM", "8")),
+    "tts": int(os.getenv("LIMITE_TTS", "4")),
+    "contexto": int(os.getenv("LIMITE_CONTEXTO", "8")),
+}
+LIMITE_PADRAO = 4
+
+_executor = ThreadPoolExecutor(max_workers=MAX_THREADS, thread_name_prefix="resolveia")
+
+# Semáforos são presos ao event loop, então guardamos um conjunto por loop
+_semaforos = weakref.WeakKeyDictionary()
+
+
+def _semaforo(etapa):
+    loop = asyncio.get_running_loop()
+    por_etapa = _semaforos.setdefault(loop, {})
+    if etapa not in por_etapa:
+        por_etapa[etapa] = asyncio.Semaphore(LIMITES_ETAPA.get(etapa, LIMITE_PADRAO))
+    return por_etapa[etapa]
+
+
+async def rodar_em_thread(etapa, funcao, *args, **kwargs):
+    """Executa uma função bloqueante no pool, respeitando o limite da etapa."""
+    async with _semaforo(etapa):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, functools.partial(funcao, *args, **kwargs))
+
+
+async def rodar_subprocesso(etapa, cmd, entrada=None):
+    """
+    Roda um comando externo via asyncio (sem bloquear o loop).
+    Retorna (stdout, stderr) e levanta RuntimeError se o código de saída != 0.
+    """
+    async with _semaforo(etapa):
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.PIPE if entrada is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        stdout, stderr = await proc.communicate(entrada)
+    if proc.returncode != 0:
+        detalhe = stderr.decode(errors="ignore").strip()[-300:]
+        raise RuntimeError(f"{cmd[0]} saiu com código {proc.returncode}: {detalhe}")
+    return stdout, stderr
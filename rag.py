@@ -0,0 +1,339 @@
+"""
+Motor de recuperação (RAG) do Resolve.ia.
+
+- Embedders: "hash" (local, sem rede, padrão) ou "gemini" (text-embedding-004).
+- Índices: "local" (NumPy + memmap, com IVF para corpora grandes, padrão) ou "pinecone".
+
+Uso:
+    python ingestao.py bibliografia/          (ingestão incremental, ver ingestao.py)
+    python rag.py buscar "Tratado de Assunção"
+"""
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+
+import numpy as np
+
+RAG_DIR = os.getenv("RAG_DIR", "dados/rag")
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "4"))
+RAG_SCORE_MINIMO = float(os.getenv("RAG_SCORE_MINIMO", "0.15"))
+
+
+# --- EMBEDDERS ---
+class EmbedderHash:
+    """
+    Embedding local por feature hashing (palavras + bigramas), normalizado em L2.
+    Não entende sinônimos, mas não precisa de rede nem de modelo para funcionar.
+    """
+    nome = "hash"
+
+    def __init__(self, dim=None):
+        self.dim = dim or int(os.getenv("RAG_HASH_DIM", "1024"))
+
+    @staticmethod
+    def _tokens(texto):
+        palavras = re.findall(r"\w+", texto.lower())
+        return palavras + [f"{a}_{b}" for a, b in zip(palavras, palavras[1:])]
+
+    def _vetor(self, texto):
+        vetor = np.zeros(self.dim, dtype=np.float32)
+        for token in self._tokens(texto):
+            h = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+            vetor[h % self.dim] += 1.0 if (h >> 63) else -1.0
+        norma = np.linalg.norm(vetor)
+        return vetor / norma if norma else vetor
+
+    def embed_documentos(self, textos):
+        return np.stack([self._vetor(t) for t in textos]) if textos else np.zeros((0, self.dim), np.float32)
+
+    def embed_consulta(self, texto):
+        return self._vetor(texto)
+
+
+class EmbedderGemini:
+    nome = "gemini"
+    dim = 768
+
+    def __init__(self, modelo=None):
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY"))
+        self.genai = genai
+        self.modelo = modelo or os.getenv("RAG_EMBED_MODEL", "models/text-embedding-004")
+
+    def _normalizar(self, vetores):
+        vetores = np.asarray(vetores, dtype=np.float32)
+        normas = np.linalg.norm(vetores, axis=-1, keepdims=True)
+        return vetores / np.where(normas == 0, 1, normas)
+
+    def embed_documentos(self, textos):
+        if not textos:
+            return np.zeros((0, self.dim), np.float32)
+        resposta = self.genai.embed_content(model=self.modelo, content=list(textos), task_type="retrieval_document")
+        return self._normalizar(resposta["embedding"])
+
+    def embed_consulta(self, texto):
+        resposta = self.genai.embed_content(model=self.modelo, content=texto, task_type="retrieval_query")
+        return self._normalizar(resposta["embedding"])
+
+
+def criar_embedder(nome=None):
+    nome = nome or os.getenv("RAG_EMBEDDER", "hash")
+    return EmbedderGemini() if nome == "gemini" else EmbedderHash()
+
+
+# --- ÍNDICE LOCAL (NUMPY + MEMMAP + IVF) ---
+def _kmeans(vetores, k, iteracoes=8, semente=0):
+    """k-means esférico simples (vetores já normalizados)."""
+    rng = np.random.default_rng(semente)
+    centroides = vetores[rng.choice(len(vetores), size=k, replace=False)].copy()
+    for _ in range(iteracoes):
+        rotulos = np.argmax(vetores @ centroides.T, axis=1)
+        for c in range(k):
+            membros = vetores[rotulos == c]
+            if len(membros):
+                soma = membros.sum(axis=0)
+                centroides[c] = soma / (np.linalg.norm(soma) or 1)
+    return centroides
+
+
+class IndiceLocal:
+    """
+    Vetores em um arquivo float32 lido via memmap (não ocupa RAM até ser tocado)
+    e metadados em JSON. Acima de LIMIAR_IVF vetores, a busca usa listas invertidas
+    (k-means) e só varre as 'nprobe' listas mais próximas da consulta.
+    """
+    LIMIAR_IVF = int(os.getenv("RAG_LIMIAR_IVF", "20000"))
+    BLOCO = 65536
+
+    def __init__(self, diretorio=RAG_DIR, nprobe=None):
+        self.diretorio = diretorio
+        self.nprobe = nprobe or int(os.getenv("RAG_NPROBE", "8"))
+        self.dim = None
+        self.ids, self.meta = [], []
+        self.vetores = None
+        self.centroides, self.listas, self.offsets = None, None, None
+        self._posicao = {}
+        # Escritas do upsert ficam aqui até salvar/buscar: juntar a matriz a cada lote seria quadrático
+        self._pendentes = []
+        self._alteradas = {}
+        self._lock = threading.RLock()
+        self.carregar()
+
+    # Arquivos
+    def _arquivo(self, nome):
+        return os.path.join(self.diretorio, nome)
+
+    def carregar(self):
+        caminho_meta = self._arquivo("meta.json")
+        if not os.path.exists(caminho_meta):
+            return
+        with open(caminho_meta, encoding="utf-8") as arquivo:
+            dados = json.load(arquivo)
+        self.dim = dados["dim"]
+        self.ids = [m["id"] for m in dados["itens"]]
+        self.meta = dados["itens"]
+        self._posicao = {i: p for p, i in enumerate(self.ids)}
+        self.vetores = None
+        self._pendentes, self._alteradas = [], {}
+        self.centroides, self.listas, self.offsets = None, None, None
+        if self.ids:
+            self.vetores = np.memmap(self._arquivo("vetores.f32"), dtype=np.float32, mode="r", shape=(len(self.ids), self.dim))
+        if os.path.exists(self._arquivo("ivf.npz")):
+            ivf = np.load(self._arquivo("ivf.npz"))
+            self.centroides, self.listas, self.offsets = ivf["centroides"], ivf["listas"], ivf["offsets"]
+
+    def salvar(self):
+        with self._lock:
+            self._consolidar()
+            os.makedirs(self.diretorio, exist_ok=True)
+            vetores = np.ascontiguousarray(self.vetores if self.vetores is not None else np.zeros((0, self.dim or 0), np.float32))
+            # Escreve em arquivo temporário e troca: quem estiver lendo o memmap antigo não quebra
+            tmp = self._arquivo("vetores.f32.tmp")
+            vetores.tofile(tmp)
+            os.replace(tmp, self._arquivo("vetores.f32"))
+            self._treinar_ivf(vetores)
+            with open(self._arquivo("meta.json.tmp"), "w", encoding="utf-8") as arquivo:
+                json.dump({"dim": self.dim, "itens": self.meta}, arquivo, ensure_ascii=False)
+            os.replace(self._arquivo("meta.json.tmp"), self._arquivo("meta.json"))
+            self.carregar()
+
+    def _treinar_ivf(self, vetores):
+        caminho = self._arquivo("ivf.npz")
+        if len(vetores) < self.LIMIAR_IVF:
+            if os.path.exists(caminho): os.remove(caminho)
+            return
+        nlist = int(np.sqrt(len(vetores)))
+        amostra = vetores[np.random.default_rng(0).choice(len(vetores), size=min(len(vetores), nlist * 64), replace=False)]
+        centroides = _kmeans(amostra, nlist)
+        rotulos = np.concatenate([np.argmax(vetores[i:i + self.BLOCO] @ centroides.T, axis=1) for i in range(0, len(vetores), self.BLOCO)])
+        listas = np.argsort(rotulos, kind="stable").astype(np.int64)
+        offsets = np.searchsorted(rotulos[listas], np.arange(nlist + 1)).astype(np.int64)
+        np.savez(caminho, centroides=centroides, listas=listas, offsets=offsets)
+
+    # Escrita (em memória até salvar)
+    def upsert(self, ids, vetores, metadados):
+        vetores = np.asarray(vetores, dtype=np.float32)
+        with self._lock:
+            if self.dim is None:
+                self.dim = vetores.shape[1]
+            if vetores.shape[1] != self.dim:
+                raise ValueError(f"Dimensão {vetores.shape[1]} diferente da do índice ({self.dim}). Troque RAG_DIR ou reingira.")
+            novas_linhas = []
+            for i, id_ in enumerate(ids):
+                meta = {**metadados[i], "id": id_}
+                if id_ in self._posicao:
+                    self._alteradas[self._posicao[id_]] = vetores[i]
+                    self.meta[self._posicao[id_]] = meta
+                else:
+                    self._posicao[id_] = len(self.ids)
+                    self.ids.append(id_)
+                    self.meta.append(meta)
+                    novas_linhas.append(i)
+            if novas_linhas:
+                self._pendentes.append(vetores[novas_linhas])
+            self.centroides = None  # IVF fica velho até o próximo salvar
+
+    def _consolidar(self):
+        """Junta numa cópia só a matriz atual (memmap), as linhas novas e as regravadas."""
+        if not self._pendentes and not self._alteradas:
+            return
+        partes = ([self.vetores] if self.vetores is not None else []) + self._pendentes
+        vetores = np.concatenate(partes) if partes else np.zeros((0, self.dim), np.float32)
+        for posicao, vetor in self._alteradas.items():
+            vetores[posicao] = vetor
+        self.vetores = vetores
+        self._pendentes, self._alteradas = [], {}
+
+    def remover(self, ids):
+        with self._lock:
+            self._consolidar()
+            remover = set(ids)
+            manter = [p for p, i in enumerate(self.ids) if i not in remover]
+            self.vetores = self.vetores[manter] if self.vetores is not None else None
+            self.ids = [self.ids[p] for p in manter]
+            self.meta = [self.meta[p] for p in manter]
+            self._posicao = {i: p for p, i in enumerate(self.ids)}
+            self.centroides = None
+
+    # Leitura
+    def __len__(self):
+        return len(self.ids)
+
+    def buscar(self, vetor, k=RAG_TOP_K):
+        with self._lock:
+            if not self.ids:
+                return []
+            self._consolidar()
+            vetores = self.vetores
+            if self.centroides is not None:
+                # IVF: só as listas dos centroides mais parecidos com a consulta
+                proximos = np.argsort(-(self.centroides @ vetor))[:self.nprobe]
+                candidatas = np.concatenate([self.listas[self.offsets[c]:self.offsets[c + 1]] for c in proximos])
+                candidatas.sort()  # acesso sequencial ao memmap
+                scores = vetores[candidatas] @ vetor
+                linhas = candidatas
+            else:
+                scores = np.concatenate([vetores[i:i + self.BLOCO] @ vetor for i in range(0, len(self.ids), self.BLOCO)])
+                linhas = np.arange(len(self.ids))
+            k = min(k, len(scores))
+            topo = np.argpartition(-scores, k - 1)[:k]
+            topo = topo[np.argsort(-scores[topo])]
+            return [(float(scores[t]), self.meta[linhas[t]]) for t in topo]
+
+
+# --- ÍNDICE PINECONE (OPCIONAL) ---
+class IndicePinecone:
+    def __init__(self, nome=None, namespace=None):
+        from pinecone import Pinecone
+        self.index = Pinecone(api_key=os.getenv("PINECONE_API_KEY")).Index(nome or os.getenv("PINECONE_INDEX", "resolve-ia"))
+        self.namespace = namespace or os.getenv("PINECONE_NAMESPACE", "cacd")
+
+    def upsert(self, ids, vetores, metadados, lote=100):
+        itens = [{"id": i, "values": v.tolist(), "metadata": m} for i, v, m in zip(ids, vetores, metadados)]
+        for inicio in range(0, len(itens), lote):
+            self.index.upsert(vectors=itens[inicio:inicio + lote], namespace=self.namespace)
+
+    def remover(self, ids):
+        if ids:
+            self.index.delete(ids=list(ids), namespace=self.namespace)
+
+    def salvar(self):
+        pass  # Pinecone persiste sozinho
+
+    def __len__(self):
+        return self.index.describe_index_stats().get("total_vector_count", 0)
+
+    def buscar(self, vetor, k=RAG_TOP_K):
+        resposta = self.index.query(vector=vetor.tolist(), top_k=k, include_metadata=True, namespace=self.namespace)
+        return [(m["score"], {**m.get("metadata", {}), "id": m["id"]}) for m in resposta["matches"]]
+
+
+def criar_indice(nome=None):
+    nome = nome or os.getenv("RAG_INDICE", "local")
+    return IndicePinecone() if nome == "pinecone" else IndiceLocal()
+
+
+# --- FATIAMENTO E EXTRAÇÃO ---
+def criar_fatiador(tamanho=None, sobreposicao=None):
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter(
+        chunk_size=tamanho or int(os.getenv("RAG_CHUNK", "1000")),
+        chunk_overlap=int(os.getenv("RAG_CHUNK_OVERLAP", "150")) if sobreposicao is None else sobreposicao,
+        separators=["\n\n", "\n", ". ", " ", ""],
+    )
+
+
+def extrair_paginas_pdf(caminho):
+    import pymupdf  # PyMuPDF
+    with pymupdf.open(caminho) as documento:
+        for numero, pagina in enumerate(documento, start=1):
+            texto = pagina.get_text("text").strip()
+            if texto:
+                yield numero, texto
+
+
+# --- MOTOR ---
+class MotorRAG:
+    def __init__(self, embedder=None, indice=None):
+        self.embedder = embedder if embedder is not None else criar_embedder()
+        # Índice vazio tem len 0: "indice or ..." trocaria o índice recebido pelo padrão
+        self.indice = indice if indice is not None else criar_indice()
+
+    def buscar(self, query, k=RAG_TOP_K, score_minimo=RAG_SCORE_MINIMO):
+        if not query or not len(self.indice):
+            return []
+        resultados = self.indice.buscar(self.embedder.embed_consulta(query), k)
+        return [(score, meta) for score, meta in resultados if score >= score_minimo]
+
+    @staticmethod
+    def formatar(resultados):
+        if not resultados:
+            return ""
+        trechos = [f"({meta.get('fonte', '?')}, p. {meta.get('pagina', '?')}) {meta.get('texto', '')}" for _, meta in resultados]
+        return "[CONTEXTO BIBLIOGRÁFICO]\n" + "\n---\n".join(trechos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_buscar = sub.add_parser("buscar", help="Consulta o índice")
+    p_buscar.add_argument("query")
+    p_buscar.add_argument("-k", type=int, default=RAG_TOP_K)
+    args = parser.parse_args()
+
+    motor = MotorRAG()
+    if args.comando == "buscar":
+        inicio = time.perf_counter()
+        resultados = motor.buscar(args.query, args.k, score_minimo=0)
+        print(f"🔍 {len(resultados)} resultados em {(time.perf_counter() - inicio) * 1000:.1f}ms")
+        for score, meta in resultados:
+            print(f"[{score:.3f}] {meta.get('fonte')} p.{meta.get('pagina')}: {meta.get('texto', '')[:160]}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+import os
+import re
+import time
+import threading
+from collections import deque
+
+from despacho import percentil
+
+# --- CIRCUIT BREAKER POR PROVEDOR ---
+FECHADO = "fechado"          # saudável: recebe tráfego normalmente
+ABERTO = "aberto"            # doente: pulado até o tempo de espera acabar
+MEIO_ABERTO = "meio-aberto"  # em teste: libera uma única chamada de sondagem
+
+JANELA_PADRAO = int(os.getenv("CB_JANELA", "20"))
+TAXA_ERRO_MAXIMA = float(os.getenv("CB_TAXA_ERRO", "0.5"))
+AMOSTRAS_MINIMAS = int(os.getenv("CB_AMOSTRAS_MINIMAS", "4"))
+FALHAS_SEGUIDAS_MAXIMAS = int(os.getenv("CB_FALHAS_SEGUIDAS", "3"))
+TEMPO_ABERTO_PADRAO = float(os.getenv("CB_TEMPO_ABERTO", "30"))
+TEMPO_ABERTO_MAXIMO = float(os.getenv("CB_TEMPO_ABERTO_MAX", "300"))
+# Lentidão: p95 (na mesma fase) FATOR vezes pior que o do próximo da fila vai para o fim
+FATOR_P95_LENTO = float(os.getenv("CB_FATOR_P95", "2"))
+
+
+def _segundos_reset(valor):
+    """Converte '2m59.5s', '850ms' ou '12' (formatos do Groq) em segundos."""
+    if valor is None:
+        return None
+    valor = str(valor).strip()
+    try:
+        return float(valor)
+    except ValueError:
+        pass
+    total, achou = 0.0, False
+    for numero, unidade in re.findall(r"([\d.]+)(ms|h|m|s)", valor):
+        achou = True
+        total += float(numero) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unidade]
+    return total if achou else None
+
+
+def extrair_retry_after(erro):
+    """Lê o retry-after de um 429 (Groq/httpx expõem os headers em erro.response)."""
+    resposta = getattr(erro, "response", None)
+    headers = getattr(resposta, "headers", None)
+    if not headers:
+        return None
+    for chave in ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        segundos = _segundos_reset(headers.get(chave))
+        if segundos is not None:
+            return segundos
+    return None
+
+
+def eh_rate_limit(erro):
+    status = getattr(erro, "status_code", None) or getattr(getattr(erro, "response", None), "status_code", None)
+    return status == 429 or "429" in str(erro) or "ResourceExhausted" in type(erro).__name__
+
+
+class CircuitBreaker:
+    def __init__(self, nome, janela=JANELA_PADRAO):
+        self.nome = nome
+        self.estado = FECHADO
+        self.resultados = deque(maxlen=janela)   # True = sucesso, False = falha
+        self.latencias = deque(maxlen=janela)
+        self.falhas_seguidas = 0
+        self.aberturas = 0
+        self.reabre_em = 0.0
+        self.sondagem_em_voo = False
+        self.ultimo_erro = None
+        self._lock = threading.Lock()
+
+    def _abrir(self, espera=None):
+        self.aberturas += 1
+        if espera is None:
+            # Backoff exponencial a cada reabertura seguida
+            espera = min(TEMPO_ABERTO_MAXIMO, TEMPO_ABERTO_PADRAO * 2 ** max(0, self.aberturas - 1))
+        self.estado = ABERTO
+        self.reabre_em = time.monotonic() + espera
+        self.sondagem_em_voo = False
+        print(f"🔌 Circuito {self.nome} ABERTO por {espera:.0f}s ({self.ultimo_erro})")
+
+    def _atualizar(self):
+        if self.estado == ABERTO and time.monotonic() >= self.reabre_em:
+            self.estado = MEIO_ABERTO
+            self.sondagem_em_voo = False
+
+    def permitir(self):
+        """Reserva a chamada. No meio-aberto só uma sondagem passa por vez."""
+        with self._lock:
+            self._atualizar()
+            if self.estado == FECHADO:
+                return True
+            if self.estado == MEIO_ABERTO and not self.sondagem_em_voo:
+                self.sondagem_em_voo = True
+                return True
+            return False
+
+    def sucesso(self, latencia=None):
+        with self._lock:
+            self.resultados.append(True)
+            if latencia is not None:
+                self.latencias.append(latencia)
+            self.falhas_seguidas = 0
+            if self.estado != FECHADO:
+                print(f"🔌 Circuito {self.nome} FECHADO (sondagem ok)")
+            self.estado = FECHADO
+            self.aberturas = 0
+            self.sondagem_em_voo = False
+
+    def falha(self, erro=None):
+        with self._lock:
+            self.resultados.append(False)
+            self.falhas_seguidas += 1
+            self.ultimo_erro = str(erro)[:120] if erro else "resposta vazia"
+            if eh_rate_limit(erro):
+                # 429: respeita o que o provedor mandou esperar
+                self._abrir(extrair_retry_after(erro) or TEMPO_ABERTO_PADRAO)
+                return
+            if self.estado == MEIO_ABERTO:
+                self._abrir()
+                return
+            falhas = self.resultados.count(False)
+            estourou_taxa = len(self.resultados) >= AMOSTRAS_MINIMAS and falhas / len(self.resultados) >= TAXA_ERRO_MAXIMA
+            if self.estado == FECHADO and (estourou_taxa or self.falhas_seguidas >= FALHAS_SEGUIDAS_MAXIMAS):
+                self._abrir()
+
+    def liberar(self):
+        """Devolve a reserva sem registrar resultado (ex.: chamada cancelada na corrida)."""
+        with self._lock:
+            self.sondagem_em_voo = False
+
+    def resumo(self):
+        with self._lock:
+            self._atualizar()
+            total = len(self.resultados)
+            return {
+                "estado": self.estado,
+                "taxa_erro": round(self.resultados.count(False) / total, 2) if total else 0.0,
+                "p50": percentil(list(self.latencias), 50),
+                "p95": percentil(list(self.latencias), 95),
+                "reabre_em": max(0.0, round(self.reabre_em - time.monotonic(), 1)) if self.estado == ABERTO else 0.0,
+                "ultimo_erro": self.ultimo_erro,
+            }
+
+
+class MonitorSaude:
+    """Um circuit breaker por provedor; decide a ordem de tentativa do processar."""
+    def __init__(self, nomes):
+        self.breakers = {nome: CircuitBreaker(nome) for nome in nomes}
+
+    def permitir(self, nome):
+        return self.breakers[nome].permitir()
+
+    def sucesso(self, nome, latencia=None):
+        self.breakers[nome].sucesso(latencia)
+
+    def falha(self, nome, erro=None):
+        self.breakers[nome].falha(erro)
+
+    def liberar(self, nome):
+        self.breakers[nome].liberar()
+
+    def disponivel(self, nome):
+        return self.breakers[nome].resumo()["estado"] != ABERTO
+
+    def ordenar(self, candidatos, fase=None, historico=None):
+        """
+        Mantém a prioridade escolhida e tira da tentativa quem está com circuito aberto
+        (não paga timeout). Meio-aberto fica no lugar para receber a sondagem.
+        Com o historico (HistoricoLatencia do despacho, por provedor e fase, TTFB nos streams),
+        fechado mas lento (p95 FATOR_P95_LENTO vezes o do próximo, na mesma fase)
+        continua na lista, só que depois dos rápidos.
+        Retorna (ordenados, erros dos abertos).
+        """
+        resumos = {c[0]: self.breakers[c[0]].resumo() for c in candidatos}
+        vivos = [c for c in candidatos if resumos[c[0]]["estado"] != ABERTO]
+        abertos = [f"{c[0]}: circuito aberto (reabre em {resumos[c[0]]['reabre_em']:.0f}s)"
+                   for c in candidatos if resumos[c[0]]["estado"] == ABERTO]
+
+        p95 = {c[0]: historico.p95(c[0], fase) if historico else None for c in vivos}
+        rapidos, lentos = [], []
+        for i, c in enumerate(vivos):
+            atual = p95[c[0]]
+            proximo = next((p95[d[0]] for d in vivos[i + 1:] if p95[d[0]] is not None), None)
+            lento = (resumos[c[0]]["estado"] == FECHADO and atual is not None and proximo is not None
+                     and atual > FATOR_P95_LENTO * proximo)
+            (lentos if lento else rapidos).append(c)
+        return rapidos + lentos, abertos
+
+    def resumo(self):
+        return {nome: cb.resumo() for nome, cb in self.breakers.items()}
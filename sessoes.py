@@ -0,0 +1,204 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# --- SESSÕES POR CHAT DO TELEGRAM ---
+MAX_SESSOES = int(os.getenv("SESSOES_MAX", "500"))
+TTL_OCIOSA = float(os.getenv("SESSOES_TTL_HORAS", "12")) * 3600
+SESSOES_DB = os.getenv("SESSOES_DB", os.path.join(os.getenv("CACHE_DIR", ".cache"), "sessoes.sqlite3"))
+
+
+class Sessao:
+    """
+    Estado de um chat. fase/prioridade/politica = None significa "seguir o padrão do admin";
+    o aluno só sobrescreve quando usa os comandos do bot.
+    Com a memória de textos (apoio.py), texto_apoio guarda só o começo do texto (para o painel)
+    e apoio a chave do texto preparado; sessões antigas têm o texto inteiro e apoio = None.
+    versao é a da linha no SQLite de onde esta cópia veio (0 = ainda não gravada).
+    """
+    CAMPOS = ("chat_id", "usuario", "fase", "prioridade", "politica", "texto_apoio", "apoio", "itens", "criada", "ultimo_uso")
+
+    def __init__(self, chat_id, usuario=None):
+        self.chat_id = chat_id
+        self.usuario = usuario
+        self.fase = None
+        self.prioridade = None
+        self.politica = None
+        self.texto_apoio = None
+        self.apoio = None
+        self.itens = 0
+        self.criada = time.time()
+        self.ultimo_uso = self.criada
+        self.versao = 0
+
+    def to_dict(self):
+        return {campo: getattr(self, campo) for campo in self.CAMPOS}
+
+    @classmethod
+    def from_dict(cls, dados):
+        sessao = cls(dados["chat_id"])
+        for campo in cls.CAMPOS:
+            if campo in dados:
+                setattr(sessao, campo, dados[campo])
+        return sessao
+
+
+class GerenciadorSessoes:
+    """
+    LRU em memória com expulsão de sessões ociosas, opcionalmente persistida em SQLite
+    (write-through) para que um restart não perca o Texto de Apoio de ninguém.
+    Com vários workers no mesmo arquivo, cada linha tem uma versão: obter() relê a sessão
+    quando outro processo a alterou e salvar() só grava por cima da versão que leu.
+    """
+    def __init__(self, max_sessoes=MAX_SESSOES, ttl=TTL_OCIOSA, caminho=None, persistir=None):
+        self.max_sessoes = max_sessoes
+        self.ttl = ttl
+        self._sessoes = OrderedDict()
+        self._lock = threading.RLock()
+        self._conn = None
+        self._ultima_limpeza = 0.0
+        persistir = os.getenv("SESSOES_PERSISTIR", "1") == "1" if persistir is None else persistir
+        if persistir:
+            try:
+                caminho = caminho or SESSOES_DB
+                os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+                self._conn = sqlite3.connect(caminho, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("CREATE TABLE IF NOT EXISTS sessoes (chat_id INTEGER PRIMARY KEY, dados TEXT, ultimo_uso REAL, versao INTEGER DEFAULT 1)")
+                colunas = [c[1] for c in self._conn.execute("PRAGMA table_info(sessoes)")]
+                if "versao" not in colunas:
+                    self._conn.execute("ALTER TABLE sessoes ADD COLUMN versao INTEGER DEFAULT 1")
+                self._conn.commit()
+            except Exception as e:
+                print(f"⚠️ Sessões sem persistência: {e}")
+                self._conn = None
+
+    def obter(self, chat_id, usuario=None):
+        with self._lock:
+            sessao = self._sessoes.get(chat_id)
+            if sessao is None or self._desatualizada(sessao):
+                sessao = self._carregar(chat_id) or Sessao(chat_id, usuario)
+                self._sessoes[chat_id] = sessao
+            self._sessoes.move_to_end(chat_id)
+            sessao.ultimo_uso = time.time()
+            if usuario: sessao.usuario = usuario
+            self._expulsar()
+            return sessao
+
+    def salvar(self, sessao):
+        """
+        Grava só se a linha ainda está na versão que esta cópia leu. False = outro worker
+        alterou ou o admin encerrou a sessão no meio do caminho (a cópia sai da memória).
+        """
+        if not self._conn:
+            return True
+        dados = json.dumps(sessao.to_dict(), ensure_ascii=False)
+        with self._lock:
+            if sessao.versao:
+                cursor = self._conn.execute(
+                    "UPDATE sessoes SET dados = ?, ultimo_uso = ?, versao = versao + 1 WHERE chat_id = ? AND versao = ?",
+                    (dados, sessao.ultimo_uso, sessao.chat_id, sessao.versao),
+                )
+            else:
+                cursor = self._conn.execute(
+                    "INSERT INTO sessoes (chat_id, dados, ultimo_uso, versao) VALUES (?, ?, ?, 1) ON CONFLICT (chat_id) DO NOTHING",
+                    (sessao.chat_id, dados, sessao.ultimo_uso),
+                )
+            self._conn.commit()
+            if not cursor.rowcount:
+                if self._sessoes.get(sessao.chat_id) is sessao:
+                    del self._sessoes[sessao.chat_id]
+                return False
+            sessao.versao += 1
+            return True
+
+    def atualizar(self, chat_id, **campos):
+        """Altera campos de uma sessão (inclusive a partir do admin) e persiste."""
+        with self._lock:
+            for _ in range(3):
+                sessao = self.obter(chat_id)
+                for campo, valor in campos.items():
+                    setattr(sessao, campo, valor)
+                if self.salvar(sessao):
+                    break
+            return sessao
+
+    def contar_item(self, sessao):
+        """
+        Soma um item respondido ao fim do pedido. Se outro worker mexeu na sessão enquanto isso,
+        soma na versão dele; se o admin a encerrou, não a ressuscita (retorna False).
+        """
+        with self._lock:
+            for _ in range(3):
+                sessao.itens += 1
+                if self.salvar(sessao):
+                    return True
+                sessao = self._carregar(sessao.chat_id)
+                if sessao is None:
+                    return False
+                self._sessoes[sessao.chat_id] = sessao
+            return False
+
+    def remover(self, chat_id):
+        with self._lock:
+            self._sessoes.pop(chat_id, None)
+            if self._conn:
+                self._conn.execute("DELETE FROM sessoes WHERE chat_id = ?", (chat_id,))
+                self._conn.commit()
+
+    def _carregar(self, chat_id):
+        if not self._conn:
+            return None
+        linha = self._conn.execute("SELECT dados, ultimo_uso, versao FROM sessoes WHERE chat_id = ?", (chat_id,)).fetchone()
+        if not linha:
+            return None
+        if self.ttl and time.time() - linha[1] > self.ttl:
+            # Vencida: começa do zero, mas herda a versão para poder gravar por cima da linha velha
+            sessao = Sessao(chat_id)
+        else:
+            sessao = Sessao.from_dict(json.loads(linha[0]))
+        sessao.versao = linha[2] or 1
+        return sessao
+
+    def _desatualizada(self, sessao):
+        """A cópia em memória ficou para trás de outro worker (ou a linha sumiu: sessão encerrada)."""
+        if not self._conn:
+            return False
+        linha = self._conn.execute("SELECT versao FROM sessoes WHERE chat_id = ?", (sessao.chat_id,)).fetchone()
+        return (linha[0] if linha else 0) != sessao.versao
+
+    def _expulsar(self):
+        # Ociosas saem da memória (continuam no disco até vencer o TTL); depois, limite de tamanho
+        limite = time.time() - self.ttl if self.ttl else None
+        while self._sessoes:
+            chat_id, sessao = next(iter(self._sessoes.items()))
+            if len(self._sessoes) > self.max_sessoes or (limite and sessao.ultimo_uso < limite):
+                self._sessoes.popitem(last=False)
+            else:
+                break
+        if self._conn and limite and time.time() - self._ultima_limpeza > 60:
+            self._ultima_limpeza = time.time()
+            self._conn.execute("DELETE FROM sessoes WHERE ultimo_uso < ?", (limite,))
+            self._conn.commit()
+
+    def listar(self):
+        with self._lock:
+            self._expulsar()
+            return [s.to_dict() for s in reversed(self._sessoes.values())]
+
+    def listar_persistidas(self, limite=200):
+        """Sessões gravadas em disco por qualquer processo (o painel não tem as sessões em memória)."""
+        if not self._conn:
+            return self.listar()
+        corte = time.time() - self.ttl if self.ttl else 0
+        with self._lock:
+            linhas = self._conn.execute(
+                "SELECT dados FROM sessoes WHERE ultimo_uso >= ? ORDER BY ultimo_uso DESC LIMIT ?", (corte, limite)
+            ).fetchall()
+        return [json.loads(dados) for (dados,) in linhas]
+
+    def __len__(self):
+        return len(self._sessoes)
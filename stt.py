@@ -0,0 +1,231 @@
+import os
+import wave
+import time
+import asyncio
+import threading
+from bisect import bisect_right
+
+import numpy as np
+
+from pipeline import rodar_em_thread
+
+# --- RECONHECIMENTO DE FALA (STT) ---
+# google  = SpeechRecognition + API do Google (uma ida à rede por nota)
+# whisper = faster-whisper local na CPU, carregado uma vez e mantido aquecido
+STT_BACKEND = os.getenv("STT_BACKEND", "google").lower()
+TAXA_AMOSTRAGEM = 16000
+
+WHISPER_MODELO = os.getenv("WHISPER_MODELO", "small")
+WHISPER_COMPUTE = os.getenv("WHISPER_COMPUTE", "int8")
+WHISPER_THREADS = int(os.getenv("WHISPER_THREADS", "0"))  # 0 = o CTranslate2 decide
+WHISPER_BEAM = int(os.getenv("WHISPER_BEAM", "1"))
+
+# Micro-lote: notas que chegam dentro da janela são decodificadas juntas
+LOTE_MAX = int(os.getenv("STT_LOTE_MAX", "8"))
+JANELA_LOTE = float(os.getenv("STT_JANELA_LOTE", "0.05"))
+
+TRECHO_MAX_S = 30  # Janela nativa do Whisper
+
+
+def ler_pcm_wav(caminho):
+    """Lê um WAV mono 16 bits e devolve (pcm, taxa)."""
+    with wave.open(caminho, "rb") as arquivo:
+        return arquivo.readframes(arquivo.getnframes()), arquivo.getframerate()
+
+
+def duracao_pcm(pcm, taxa=TAXA_AMOSTRAGEM):
+    return len(pcm) / 2 / taxa
+
+
+class BackendSTT:
+    """Interface comum: PCM 16 bits mono -> texto. Backends com suporta_lote decodificam várias notas de uma vez."""
+    nome = "base"
+    suporta_lote = False
+
+    def transcrever(self, pcm, taxa=TAXA_AMOSTRAGEM):
+        raise NotImplementedError
+
+    def transcrever_lote(self, pcms, taxa=TAXA_AMOSTRAGEM):
+        return [self.transcrever(pcm, taxa) for pcm in pcms]
+
+
+class GoogleSTT(BackendSTT):
+    nome = "google"
+
+    def __init__(self, idioma="pt-BR"):
+        import speech_recognition as sr
+        self._sr = sr
+        self.idioma = idioma
+        # STT_GOOGLE_URL troca o endpoint (ex.: servidor falso dos benchmarks)
+        self.endpoint = os.getenv("STT_GOOGLE_URL")
+        # Um único Recognizer para o processo (antes era um por mensagem)
+        self.recognizer = sr.Recognizer()
+
+    def transcrever(self, pcm, taxa=TAXA_AMOSTRAGEM):
+        audio = self._sr.AudioData(pcm, taxa, 2)
+        if self.endpoint:
+            return self.recognizer.recognize_google(audio, language=self.idioma, endpoint=self.endpoint)
+        return self.recognizer.recognize_google(audio, language=self.idioma)
+
+
+class WhisperLocal(BackendSTT):
+    """
+    faster-whisper (CTranslate2, int8) rodando na CPU. O modelo é carregado no construtor
+    e aquecido com um segundo de silêncio, então a primeira nota real não paga o warm-up.
+    """
+    nome = "whisper"
+    suporta_lote = True
+
+    def __init__(self, modelo=None, compute_type=None, threads=None, idioma="pt"):
+        from faster_whisper import WhisperModel, BatchedInferencePipeline
+        inicio = time.perf_counter()
+        self.modelo = WhisperModel(
+            modelo or WHISPER_MODELO,
+            device="cpu",
+            compute_type=compute_type or WHISPER_COMPUTE,
+            cpu_threads=WHISPER_THREADS if threads is None else threads,
+        )
+        self.lote = BatchedInferencePipeline(model=self.modelo)
+        self.idioma = idioma
+        # O CTranslate2 não gosta de dois generate() concorrentes no mesmo modelo
+        self._lock = threading.Lock()
+        self.transcrever(b"\x00\x00" * TAXA_AMOSTRAGEM)
+        print(f"🎙️ Whisper '{modelo or WHISPER_MODELO}' pronto em {time.perf_counter() - inicio:.1f}s")
+
+    @staticmethod
+    def _float32(pcm):
+        return np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+
+    def transcrever(self, pcm, taxa=TAXA_AMOSTRAGEM):
+        if taxa != TAXA_AMOSTRAGEM:
+            raise ValueError(f"Whisper espera {TAXA_AMOSTRAGEM} Hz (recebeu {taxa})")
+        with self._lock:
+            segmentos, _ = self.modelo.transcribe(
+                self._float32(pcm), language=self.idioma, beam_size=WHISPER_BEAM, vad_filter=True
+            )
+            return " ".join(s.text.strip() for s in segmentos).strip()
+
+    def transcrever_lote(self, pcms, taxa=TAXA_AMOSTRAGEM):
+        """
+        Concatena as notas e passa os limites de cada uma (em trechos de até 30s) como
+        clip_timestamps: o encoder/decoder roda todos os trechos no mesmo batch.
+        """
+        if len(pcms) == 1:
+            return [self.transcrever(pcms[0], taxa)]
+        if taxa != TAXA_AMOSTRAGEM:
+            raise ValueError(f"Whisper espera {TAXA_AMOSTRAGEM} Hz (recebeu {taxa})")
+
+        audios = [self._float32(pcm) for pcm in pcms]
+        clips, inicios, cursor = [], [], 0
+        for audio in audios:
+            inicios.append(cursor / taxa)
+            for inicio in range(0, max(len(audio), 1), TRECHO_MAX_S * taxa):
+                fim = min(inicio + TRECHO_MAX_S * taxa, len(audio))
+                if fim > inicio:
+                    clips.append({"start": (cursor + inicio) / taxa, "end": (cursor + fim) / taxa})
+            cursor += len(audio)
+        textos = [[] for _ in audios]
+        if not clips:
+            return ["" for _ in audios]
+
+        with self._lock:
+            segmentos, _ = self.lote.transcribe(
+                np.concatenate(audios), language=self.idioma, beam_size=WHISPER_BEAM,
+                clip_timestamps=clips, batch_size=min(len(clips), LOTE_MAX), without_timestamps=True,
+            )
+            for segmento in segmentos:
+                # seek = início do trecho em frames de 10ms: diz de qual nota o segmento veio
+                nota = bisect_right(inicios, segmento.seek / 100 + 1e-3) - 1
+                textos[nota].append(segmento.text.strip())
+        return [" ".join(t).strip() for t in textos]
+
+
+def criar_backend_stt(nome=None):
+    nome = (nome or STT_BACKEND).lower()
+    if nome == "whisper":
+        try:
+            return WhisperLocal()
+        except ImportError as e:
+            print(f"⚠️ STT_BACKEND=whisper, mas o faster-whisper não está instalado ({e}); "
+                  f"usando o Google. Instale com: pip install 'faster-whisper>=1.1'")
+        except Exception as e:
+            print(f"⚠️ STT_BACKEND=whisper, mas o Whisper local não carregou ({type(e).__name__}: {e}); usando o Google")
+    return GoogleSTT()
+
+
+# --- AGREGADOR DE LOTE (VÁRIAS NOTAS AO MESMO TEMPO) ---
+class AgregadorLote:
+    """
+    Junta as notas que chegam dentro de uma janela curta e manda todas de uma vez para o
+    backend (no pool "stt"). Backends sem lote só passam direto.
+    """
+    def __init__(self, backend=None, janela=None, max_lote=None, fabrica=criar_backend_stt):
+        # Sem backend: criado no primeiro uso (ou pelo aquecimento), fora do event loop
+        self.backend = backend
+        self._fabrica = fabrica
+        self._lock = threading.Lock()
+        self.janela = JANELA_LOTE if janela is None else janela
+        self.max_lote = max_lote or LOTE_MAX
+        self._pendentes = []
+        self._disparo = None
+        self.lotes = 0
+        self.notas = 0
+
+    @property
+    def nome(self):
+        return self.backend.nome if self.backend else STT_BACKEND
+
+    def carregar(self):
+        """Cria o backend (modelo Whisper, Recognizer) uma vez só. Bloqueante."""
+        if self.backend is None:
+            with self._lock:
+                if self.backend is None:
+                    self.backend = self._fabrica()
+        return self.backend
+
+    async def transcrever(self, pcm, taxa=TAXA_AMOSTRAGEM):
+        if self.backend is None:
+            await rodar_em_thread("stt", self.carregar)
+        if not self.backend.suporta_lote:
+            self.lotes += 1
+            self.notas += 1
+            return await rodar_em_thread("stt", self.backend.transcrever, pcm, taxa)
+        futuro = asyncio.get_running_loop().create_future()
+        self._pendentes.append((pcm, taxa, futuro))
+        if len(self._pendentes) >= self.max_lote:
+            self._descarregar()
+        elif self._disparo is None:
+            self._disparo = asyncio.get_running_loop().call_later(self.janela, self._descarregar)
+        return await futuro
+
+    def _descarregar(self):
+        if self._disparo:
+            self._disparo.cancel()
+            self._disparo = None
+        lote, self._pendentes = self._pendentes, []
+        if lote:
+            asyncio.ensure_future(self._executar(lote))
+
+    async def _executar(self, lote):
+        # Taxas diferentes não vão juntas no mesmo batch
+        por_taxa = {}
+        for item in lote:
+            por_taxa.setdefault(item[1], []).append(item)
+        for taxa, itens in por_taxa.items():
+            try:
+                textos = await rodar_em_thread("stt", self.backend.transcrever_lote, [i[0] for i in itens], taxa)
+                self.lotes += 1
+                self.notas += len(itens)
+                for (_, _, futuro), texto in zip(itens, textos):
+                    if not futuro.done(): futuro.set_result(texto)
+            except Exception as e:
+                for _, _, futuro in itens:
+                    if not futuro.done(): futuro.set_exception(e)
+
+    def resumo(self):
+        return {
+            "backend": self.nome,
+            "lotes": self.lotes,
+            "notas": self.notas,
+            "media_lote": round(self.notas / self.lotes, 2) if self.lotes else 0.0,
+        }
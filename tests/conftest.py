@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+# Caches, sessões e índice RAG dos testes em uma pasta temporária, antes de qualquer módulo ler o ambiente
+_PASTA = tempfile.mkdtemp(prefix="resolveia-teste-")
+os.environ.setdefault("CACHE_DIR", _PASTA)
+os.environ.setdefault("RAG_DIR", os.path.join(_PASTA, "rag"))
@@ -0,0 +1,42 @@
+import time
+
+from agendador import Agendador, FilaEsgotada
+from despacho import HistoricoLatencia, RegistroDespacho, despachar
+from saude import FECHADO, MonitorSaude
+
+
+def _na_fila(agendador, nome):
+    """Função de despacho que espera a cota do agendador como o _agendado do bot."""
+    def chamada(prompt, cancelado=None):
+        agendador.aguardar(nome, None, 10, cancelado=cancelado)
+        return f"{nome}: ok"
+    return chamada
+
+
+def test_fila_esgotada_nao_abre_o_circuito():
+    agendador = Agendador(espera_maxima=0.01)
+    agendador._cota("groq", None).requisicoes.nivel = 0   # cota zerada: todo pedido estoura a espera
+    saude = MonitorSaude(["groq"])
+    for _ in range(5):
+        resposta, _, erros = despachar([("groq", _na_fila(agendador, "groq"), "Groq")], "p", "sequencial", "1",
+                                       HistoricoLatencia(), RegistroDespacho(), saude)
+        assert resposta is None and "cota sem vaga" in erros[0]
+    assert saude.resumo()["groq"]["estado"] == FECHADO
+    assert saude.resumo()["groq"]["taxa_erro"] == 0.0
+
+
+def test_perdedor_da_corrida_sai_da_fila_sem_gastar_cota():
+    agendador = Agendador(espera_maxima=30)
+    agendador._cota("gemini", None).requisicoes.nivel = 0
+    inicio = time.monotonic()
+    resposta, label, _ = despachar(
+        [("groq", _na_fila(agendador, "groq"), "Groq"), ("gemini", _na_fila(agendador, "gemini"), "Gemini")],
+        "p", "corrida", "1", HistoricoLatencia(), RegistroDespacho(), MonitorSaude(["groq", "gemini"]),
+    )
+    assert (resposta, label) == ("groq: ok", "Groq")
+    prazo = time.monotonic() + 2
+    while agendador.resumo()["gemini"]["fila"] and time.monotonic() < prazo:
+        time.sleep(0.02)
+    assert agendador.resumo()["gemini"]["fila"] == 0
+    assert agendador.resumo()["gemini"]["atendidos"] == 0
+    assert time.monotonic() - inicio < 2
@@ -0,0 +1,21 @@
+from entidades import extrair_entidades
+
+
+def _superficies(texto):
+    return {e.superficie: e.tipo for e in extrair_entidades(texto)}
+
+
+def test_nomes_ligados_por_e_ficam_separados():
+    assert _superficies("O Mercosul aproximou Brasil e Argentina.") == {
+        "Mercosul": "sigla", "Brasil": "nome", "Argentina": "nome"}
+
+
+def test_nomes_antes_de_evento_nao_engolem_o_evento():
+    entidades = _superficies("A disputa entre Portugal e Espanha no Tratado de Tordesilhas.")
+    assert entidades["Tratado de Tordesilhas"] == "evento"
+    assert {"Portugal", "Espanha"} <= set(entidades)
+    assert not any(" e " in s or " no " in s for s in entidades)
+
+
+def test_de_da_do_continuam_ligando_o_nome():
+    assert "Barão do Rio Branco" in _superficies("A atuação do Barão do Rio Branco no Acre.")
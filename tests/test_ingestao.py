@@ -0,0 +1,40 @@
+import os
+
+import pymupdf
+
+from ingestao import Ingestor, Manifesto
+from rag import EmbedderHash, IndiceLocal, MotorRAG
+
+TEXTO = "O Tratado de Tordesilhas dividiu as terras descobertas entre Portugal e Espanha em 1494."
+
+
+def _pdf(caminho, texto):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    documento = pymupdf.open()
+    documento.new_page().insert_text((72, 72), texto)
+    documento.save(caminho)
+
+
+def _ingestor(tmp_path):
+    motor = MotorRAG(embedder=EmbedderHash(dim=64), indice=IndiceLocal(str(tmp_path / "indice")))
+    return Ingestor(motor, Manifesto(str(tmp_path / "manifesto.sqlite3")), processos=1)
+
+
+def test_arquivos_com_mesmo_nome_em_pastas_diferentes_nao_dividem_trechos(tmp_path):
+    corpus = tmp_path / "corpus"
+    _pdf(str(corpus / "a" / "edital.pdf"), TEXTO)
+    _pdf(str(corpus / "b" / "edital.pdf"), TEXTO)
+    ingestor = _ingestor(tmp_path)
+    ingestor.executar([str(corpus)])
+    a, b = (os.path.abspath(corpus / pasta / "edital.pdf") for pasta in ("a", "b"))
+    assert ingestor.manifesto.trechos(a) and ingestor.manifesto.trechos(b)
+    assert not ingestor.manifesto.trechos(a) & ingestor.manifesto.trechos(b)
+    assert len(ingestor.motor.indice) == 2
+
+    # Some um dos dois: a poda leva só os vetores dele, o outro continua buscável
+    os.remove(b)
+    ingestor = _ingestor(tmp_path)
+    ingestor.executar([str(corpus)])
+    assert len(ingestor.motor.indice) == 1
+    assert ingestor.manifesto.trechos(a)
+    assert ingestor.motor.buscar("Tratado de Tordesilhas", score_minimo=0)
@@ -0,0 +1,42 @@
+from agendador import PRIORIDADE_LOTE, PRIORIDADES
+from bot import ResolveIaBlindado
+from lote import avaliar_lote
+
+
+def _ia_de_teste():
+    """Bot com provedores falsos que anota a prioridade de cada pedido na fila do agendador."""
+    ia = ResolveIaBlindado()
+    prioridades = []
+    aguardar = ia.agendador.aguardar
+
+    def anotar(provedor, modelo, tokens, prioridade, cancelado=None):
+        prioridades.append(prioridade)
+        return aguardar(provedor, modelo, tokens, prioridade, cancelado)
+
+    ia.agendador.aguardar = anotar
+    ia.coletar_contexto = lambda query: ""
+    # Sem a lista "vereditos": o lote da Fase 1 cai no fallback um a um
+    ia._chamar_groq_json = ia._chamar_gemini_json = lambda prompt: "CERTO"
+    ia._chamar_groq = ia._chamar_gemini = lambda prompt: "Resposta dissertativa."
+    return ia, prioridades
+
+
+def _itens(n):
+    return [{"id": str(i), "item": f"Item {i} do teste.", "texto_apoio": None, "gabarito": None} for i in range(n)]
+
+
+def test_lote_fase1_com_fallback_fica_atras_do_bot_ao_vivo():
+    ia, prioridades = _ia_de_teste()
+    resultados = avaliar_lote(ia, _itens(3), fase="1", sem_cache=True)
+    assert [r["veredito"] for r in resultados] == ["CERTO"] * 3
+    # Um pedido do lote + um por item no fallback, todos na prioridade de lote
+    assert len(prioridades) == 4
+    assert set(prioridades) == {PRIORIDADE_LOTE}
+    assert PRIORIDADE_LOTE > max(PRIORIDADES["1-rapida"], PRIORIDADES["2"])
+
+
+def test_lote_fase2_fica_atras_do_bot_ao_vivo():
+    ia, prioridades = _ia_de_teste()
+    resultados = avaliar_lote(ia, _itens(2), fase="2", sem_cache=True)
+    assert [r["resposta"] for r in resultados] == ["Resposta dissertativa."] * 2
+    assert prioridades == [PRIORIDADE_LOTE] * 2
@@ -0,0 +1,24 @@
+from normalizador import normalizar_transcricao
+
+
+def test_item_ditado_no_comeco():
+    assert normalizar_transcricao("e tem 3 a onu foi criada em 1945") == "Item 3. A ONU foi criada em 1945."
+    assert normalizar_transcricao("aí tem vinte e um, o mercosul") == "Item 21. O Mercosul."
+    assert normalizar_transcricao("julgue o item três o tnp") == "Julgue o Item 3. O TNP."
+
+
+def test_item_ditado_depois_de_frase():
+    assert normalizar_transcricao("texto de apoio lido. e tem 5 a otan") == "Texto de Apoio lido. Item 5. A OTAN."
+
+
+def test_e_tem_com_numero_no_meio_da_frase_fica_intacto():
+    assert normalizar_transcricao("a onu foi criada em 1945 e tem 193 membros") == \
+        "A ONU foi criada em 1945 e tem 193 membros."
+    assert normalizar_transcricao("o brasil e tem um papel central na oea") == "O brasil e tem um papel central na OEA."
+    assert normalizar_transcricao("o tratado aí tem dois anexos") == "O tratado aí tem dois anexos."
+
+
+def test_entrada_vazia():
+    assert normalizar_transcricao("") == ""
+    assert normalizar_transcricao(None) is None
+    assert normalizar_transcricao("   \n ") == "   \n "
@@ -0,0 +1,57 @@
+from despacho import HistoricoLatencia
+from saude import MonitorSaude
+
+
+def _candidatos(*nomes):
+    return [(nome, None, None, nome.capitalize()) for nome in nomes]
+
+
+def _amostrar(historico, nome, fase, latencia, vezes=8):
+    for _ in range(vezes):
+        historico.registrar(nome, fase, latencia)
+
+
+def _nomes(ordenados):
+    return [c[0] for c in ordenados]
+
+
+def test_ordenar_mantem_prioridade_sem_amostras():
+    monitor = MonitorSaude(["groq", "gemini", "openai"])
+    ordenados, abertos = monitor.ordenar(_candidatos("groq", "gemini", "openai"), "1", HistoricoLatencia())
+    assert _nomes(ordenados) == ["groq", "gemini", "openai"]
+    assert abertos == []
+
+
+def test_ordenar_rebaixa_p95_muito_pior_que_o_proximo():
+    monitor, historico = MonitorSaude(["groq", "gemini", "openai"]), HistoricoLatencia()
+    _amostrar(historico, "groq", "1", 6.0)
+    _amostrar(historico, "gemini", "1", 1.0)
+    _amostrar(historico, "openai", "1", 1.5)
+    ordenados, _ = monitor.ordenar(_candidatos("groq", "gemini", "openai"), "1", historico)
+    assert _nomes(ordenados) == ["gemini", "openai", "groq"]
+
+
+def test_ordenar_compara_so_dentro_da_fase():
+    monitor, historico = MonitorSaude(["groq", "gemini"]), HistoricoLatencia()
+    # groq serviu as redações longas da Fase 2; gemini só itens curtos da Fase 1
+    _amostrar(historico, "groq", "2", 25.0)
+    _amostrar(historico, "groq", "1", 0.9)
+    _amostrar(historico, "gemini", "1", 0.8)
+    _amostrar(historico, "gemini", "2", 22.0)
+    for fase in ("1", "2"):
+        ordenados, _ = monitor.ordenar(_candidatos("groq", "gemini"), fase, historico)
+        assert _nomes(ordenados) == ["groq", "gemini"], fase
+    # Na fase 2 o gemini nem tem amostras: nada a comparar, prioridade do admin vale
+    ordenados, _ = monitor.ordenar(_candidatos("groq", "gemini"), "2", HistoricoLatencia())
+    assert _nomes(ordenados) == ["groq", "gemini"]
+
+
+def test_ordenar_tira_abertos_e_tolera_diferenca_pequena():
+    monitor, historico = MonitorSaude(["groq", "gemini", "openai"]), HistoricoLatencia()
+    _amostrar(historico, "groq", "1", 1.8)
+    _amostrar(historico, "gemini", "1", 1.0)
+    for _ in range(3):
+        monitor.falha("openai", RuntimeError("timeout"))
+    ordenados, abertos = monitor.ordenar(_candidatos("groq", "gemini", "openai"), "1", historico)
+    assert _nomes(ordenados) == ["groq", "gemini"]
+    assert len(abertos) == 1 and abertos[0].startswith("openai")
@@ -0,0 +1,36 @@
+from sessoes import GerenciadorSessoes
+
+
+def _dois_workers(tmp_path):
+    caminho = str(tmp_path / "sessoes.sqlite3")
+    return GerenciadorSessoes(caminho=caminho, persistir=True), GerenciadorSessoes(caminho=caminho, persistir=True)
+
+
+def test_obter_rele_sessao_alterada_por_outro_worker(tmp_path):
+    a, b = _dois_workers(tmp_path)
+    a.atualizar(1, fase="1")
+    assert b.obter(1).fase == "1"
+    a.atualizar(1, fase="2")
+    # b tinha a sessão no LRU, mas a versão no disco mudou
+    assert b.obter(1).fase == "2"
+
+
+def test_contar_item_nao_ressuscita_sessao_encerrada(tmp_path):
+    a, b = _dois_workers(tmp_path)
+    a.atualizar(1, texto_apoio="texto")
+    sessao = a.obter(1)
+    # Admin encerra enquanto o pedido está no meio
+    b.remover(1)
+    assert a.contar_item(sessao) is False
+    assert b.listar_persistidas() == []
+    assert a.obter(1).texto_apoio is None
+
+
+def test_contar_item_soma_sobre_alteracao_concorrente(tmp_path):
+    a, b = _dois_workers(tmp_path)
+    a.atualizar(1, fase="1")
+    sessao = a.obter(1)
+    b.atualizar(1, fase="2")
+    assert a.contar_item(sessao) is True
+    gravada = b.obter(1)
+    assert (gravada.fase, gravada.itens) == ("2", 1)
@@ -0,0 +1,30 @@
+import time
+import asyncio
+import threading
+
+from tts import SintetizadorTTS, dividir_frases
+
+
+def test_ponto_ditado_so_separa_quando_a_frase_seguinte_comeca():
+    assert dividir_frases("Do ponto de vista jurídico, o tratado vale. Outra frase") == \
+        ["Do ponto de vista jurídico, o tratado vale.", "Outra frase"]
+    assert dividir_frases("primeiro argumento ponto Segundo argumento") == ["primeiro argumento ponto", "Segundo argumento"]
+    assert dividir_frases("a soberania ponto e vírgula o tratado") == ["a soberania ponto e vírgula o tratado"]
+
+
+def test_mesma_frase_em_dois_event_loops():
+    """O aquecimento (loop próprio, em thread) e o bot sintetizam a mesma frase ao mesmo tempo."""
+    tts = SintetizadorTTS()
+    comecou = threading.Event()
+
+    def gtts_lento(texto):
+        comecou.set()
+        time.sleep(0.2)
+        return texto.encode()
+    tts._gtts = gtts_lento
+
+    aquecimento = threading.Thread(target=lambda: asyncio.run(tts.sintetizar("CERTO")))
+    aquecimento.start()
+    comecou.wait(2)
+    assert asyncio.run(tts.sintetizar("CERTO")) == b"CERTO"
+    aquecimento.join()
@@ -0,0 +1,122 @@
+import os
+import io
+import re
+import asyncio
+import hashlib
+import threading
+import weakref
+from collections import deque
+
+from audio import mp3_para_voz
+from cache import CacheLRU, hash_texto, normalizar_texto
+from despacho import percentil
+from pipeline import rodar_em_thread
+
+# --- SÍNTESE DE VOZ (gTTS) EM FRASES, EM PARALELO E COM CACHE ---
+TTS_IDIOMA = os.getenv("TTS_IDIOMA", "pt")
+TTS_CACHE_ITENS = int(os.getenv("TTS_CACHE_ITENS", "1024"))
+# Vereditos da Fase 1: sintetizados uma vez na subida do bot
+FRASES_FIXAS = ("CERTO", "ERRADO", "ERRO")
+
+# Fim de frase: pontuação gráfica ou o "ponto" ditado da Fase 2 quando a frase seguinte já começou
+# (maiúscula depois dele); "ponto de vista", "ponto e vírgula" etc. ficam na mesma frase
+FIM_FRASE = re.compile(r'(?<=[.!?])\s+|(?<=\b[pP]onto)\s+(?=[A-ZÀ-Ý])')
+
+
+def separar_frases_prontas(buffer):
+    """Divide o buffer em frases completas e o resto ainda em construção."""
+    partes = FIM_FRASE.split(buffer)
+    return [p for p in partes[:-1] if p.strip()], partes[-1]
+
+
+def dividir_frases(texto):
+    frases, resto = separar_frases_prontas(texto)
+    return frases + ([resto] if resto.strip() else [])
+
+
+class SintetizadorTTS:
+    """
+    Cada frase vira um MP3 independente (frames MP3 concatenados tocam em sequência),
+    então as frases são sintetizadas ao mesmo tempo no pool "tts". Trechos ficam em cache
+    pelo hash do conteúdo; pedidos simultâneos da mesma frase compartilham uma única síntese.
+    """
+    def __init__(self, idioma=TTS_IDIOMA, max_itens=TTS_CACHE_ITENS):
+        self.idioma = idioma
+        self.mp3 = CacheLRU(max_itens=max_itens)
+        self.voz = CacheLRU(max_itens=max(64, max_itens // 8))   # OGG/Opus final das respostas curtas
+        # Sínteses em voo por event loop: o aquecimento roda num loop próprio e a Task de
+        # um loop não pode ser aguardada no outro
+        self._em_andamento = weakref.WeakKeyDictionary()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._medidas = {"primeiro_trecho": deque(maxlen=200), "voz_enviada": deque(maxlen=200)}
+
+    def _chave(self, texto):
+        return hash_texto(f"{self.idioma}\x1f{normalizar_texto(texto)}")
+
+    def _gtts(self, texto):
+        from gtts import gTTS   # adiado: a subida do worker não paga o import
+        buffer = io.BytesIO()
+        gTTS(text=texto, lang=self.idioma, slow=False).write_to_fp(buffer)
+        return buffer.getvalue()
+
+    async def sintetizar(self, frase):
+        chave = self._chave(frase)
+        mp3 = self.mp3.get(chave)
+        if mp3 is not None:
+            with self._lock: self.hits += 1
+            return mp3
+        em_andamento = self._em_andamento.setdefault(asyncio.get_running_loop(), {})
+        tarefa = em_andamento.get(chave)
+        if tarefa is None:
+            with self._lock: self.misses += 1
+            tarefa = asyncio.ensure_future(rodar_em_thread("tts", self._gtts, frase))
+            em_andamento[chave] = tarefa
+            tarefa.add_done_callback(lambda t: self._concluir(em_andamento, chave, t))
+        else:
+            with self._lock: self.hits += 1
+        return await asyncio.shield(tarefa)
+
+    def _concluir(self, em_andamento, chave, tarefa):
+        em_andamento.pop(chave, None)
+        if not tarefa.cancelled() and tarefa.exception() is None:
+            self.mp3.set(chave, tarefa.result())
+
+    async def para_voz(self, mp3):
+        """MP3 -> OGG/Opus; respostas repetidas (vereditos) não passam de novo pelo ffmpeg."""
+        chave = hashlib.sha256(mp3).hexdigest() if len(mp3) < 256 * 1024 else None
+        voz = self.voz.get(chave) if chave else None
+        if voz is None:
+            voz = await mp3_para_voz(mp3)
+            if chave: self.voz.set(chave, voz)
+        return voz
+
+    def precomputar(self, frases=FRASES_FIXAS):
+        """Aquece o cache em segundo plano (MP3 e OGG) para não atrasar a subida."""
+        async def aquecer():
+            for frase in frases:
+                try:
+                    await self.para_voz(await self.sintetizar(frase))
+                except Exception as e:
+                    print(f"⚠️ TTS não pré-computou '{frase}': {e}")
+                    return
+            print(f"🔊 TTS pronto: {', '.join(frases)} em cache")
+
+        threading.Thread(target=lambda: asyncio.run(aquecer()), daemon=True, name="tts-aquecimento").start()
+
+    def registrar(self, medida, segundos):
+        with self._lock:
+            self._medidas[medida].append(segundos)
+
+    def resumo(self):
+        with self._lock:
+            total = self.hits + self.misses
+            info = {
+                "hits": self.hits, "misses": self.misses,
+                "taxa_acerto": round(self.hits / total, 3) if total else 0.0,
+                "itens": len(self.mp3),
+            }
+            for medida, valores in self._medidas.items():
+                info[medida] = {"p50": percentil(list(valores), 50), "p95": percentil(list(valores), 95)}
+        return info
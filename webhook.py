@@ -0,0 +1,142 @@
+import os
+import time
+import signal
+import asyncio
+import threading
+from collections import deque
+
+from aiohttp import web
+from telegram import Update
+
+from cache import CacheLRU
+from despacho import percentil
+from metricas import telemetria
+
+# --- MODO WEBHOOK (ALTERNATIVA AO run_polling) ---
+# O Telegram entrega cada update num POST; um servidor aiohttp responde na hora e enfileira.
+# - Duplicatas (reentregas do Telegram) são descartadas pelo update_id.
+# - A fila é limitada: cheia, o POST recebe 429 e o Telegram reentrega mais tarde (backpressure).
+# - Um número fixo de consumidores chama app.process_update: esse é o teto de updates simultâneos.
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")             # URL pública (https://.../telegram)
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORTA = int(os.getenv("WEBHOOK_PORTA", "8443"))
+WEBHOOK_CAMINHO = os.getenv("WEBHOOK_CAMINHO", "/telegram")
+WEBHOOK_SEGREDO = os.getenv("WEBHOOK_SEGREDO")     # Conferido no cabeçalho X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_FILA = int(os.getenv("WEBHOOK_FILA", "256"))
+# Quantos update_id lembrar para descartar reentregas (e por quanto tempo)
+WEBHOOK_MEMORIA_IDS = int(os.getenv("WEBHOOK_MEMORIA_IDS", "10000"))
+WEBHOOK_TTL_IDS = float(os.getenv("WEBHOOK_TTL_IDS", "3600"))
+# Segundos sugeridos ao Telegram (Retry-After) quando a fila está cheia
+WEBHOOK_RETRY_AFTER = int(os.getenv("WEBHOOK_RETRY_AFTER", "1"))
+
+
+class ServidorWebhook:
+    def __init__(self, app, consumidores, caminho=WEBHOOK_CAMINHO, segredo=WEBHOOK_SEGREDO, max_fila=WEBHOOK_FILA):
+        self.app = app
+        self.consumidores = consumidores
+        self.caminho = caminho
+        self.segredo = segredo
+        self.fila = asyncio.Queue(maxsize=max_fila)
+        self.vistos = CacheLRU(max_itens=WEBHOOK_MEMORIA_IDS, ttl=WEBHOOK_TTL_IDS)
+        self._tarefas = []
+        self._runner = None
+        self._lock = threading.Lock()
+        self.contadores = {"recebidos": 0, "duplicados": 0, "recusados": 0, "processados": 0, "erros": 0, "invalidos": 0}
+        self._esperas = deque(maxlen=1000)
+
+    def _contar(self, campo):
+        with self._lock:
+            self.contadores[campo] += 1
+
+    async def receber(self, request):
+        if self.segredo and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != self.segredo:
+            return web.Response(status=403)
+        try:
+            dados = await request.json()
+            update_id = dados["update_id"]
+        except Exception:
+            self._contar("invalidos")
+            return web.Response(status=400)
+        self._contar("recebidos")
+        if update_id in self.vistos:
+            self._contar("duplicados")
+            return web.Response(status=200)
+        try:
+            self.fila.put_nowait((time.perf_counter(), dados))
+        except asyncio.QueueFull:
+            # Não marca como visto: a reentrega do Telegram precisa passar
+            self._contar("recusados")
+            return web.Response(status=429, headers={"Retry-After": str(WEBHOOK_RETRY_AFTER)})
+        self.vistos.set(update_id, True)
+        return web.Response(status=200)
+
+    async def saude(self, request):
+        return web.json_response(self.resumo())
+
+    async def _consumir(self):
+        while True:
+            chegada, dados = await self.fila.get()
+            espera = time.perf_counter() - chegada
+            with self._lock:
+                self._esperas.append(espera)
+            telemetria.registrar("webhook_fila", espera)
+            try:
+                await self.app.process_update(Update.de_json(dados, self.app.bot))
+                self._contar("processados")
+            except Exception as e:
+                self._contar("erros")
+                print(f"⚠️ Update {dados.get('update_id')} falhou: {e}")
+            finally:
+                self.fila.task_done()
+
+    async def iniciar(self, host=WEBHOOK_HOST, porta=WEBHOOK_PORTA, url=None):
+        """Sobe o servidor e os consumidores; com 'url', registra o webhook no Telegram."""
+        servidor = web.Application()
+        servidor.router.add_post(self.caminho, self.receber)
+        servidor.router.add_get("/saude", self.saude)
+        self._runner = web.AppRunner(servidor, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, porta).start()
+        self._tarefas = [asyncio.create_task(self._consumir()) for _ in range(self.consumidores)]
+        if url:
+            await self.app.bot.set_webhook(url=url, secret_token=self.segredo, max_connections=min(100, self.consumidores),
+                                           allowed_updates=Update.ALL_TYPES)
+        print(f"🪝 Webhook em http://{host}:{porta}{self.caminho} ({self.consumidores} consumidores, fila {self.fila.maxsize})")
+
+    async def parar(self, drenar=True):
+        if drenar:
+            await self.fila.join()
+        for tarefa in self._tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*self._tarefas, return_exceptions=True)
+        if self._runner:
+            await self._runner.cleanup()
+
+    def resumo(self):
+        with self._lock:
+            esperas = list(self._esperas)
+            return {**self.contadores, "fila": self.fila.qsize(), "fila_max": self.fila.maxsize,
+                    "espera_p50": percentil(esperas, 50), "espera_p95": percentil(esperas, 95)}
+
+
+async def rodar_webhook(app, consumidores, host=WEBHOOK_HOST, porta=WEBHOOK_PORTA, url=WEBHOOK_URL, ao_iniciar=None):
+    """Ciclo completo do bot em modo webhook, até ser cancelado (SIGINT/SIGTERM)."""
+    await app.initialize()
+    await app.start()
+    servidor = ServidorWebhook(app, consumidores)
+    if ao_iniciar:
+        ao_iniciar(servidor)
+    await servidor.iniciar(host, porta, url)
+    parar = asyncio.Event()
+    try:
+        loop = asyncio.get_running_loop()
+        for sinal in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sinal, parar.set)
+    except (NotImplementedError, RuntimeError, ValueError):
+        pass
+    try:
+        await parar.wait()
+    finally:
+        await servidor.parar()
+        await app.stop()
+        await app.shutdown()
@@ -0,0 +1,49 @@
+import os
+import signal
+import argparse
+import threading
+import time
+from dotenv import load_dotenv
+
+# --- WORKER DO BOT (PROCESSO PRÓPRIO, FORA DO STREAMLIT) ---
+# Uso: python worker.py [--id nome] [--pai PID] [--modo polling|webhook]
+# O painel (streamlit run main.py) só conversa com os workers pelo canal em SQLite (canal.py).
+load_dotenv()
+
+import bot_telegram
+from canal import CanalEstado
+from metricas import iniciar_servidor
+
+
+def vigiar_pai(pid):
+    """Se o processo que nos lançou (o painel) morrer, encerra junto em vez de ficar órfão."""
+    while True:
+        time.sleep(2)
+        if os.getppid() != pid:
+            print("👋 Painel encerrado: parando o worker")
+            os.kill(os.getpid(), signal.SIGTERM)
+            return
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker do bot Resolve.ia no Telegram")
+    parser.add_argument("--id", default=None, help="Nome do worker no painel (padrão: host:pid)")
+    parser.add_argument("--pai", type=int, default=None, help="PID do processo a acompanhar")
+    parser.add_argument("--modo", choices=("polling", "webhook"), default=None, help="Entrega de updates (padrão: BOT_MODO)")
+    args = parser.parse_args()
+
+    canal = CanalEstado()
+    state = bot_telegram.preparar(args.id, canal)
+    # Endpoint Prometheus (/metrics) na porta METRICAS_PORTA (use uma porta por worker)
+    iniciar_servidor()
+    if args.pai:
+        threading.Thread(target=vigiar_pai, args=(args.pai,), daemon=True, name="vigia-pai").start()
+    try:
+        bot_telegram.run_bot(args.modo)
+    finally:
+        canal.encerrar(state.origem)
+        print(f"🛑 Worker {state.origem} encerrado")
+
+
+if __name__ == "__main__":
+    main()